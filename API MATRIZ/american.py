@@ -0,0 +1,348 @@
+"""
+Valuación vectorizada de opciones americanas (las opciones de GGAL en BYMA lo son)
+Misma convención que black_scholes.py: escalares o arrays que se combinan por
+broadcasting, t en años, vol, rate y div (dividendo continuo) anualizados.
+
+Dos métodos sobre la cadena completa a la vez:
+- Barone-Adesi-Whaley: aproximación analítica; el precio crítico de ejercicio se
+  resuelve con Newton vectorizado sobre todas las opciones.
+- Árbol binomial CRR con la última etapa valuada por Black-Scholes y extrapolación
+  de Richardson (BBSR): una inducción hacia atrás con una fila por opción.
+Las calls sin dividendo no se ejercen anticipadamente y salen en forma cerrada.
+
+Modos (precisión vs. velocidad): 'fast' (BAW), 'balanced' (BBSR 100 pasos) y
+'accurate' (BBSR 400 pasos). AmericanPricer agrega una caché LRU por entrada idéntica,
+con clave de un digest de las entradas y límite en bytes de resultados.
+
+Uso:
+    precio = american_price(4000.0, strikes, 0.25, 0.5, False, rate=0.30)
+    iv = american_implied_vol(mids, 4000.0, strikes, 0.25, is_call, rate=0.30, mode='fast')
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from black_scholes import norm_cdf, norm_pdf, implied_vol
+
+MODES = {
+    'fast': ('baw', None),
+    'balanced': ('tree', 100),
+    'accurate': ('tree', 400),
+}
+
+
+def _european(spot, strike, t, vol, is_call, rate, carry):
+    """Black-Scholes generalizado (carry = rate - div) con t y vol positivos: (precio, d1, e^((b-r)t))"""
+    sqrt_t = np.sqrt(t)
+    vs = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (carry + 0.5 * vol * vol) * t) / vs
+    fwd_df = np.exp((carry - rate) * t)
+    kdf = strike * np.exp(-rate * t)
+    call = spot * fwd_df * norm_cdf(d1) - kdf * norm_cdf(d1 - vs)
+    return np.where(is_call, call, call - spot * fwd_df + kdf), d1, fwd_df
+
+
+def _prepare(spot, strike, t, vol, is_call):
+    """Arrays planos del mismo largo y la forma del broadcast"""
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (spot, strike, t, vol)),
+                                 np.asarray(is_call, dtype=bool))
+    shape = arrays[0].shape
+    return [a.ravel() for a in arrays], shape
+
+
+def _price(metodo, spot, strike, t, vol, is_call, rate, div, **kwargs):
+    """Esqueleto común: intrínseco para vencidas, forma cerrada sin ejercicio anticipado
+        y el método americano sólo sobre el resto"""
+    (spot, strike, t, vol, is_call), shape = _prepare(spot, strike, t, vol, is_call)
+    carry = rate - div
+    intrinseco = np.maximum(np.where(is_call, spot - strike, strike - spot), 0.0)
+    precio = intrinseco.copy()
+    vivo = (t > 0) & (vol > 0)
+    # Prima de ejercicio anticipado sólo en calls con dividendo (b < r) y puts con tasa positiva
+    temprano = vivo & np.where(is_call, carry < rate, rate > 0)
+    europeo = vivo & ~temprano
+    if europeo.any():
+        precio[europeo] = _european(spot[europeo], strike[europeo], t[europeo], vol[europeo],
+                                    is_call[europeo], rate, carry)[0]
+    if temprano.any():
+        americano = metodo(spot[temprano], strike[temprano], t[temprano], vol[temprano],
+                           is_call[temprano], rate, carry, **kwargs)
+        precio[temprano] = np.maximum(americano, intrinseco[temprano])
+    return precio.reshape(shape)
+
+
+# ---------- Barone-Adesi-Whaley ----------
+def _baw(spot, strike, t, vol, is_call, rate, carry, tol=1e-6, max_iter=50):
+    vol2 = vol * vol
+    m = 2.0 * rate / vol2
+    n = 2.0 * carry / vol2
+    h = -np.expm1(-rate * t)
+    # m / h tiende a 2 / (vol^2 t) cuando la tasa tiende a cero
+    m_h = np.where(np.abs(rate * t) > 1e-12, m / np.where(h != 0, h, 1.0), 2.0 / (vol2 * t))
+    sign = np.where(is_call, 1.0, -1.0)
+    q = (-(n - 1.0) + sign * np.sqrt((n - 1.0) ** 2 + 4.0 * m_h)) / 2.0
+
+    # Arranque de Barone-Adesi-Whaley para el precio crítico
+    q_inf = (-(n - 1.0) + sign * np.sqrt((n - 1.0) ** 2 + 4.0 * m)) / 2.0
+    s_inf = strike / (1.0 - 1.0 / q_inf)
+    sqrt_t = np.sqrt(t)
+    semilla = np.where(is_call, -(carry * t + 2.0 * vol * sqrt_t) * strike / (s_inf - strike),
+                       (carry * t - 2.0 * vol * sqrt_t) * strike / (strike - s_inf))
+    critico = np.where(is_call, strike + (s_inf - strike) * (1.0 - np.exp(semilla)),
+                       s_inf + (strike - s_inf) * np.exp(semilla))
+
+    activo = np.ones(len(spot), dtype=bool)
+    for _ in range(max_iter):
+        euro, d1, fwd_df = _european(critico, strike, t, vol, is_call, rate, carry)
+        nd1 = norm_cdf(sign * d1)
+        rhs = euro + sign * (1.0 - fwd_df * nd1) * critico / q
+        activo &= np.abs(sign * (critico - strike) - rhs) / strike > tol
+        if not activo.any():
+            break
+        pendiente = sign * fwd_df * nd1 * (1.0 - 1.0 / q) + (sign - fwd_df * norm_pdf(d1) / (vol * sqrt_t)) / q
+        nuevo = (strike + sign * (rhs - pendiente * critico)) / (1.0 - sign * pendiente)
+        critico = np.where(activo, nuevo, critico)
+
+    euro_critico, d1, fwd_df = _european(critico, strike, t, vol, is_call, rate, carry)
+    a = sign * (critico / q) * (1.0 - fwd_df * norm_cdf(sign * d1))
+    euro = _european(spot, strike, t, vol, is_call, rate, carry)[0]
+    continuar = np.where(is_call, spot < critico, spot > critico)
+    return np.where(continuar, euro + a * (spot / critico) ** q, sign * (spot - strike))
+
+
+def baw_price(spot, strike, t, vol, is_call, rate=0.0, div=0.0):
+    """Precio americano por la aproximación de Barone-Adesi-Whaley"""
+    return _price(_baw, spot, strike, t, vol, is_call, rate, div)
+
+
+# ---------- Árbol binomial ----------
+def _bbs(spot, strike, t, vol, is_call, rate, carry, steps):
+    """CRR con la última etapa por Black-Scholes (suaviza la oscilación del payoff).
+        Nodos en filas y opciones en columnas: cada etapa recorta filas contiguas"""
+    dt = t / steps
+    u = np.exp(vol * np.sqrt(dt))
+    p = (np.exp(carry * dt) - 1.0 / u) / (u - 1.0 / u)
+    disc = np.exp(-rate * dt)
+    sube, baja = disc * p, disc * (1.0 - p)
+    sign = np.where(is_call, 1.0, -1.0)
+
+    # Nodos de la etapa steps-1: S u^(2j - (steps-1))
+    nodos = spot * u ** (2.0 * np.arange(steps) - (steps - 1))[:, None]
+    valores, _, _ = _european(nodos, strike, dt, vol, is_call, rate, carry)
+    valores = np.maximum(valores, sign * (nodos - strike))
+    for _ in range(steps - 1):
+        nodos = nodos[:-1] * u
+        valores = np.maximum(sube * valores[1:] + baja * valores[:-1], sign * (nodos - strike))
+    return valores[0]
+
+
+def _bbsr(spot, strike, t, vol, is_call, rate, carry, steps=100):
+    # Extrapolación de Richardson entre steps y steps/2
+    return 2.0 * _bbs(spot, strike, t, vol, is_call, rate, carry, steps) \
+        - _bbs(spot, strike, t, vol, is_call, rate, carry, max(steps // 2, 2))
+
+
+def binomial_price(spot, strike, t, vol, is_call, rate=0.0, div=0.0, steps=100):
+    """Precio americano por árbol binomial BBSR con steps pasos"""
+    return _price(_bbsr, spot, strike, t, vol, is_call, rate, div, steps=steps)
+
+
+def american_price(spot, strike, t, vol, is_call, rate=0.0, div=0.0, mode='balanced'):
+    metodo, steps = MODES[mode]
+    if metodo == 'baw':
+        return baw_price(spot, strike, t, vol, is_call, rate, div)
+    return binomial_price(spot, strike, t, vol, is_call, rate, div, steps)
+
+
+def american_greeks(spot, strike, t, vol, is_call, rate=0.0, div=0.0, mode='balanced'):
+    """Griegas por diferencias finitas con las mismas unidades que bs_greeks
+        (vega por 1.00 de vol, theta por año); todas las variantes en una sola valuación"""
+    (spot, strike, t, vol, is_call), shape = _prepare(spot, strike, t, vol, is_call)
+    h = 0.01 * spot
+    dv = np.minimum(0.01, 0.5 * vol)
+    dt = np.minimum(1.0 / 365.0, t)
+    variantes = np.array([
+        (spot, vol, t), (spot + h, vol, t), (spot - h, vol, t),
+        (spot, vol + dv, t), (spot, vol - dv, t), (spot, vol, t - dt),
+    ])  # (variante, campo, opción)
+    precios = american_price(variantes[:, 0], strike, variantes[:, 2], variantes[:, 1], is_call, rate, div, mode)
+    base, arriba, abajo, vol_arriba, vol_abajo, despues = precios
+    dr = 1e-4
+    con_tasa = american_price(spot, strike, t, vol, is_call, rate + dr, div, mode)
+    seguro = lambda x: np.where(x > 0, x, 1.0)
+    return {
+        'delta': ((arriba - abajo) / (2.0 * h)).reshape(shape),
+        'gamma': ((arriba - 2.0 * base + abajo) / (h * h)).reshape(shape),
+        'vega': np.where(dv > 0, (vol_arriba - vol_abajo) / (2.0 * seguro(dv)), 0.0).reshape(shape),
+        'theta': np.where(dt > 0, (despues - base) / seguro(dt), 0.0).reshape(shape),
+        'rho': ((con_tasa - base) / dr).reshape(shape),
+    }
+
+
+def american_implied_vol(price, spot, strike, t, is_call, rate=0.0, div=0.0, mode='balanced', tol=1e-6,
+                         max_iter=50, vol_min=1e-4, vol_max=5.0):
+    """Volatilidad implícita americana vectorizada: secante (la primera pendiente es la vega
+        europea) con salvaguarda de bisección, repreciando en cada iteración sólo las opciones
+        que no convergieron.
+        NaN donde el precio no supera el intrínseco en más de tol (ejercicio inmediato) o excede la cota"""
+    (price, spot, strike, t, is_call), shape = _prepare(price, spot, strike, t, is_call)
+    carry = rate - div
+    intrinseco = np.maximum(np.where(is_call, spot - strike, strike - spot), 0.0)
+    superior = np.where(is_call, spot, strike)
+    # Sin valor tiempo (región de ejercicio) cualquier vol da el mismo precio: IV indefinida
+    valido = (t > 0) & (price - intrinseco > tol) & (price < superior) & np.isfinite(price)
+
+    # La IV europea del mismo precio es cota superior de la americana: buen arranque
+    t_ = np.where(t > 0, t, 1.0)
+    with np.errstate(all='ignore'):
+        arranque = implied_vol(price, spot * np.exp(-div * t_), strike, t_, is_call, rate)
+    vol = np.clip(np.where(np.isfinite(arranque), arranque, 0.5), vol_min, vol_max)
+    bajo = np.full(price.shape, vol_min)
+    alto = np.full(price.shape, vol_max)
+    # La vega europea sobreestima la americana en el dinero profundo: desde la segunda
+    # iteración la pendiente sale de los dos últimos puntos
+    vol_previa = np.full(price.shape, np.nan)
+    error_previo = np.full(price.shape, np.nan)
+    activo = valido.copy()
+    for _ in range(max_iter):
+        i = np.flatnonzero(activo)
+        if not i.size:
+            break
+        v = vol[i]
+        error = american_price(spot[i], strike[i], t[i], v, is_call[i], rate, div, mode) - price[i]
+        sigue = np.abs(error) > tol
+        alto[i] = np.where(error > 0, v, alto[i])
+        bajo[i] = np.where(error < 0, v, bajo[i])
+        _, d1, fwd_df = _european(spot[i], strike[i], t[i], v, is_call[i], rate, carry)
+        with np.errstate(all='ignore'):
+            pendiente = (error - error_previo[i]) / (v - vol_previa[i])
+            pendiente = np.where(np.isfinite(pendiente) & (pendiente > 0), pendiente,
+                                 spot[i] * fwd_df * norm_pdf(d1) * np.sqrt(t[i]))
+            paso = v - error / np.where(pendiente > 1e-12, pendiente, np.nan)
+        fuera = ~np.isfinite(paso) | (paso <= bajo[i]) | (paso >= alto[i])
+        vol_previa[i], error_previo[i] = v, error
+        vol[i] = np.where(sigue, np.where(fuera, 0.5 * (bajo[i] + alto[i]), paso), v)
+        activo[i] = sigue
+    return np.where(valido, vol, np.nan).reshape(shape)
+
+
+class AmericanPricer:
+    """Valuador americano con modo fijo y caché LRU: la misma cadena con las mismas
+        entradas (ej. la cartera entre ticks sin cambios) se resuelve sin recalcular.
+        La clave es un digest de las entradas sin expandir (valores y formas), así un
+        escenario grande no guarda ni hashea megabytes de clave; la caché se limita
+        por los bytes de los resultados (max_bytes)"""
+
+    def __init__(self, mode='balanced', div=0.0, max_bytes=64 * 2 ** 20):
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode} (opciones: {', '.join(MODES)})")
+        self.mode = mode
+        self.div = div
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._cache = OrderedDict()  # clave -> (resultado, bytes)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(arrays):
+        h = hashlib.blake2b(digest_size=16)
+        for a in arrays:
+            h.update(repr((a.dtype.str, a.shape)).encode())
+            h.update(np.ascontiguousarray(a).data)
+        return h.digest()
+
+    def _cached(self, kind, funcion, rate, *arrays):
+        arrays = [np.asarray(a, dtype=bool if j == len(arrays) - 1 else float) for j, a in enumerate(arrays)]
+        clave = (kind, float(rate), self._digest(arrays))
+        entrada = self._cache.get(clave)
+        if entrada is not None:
+            self._cache.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+        self.misses += 1
+        resultado = funcion(*arrays, rate=rate, div=self.div, mode=self.mode)
+        valores = tuple(resultado.values()) if isinstance(resultado, dict) else (resultado,)
+        # Los resultados se comparten entre llamadas: sólo lectura
+        for valor in valores:
+            valor.flags.writeable = False
+        tamano = sum(valor.nbytes for valor in valores)
+        if tamano > self.max_bytes:
+            return resultado
+        self._cache[clave] = (resultado, tamano)
+        self.nbytes += tamano
+        while self.nbytes > self.max_bytes:
+            _, (_, liberado) = self._cache.popitem(last=False)
+            self.nbytes -= liberado
+        return resultado
+
+    def price(self, spot, strike, t, vol, is_call, rate=0.0):
+        return self._cached('price', american_price, rate, spot, strike, t, vol, is_call)
+
+    def greeks(self, spot, strike, t, vol, is_call, rate=0.0):
+        return self._cached('greeks', american_greeks, rate, spot, strike, t, vol, is_call)
+
+    def implied_vol(self, price, spot, strike, t, is_call, rate=0.0):
+        return self._cached('iv', american_implied_vol, rate, price, spot, strike, t, is_call)
+
+    def clear(self):
+        self._cache.clear()
+        self.nbytes = 0
+
+
+if __name__ == "__main__":
+    from black_scholes import bs_price
+
+    # Cadena GGAL sintética: 6 vencimientos x 40 strikes x call/put con la tasa en pesos
+    spot, rate = 4000.0, 0.30
+    strikes = 4000 * np.exp(np.linspace(-0.4, 0.4, 40))
+    t = np.array([0.05, 0.15, 0.3, 0.45, 0.7, 0.9])[:, None, None]
+    is_call = np.array([True, False])[None, :, None]
+    vol = 0.45 + 0.2 * np.log(strikes / spot) ** 2
+    shape = np.broadcast_shapes(t.shape, is_call.shape, strikes.shape)
+    n = int(np.prod(shape))
+
+    referencia = binomial_price(spot, strikes, t, vol, is_call, rate, steps=2000)
+    europeo = bs_price(spot, strikes, t, vol, is_call, rate)
+    print(f"Cadena de {n} opciones (r = {rate:.0%}); referencia BBSR 2000 pasos")
+    print(f"  Black-Scholes europeo: error máx {np.abs(europeo - referencia).max():8.3f}  "
+          f"(puts en el dinero profundo)")
+    for mode in MODES:
+        american_price(spot, strikes, t, vol, is_call, rate, mode=mode)
+        repeticiones = 20 if mode == 'fast' else 3
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            precio = american_price(spot, strikes, t, vol, is_call, rate, mode=mode)
+        elapsed = (time.perf_counter() - inicio) / repeticiones
+        error = np.abs(precio - referencia)
+        print(f"  {mode:<9} error máx {error.max():8.4f} medio {error.mean():.5f}  "
+              f"{n / elapsed:>10,.0f} opciones/s")
+
+    # IV: recuperar la volatilidad a partir de los precios americanos
+    precios = binomial_price(spot, strikes, t, vol, is_call, rate, steps=400)
+    for mode in ('fast', 'balanced'):
+        inicio = time.perf_counter()
+        iv = american_implied_vol(precios, spot, strikes, t, is_call, rate, mode=mode)
+        elapsed = time.perf_counter() - inicio
+        ok = np.isfinite(iv)
+        error = np.abs(iv - np.broadcast_to(vol, shape))[ok]
+        print(f"  IV {mode:<9} {n / elapsed:>10,.0f} opciones/s, error máx {error.max():.5f} "
+              f"({ok.sum()}/{n} con IV definida)")
+    with np.errstate(all='ignore'):
+        iv_europea = implied_vol(precios, spot, strikes, t, is_call, rate)
+    puts = ~np.broadcast_to(is_call, shape) & np.isfinite(iv_europea)
+    print(f"  IV europea sobre precios americanos (puts): sesgo máx "
+          f"{np.abs(iv_europea - np.broadcast_to(vol, shape))[puts].max():.3f}")
+
+    pricer = AmericanPricer('balanced')
+    inicio = time.perf_counter()
+    pricer.price(spot, strikes, t, vol, is_call, rate)
+    primera = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        pricer.price(spot, strikes, t, vol, is_call, rate)
+    print(f"  Caché: primera {primera * 1e3:.1f} ms, repetida {(time.perf_counter() - inicio):.3f} ms "
+          f"({pricer.hits} aciertos)")
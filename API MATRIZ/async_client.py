@@ -0,0 +1,279 @@
+"""
+Cliente asíncrono de la API REST de Primary
+Las mismas operaciones que AuthManager, MarketData, RiskManager y OrderManager
+de main2 como corrutinas sobre una única aiohttp.ClientSession, de modo que un
+proceso puede tener decenas de consultas y órdenes en vuelo compartiendo el
+pool de conexiones. El token se pide una vez y se renueva ante un 401.
+
+PrimaryClient es la fachada sincrónica: corre el event loop en un hilo propio y
+expone .auth, .md, .rm y .om con la interfaz bloqueante de main2, así los scripts
+existentes siguen funcionando y varios hilos comparten el mismo pool.
+
+Uso:
+    async with AsyncPrimaryClient("usuario", "password") as client:
+        books = await asyncio.gather(*(client.md.get_real_time_data(s) for s in symbols))
+
+    client = PrimaryClient("usuario", "password")
+    strategies = OptionsStrategies(client.auth)
+    strategies.md, strategies.rm, strategies.om = client.md, client.rm, client.om
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+
+import aiohttp
+
+import metrics
+from main2 import Config, MarketData, RiskManager, OrderManager
+
+
+class AsyncAuthManager:
+    def __init__(self, username, password, session, base_url=None):
+        self._token = None
+        self._username = username
+        self._password = password
+        self.session = session
+        self.base_url = base_url or Config.API_BASE_URL
+        self._lock = asyncio.Lock()
+
+    async def get_token(self, refresh=False):
+        if self._token is not None and not refresh:
+            return self._token
+        async with self._lock:
+            # Otra corrutina pudo haberlo renovado mientras esperábamos el lock
+            if self._token is not None and not refresh:
+                return self._token
+            headers = {"X-Username": self._username, "X-Password": self._password}
+            async with self.session.post(f"{self.base_url}/auth/getToken", headers=headers) as response:
+                if response.status != 200:
+                    raise Exception(f"Error de autenticación: {await response.text()}")
+                self._token = response.headers.get("X-Auth-Token")
+                return self._token
+
+    async def request(self, method, path, params=None):
+        """Request autenticado: devuelve el JSON o None si el status no es 200"""
+        url = f"{self.base_url}{path}"
+        endpoint = '/'.join(path.split('/')[:4])
+        for intento in range(2):
+            token = await self.get_token(refresh=intento > 0)
+            with metrics.span('http_request', endpoint=endpoint):
+                async with self.session.request(method, url, headers={"X-Auth-Token": token},
+                                                params=_query(params)) as response:
+                    if response.status == 401 and intento == 0:
+                        continue  # Token vencido: renovar y reintentar una vez
+                    if response.status != 200:
+                        return None
+                    return await response.json(content_type=None)
+        return None
+
+
+def _query(params):
+    # aiohttp no acepta bool ni None en la query string; requests los convierte a texto
+    if params is None:
+        return None
+    return {k: str(v) for k, v in params.items() if v is not None}
+
+
+class AsyncMarketData:
+    def __init__(self, auth, instruments=None, chain=None):
+        self.auth = auth
+        self.instruments = instruments
+        self.chain = chain
+
+    async def get_real_time_data(self, symbol, entries="BI,OF,LA,OP,CL,SE,OI"):
+        if self.instruments is not None and symbol not in self.instruments:
+            return self.instruments.check(symbol)
+        data = MarketData.chain_quote(self.chain, symbol)
+        if data is not None:
+            return data
+        params = {"marketId": "ROFX", "symbol": symbol, "entries": entries, "depth": 5}
+        return await self.auth.request("GET", "/rest/marketdata/get", params)
+
+    async def get_historical_volatility(self, symbol, days=Config.VOLATILITY_WINDOW):
+        data = await self.auth.request("GET", "/rest/data/getTrades", MarketData.history_params(symbol, days))
+        if data is None:
+            return 0.0
+        return MarketData.annualized_volatility(data.get('trades', []))
+
+
+class AsyncRiskManager(RiskManager):
+    """RiskManager con la consulta de saldo asíncrona; el dimensionamiento es el mismo"""
+
+    async def get_account_balance(self):
+        data = await self.auth.request("GET", f"/rest/risk/accountReport/{Config.ACCOUNT_ID}")
+        if data is None:
+            return 0.0
+        return float(data['accountData']['availableToCollateral'])
+
+    async def calculate_position_size(self, premium, stop_loss_pct=0.10, legs=None, contracts=1):
+        balance = await self.get_account_balance()
+        return self.size_for_balance(balance, premium, stop_loss_pct, legs, contracts)
+
+
+class AsyncOrderManager(OrderManager):
+    """OrderManager asíncrono; registra las respuestas en el OrderStore igual que el sincrónico"""
+
+    async def send_order(self, order_params):
+        if self.instruments is not None and order_params.get('symbol') not in self.instruments:
+            return self.instruments.check(order_params.get('symbol'))
+        result = await self.auth.request("GET", "/rest/order/newSingleOrder", self.order_params(order_params))
+        self._record_new(result, order_params)
+        return result
+
+    async def cancel_order(self, cl_ord_id, proprietary="PBCP"):
+        params = {"clOrdId": cl_ord_id, "proprietary": proprietary}
+        result = await self.auth.request("GET", "/rest/order/cancelById", params)
+        self._record_cancel(result, cl_ord_id)
+        return result
+
+    async def replace_order(self, cl_ord_id, price, order_qty, proprietary="PBCP"):
+        params = {"clOrdId": cl_ord_id, "proprietary": proprietary, "price": price, "orderQty": order_qty}
+        result = await self.auth.request("GET", "/rest/order/replaceById", params)
+        self._record_replace(result, cl_ord_id, price, order_qty)
+        return result
+
+
+class AsyncPrimaryClient:
+    """Sesión HTTP compartida con los cuatro módulos de la API como corrutinas"""
+
+    def __init__(self, username, password, base_url=None, engine=None, store=None, instruments=None,
+                 max_connections=100, timeout=10.0, chain=None):
+        self.username = username
+        self.password = password
+        self.base_url = base_url
+        self.engine = engine
+        self.store = store
+        self.instruments = instruments
+        self.chain = chain
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self.auth = AsyncAuthManager(self.username, self.password, self.session, self.base_url)
+        self.md = AsyncMarketData(self.auth, self.instruments, self.chain)
+        self.rm = AsyncRiskManager(self.auth, self.engine, self.store)
+        self.om = AsyncOrderManager(self.auth, self.store, self.instruments)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class _Blocking:
+    """Envuelve un objeto asíncrono: cada corrutina se corre en el loop del cliente y se espera"""
+
+    def __init__(self, target, client):
+        self._target = target
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._client.run(attr(*args, **kwargs))
+        call.__name__ = name
+        return call
+
+
+class PrimaryClient:
+    """Fachada sincrónica de AsyncPrimaryClient con el event loop en un hilo de fondo"""
+
+    def __init__(self, username, password, base_url=None, engine=None, store=None, instruments=None,
+                 max_connections=100, timeout=10.0, chain=None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='primary-client', daemon=True)
+        self._thread.start()
+        self.client = self.run(AsyncPrimaryClient(username, password, base_url, engine, store, instruments,
+                                                  max_connections, timeout, chain).open())
+        self.auth = _Blocking(self.client.auth, self)
+        self.md = _Blocking(self.client.md, self)
+        self.rm = _Blocking(self.client.rm, self)
+        self.om = _Blocking(self.client.om, self)
+
+    def run(self, coro, timeout=None):
+        """Correr una corrutina en el loop del cliente y esperar el resultado"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def submit(self, coro):
+        """Correr una corrutina sin esperar: devuelve un concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self):
+        self.run(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    # Benchmark contra el mock local con 20 ms de demora por respuesta: requests/s de consultas
+    # y órdenes con el cliente bloqueante de main2, la fachada sincrónica desde varios hilos
+    # y el cliente asíncrono
+    from concurrent.futures import ThreadPoolExecutor
+
+    from main2 import AuthManager
+    from exchange_sim import ExchangeSimulator
+
+    N = 2000
+    sim = ExchangeSimulator(rate=1e9, burst=1e9, latency=0.020).start()
+    Config.API_BASE_URL = sim.url
+    symbols = [f"GFGC{4000 + 20 * i}0FE" for i in range(50)]
+
+    def reporte(nombre, inicio, n):
+        elapsed = time.perf_counter() - inicio
+        print(f"{nombre:<38} {n / elapsed:8.0f} req/s")
+
+    auth = AuthManager("demo", "demo")
+    md, om = MarketData(auth), OrderManager(auth)
+    inicio = time.perf_counter()
+    for i in range(N // 40):
+        md.get_real_time_data(symbols[i % 50])
+        om.send_order({"symbol": symbols[i % 50], "side": "BUY", "orderQty": 1, "price": 100})
+    # Cada llamada de main2 pide además un token nuevo
+    reporte("main2 bloqueante (secuencial)", inicio, 2 * (N // 40))
+
+    client = PrimaryClient("demo", "demo")
+    with ThreadPoolExecutor(16) as pool:
+        inicio = time.perf_counter()
+        list(pool.map(lambda i: (client.md.get_real_time_data(symbols[i % 50]),
+                                 client.om.send_order({"symbol": symbols[i % 50], "side": "BUY",
+                                                       "orderQty": 1, "price": 100})), range(N // 2)))
+    reporte("Fachada sincrónica (16 hilos)", inicio, N)
+    client.close()
+
+    async def flujo(api, i):
+        await api.md.get_real_time_data(symbols[i % 50])
+        await api.om.send_order({"symbol": symbols[i % 50], "side": "BUY", "orderQty": 1, "price": 100})
+
+    async def benchmark(concurrencia):
+        async with AsyncPrimaryClient("demo", "demo", max_connections=concurrencia) as api:
+            await api.auth.get_token()
+            sem = asyncio.Semaphore(concurrencia)
+
+            async def limitado(i):
+                async with sem:
+                    await flujo(api, i)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(limitado(i) for i in range(N // 2)))
+            reporte(f"Asíncrono ({concurrencia} flujos concurrentes)", inicio, N)
+
+    for concurrencia in (1, 10, 50, 100):
+        asyncio.run(benchmark(concurrencia))
+    print(f"Mensajes recibidos por el mock: {sim.messages}, rechazos: {sim.rejects}")
+    sim.stop()
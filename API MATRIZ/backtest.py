@@ -0,0 +1,588 @@
+"""
+Backtester por eventos para OptionsStrategies
+Reproduce en orden de timestamp los ticks que graba DB/script-db.py en la tabla
+opciones_ggal, a través de un MarketData/OrderManager simulados con fills al
+bid/ask y comisiones. La carga y actualización de precios es vectorizada: el
+bucle de Python corre una vez por snapshot (timestamp), no por tick.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from main2 import Config, RiskManager, OptionsStrategies
+from payoff import payoff_matrix
+
+GGAL_SYMBOL_RE = re.compile(r'^GFG([CV])(\d+)([A-Z]{2})$')
+
+TICK_QUERY = """
+SELECT simbolo, bid, ask, tamano_bid, tamano_ask, ultimo, fecha_hora
+FROM opciones_ggal
+WHERE fecha_hora >= ? AND fecha_hora < ?
+ORDER BY fecha_hora, id
+"""
+
+# ==========================
+# LECTURA DE TICKS
+# ==========================
+class TickStream:
+    """Lee la tabla opciones_ggal por bloques y la entrega como arrays de NumPy
+        con los símbolos codificados en enteros estables entre bloques"""
+
+    def __init__(self, db_path, start=None, end=None, chunksize=250_000):
+        self.db_path = db_path
+        self.start = start or '0000-01-01'
+        self.end = end or '9999-12-31'
+        self.chunksize = chunksize
+        self.codes = {}  # símbolo -> código
+        self.symbols = []  # código -> símbolo
+
+    def _encode(self, simbolos):
+        for simbolo in pd.unique(simbolos):
+            if simbolo not in self.codes:
+                self.codes[simbolo] = len(self.symbols)
+                self.symbols.append(simbolo)
+        return pd.Series(simbolos).map(self.codes).to_numpy(np.int64)
+
+    def __iter__(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            for chunk in pd.read_sql_query(TICK_QUERY, conn, params=(self.start, self.end),
+                                           chunksize=self.chunksize):
+                yield {
+                    'ts': pd.to_datetime(chunk['fecha_hora']).to_numpy('datetime64[ns]').astype(np.int64),
+                    'code': self._encode(chunk['simbolo'].to_numpy()),
+                    'bid': chunk['bid'].to_numpy(np.float64, na_value=np.nan),
+                    'ask': chunk['ask'].to_numpy(np.float64, na_value=np.nan),
+                    'bid_size': chunk['tamano_bid'].to_numpy(np.float64, na_value=0),
+                    'ask_size': chunk['tamano_ask'].to_numpy(np.float64, na_value=0),
+                    'last': chunk['ultimo'].to_numpy(np.float64, na_value=np.nan),
+                }
+        finally:
+            conn.close()
+
+    def events(self):
+        """Agrupa los ticks por timestamp; el último grupo de cada bloque se
+            retiene hasta el siguiente para no partir un snapshot en dos"""
+        carry = None
+        for chunk in self:
+            if carry is not None:
+                chunk = {k: np.concatenate([carry[k], chunk[k]]) for k in chunk}
+            ts = chunk['ts']
+            if len(ts) == 0:
+                continue
+            bounds = np.flatnonzero(np.diff(ts)) + 1
+            starts = np.concatenate([[0], bounds])
+            ends = np.concatenate([bounds, [len(ts)]])
+            for s, e in zip(starts[:-1], ends[:-1]):
+                yield ts[s], {k: v[s:e] for k, v in chunk.items()}
+            carry = {k: v[starts[-1]:] for k, v in chunk.items()}
+        if carry is not None and len(carry['ts']):
+            yield carry['ts'][0], carry
+
+
+# ==========================
+# MARKET DATA SIMULADO
+# ==========================
+class SimulatedMarketData:
+    """Último bid/ask/last conocido por símbolo, con la misma interfaz que MarketData
+        Al cambiar de día guarda el cierre de cada símbolo para la volatilidad histórica;
+        como la cinta sólo tiene opciones, el subyacente se estima por paridad put-call"""
+
+    def __init__(self, stream, capacity=256):
+        self.stream = stream
+        self.now = None
+        self.closes = []   # marcas de cierre de cada día por código
+        self.spots = []    # subyacente por paridad al cierre de cada día
+        self._day = None
+        self._contracts = {}  # código -> (vencimiento, strike, tipo) o None
+        self.bid = np.full(capacity, np.nan)
+        self.ask = np.full(capacity, np.nan)
+        self.bid_size = np.zeros(capacity)
+        self.ask_size = np.zeros(capacity)
+        self.last = np.full(capacity, np.nan)
+        self.requests = 0
+
+    def _ensure(self, size):
+        capacity = len(self.bid)
+        if size <= capacity:
+            return
+        new = max(size, capacity * 2)
+        for name, fill in (('bid', np.nan), ('ask', np.nan), ('bid_size', 0.0),
+                           ('ask_size', 0.0), ('last', np.nan)):
+            arr = np.full(new, fill)
+            arr[:capacity] = getattr(self, name)
+            setattr(self, name, arr)
+
+    def apply(self, ts, ticks):
+        """Aplicar un snapshot completo de forma vectorizada"""
+        day = ts // 86_400_000_000_000
+        if self._day is not None and day != self._day:
+            marks = self.mark()
+            self.closes.append(marks)
+            self.spots.append(self.parity_spot(marks))
+        self._day = day
+        self.now = ts
+        codes = ticks['code']
+        self._ensure(int(codes.max()) + 1)
+        self.bid[codes] = ticks['bid']
+        self.ask[codes] = ticks['ask']
+        self.bid_size[codes] = ticks['bid_size']
+        self.ask_size[codes] = ticks['ask_size']
+        self.last[codes] = ticks['last']
+
+    def code(self, symbol):
+        return self.stream.codes.get(symbol)
+
+    def mark(self):
+        """Precio de valuación por símbolo: punto medio, o último si falta una punta"""
+        n = len(self.stream.symbols)
+        bid, ask, last = self.bid[:n], self.ask[:n], self.last[:n]
+        mid = (bid + ask) / 2
+        return np.where(np.isnan(mid), last, mid)
+
+    def parity_spot(self, marks=None):
+        """Subyacente implícito C - P + K: mediana de los pares del vencimiento con más strikes"""
+        marks = self.mark() if marks is None else marks
+        pairs = {}  # vencimiento -> strike -> {tipo: marca}
+        for code, symbol in enumerate(self.stream.symbols[:len(marks)]):
+            if code not in self._contracts:
+                m = GGAL_SYMBOL_RE.match(symbol)
+                self._contracts[code] = None if m is None else (
+                    m.group(3), float(m.group(2)) / Config.SYMBOL_MAP['GGAL']['strike_divisor'], m.group(1))
+            contract = self._contracts[code]
+            if contract is not None and not np.isnan(marks[code]):
+                pairs.setdefault(contract[0], {}).setdefault(contract[1], {})[contract[2]] = marks[code]
+        forwards = [[k + p['C'] - p['V'] for k, p in chain.items() if 'C' in p and 'V' in p]
+                    for chain in pairs.values()]
+        forwards = max(forwards, key=len, default=[])
+        return float(np.median(forwards)) if forwards else np.nan
+
+    def get_historical_volatility(self, symbol, days=Config.VOLATILITY_WINDOW):
+        """Volatilidad anualizada de cierre a cierre sobre los días ya reproducidos
+            (el día en curso cuenta con su última marca); 0.0 si todavía no hay dos días"""
+        code = self.code(symbol)
+        if code is None:
+            closes = self.spots[-days:] + [self.parity_spot()]
+        else:
+            marks = self.mark()
+            closes = [c[code] if code < len(c) else np.nan for c in self.closes[-days:] + [marks]]
+        closes = np.array(closes, dtype=float)
+        closes = closes[np.isfinite(closes) & (closes > 0)]
+        if len(closes) < 3:
+            return 0.0
+        return float(np.std(np.diff(np.log(closes))) * np.sqrt(252))
+
+    def get_real_time_data(self, symbol, entries="BI,OF,LA,OP,CL,SE,OI"):
+        self.requests += 1
+        i = self.code(symbol)
+        if i is None:
+            return None
+        date = int(self.now // 1_000_000) if self.now is not None else None
+        market_data = {
+            'BI': [{'price': float(self.bid[i]), 'size': float(self.bid_size[i])}] if not np.isnan(self.bid[i]) else [],
+            'OF': [{'price': float(self.ask[i]), 'size': float(self.ask_size[i])}] if not np.isnan(self.ask[i]) else [],
+            'LA': {'price': float(self.last[i]), 'size': None, 'date': date} if not np.isnan(self.last[i]) else None,
+        }
+        return {'status': 'OK', 'marketData': market_data, 'depth': 1, 'aggregated': True}
+
+
+# ==========================
+# EJECUCIÓN SIMULADA
+# ==========================
+class SimulatedOrderManager:
+    """Ejecuta órdenes contra el último bid/ask grabado
+        - BUY se ejecuta al ask y SELL al bid
+        - Con cross_spread=True (por defecto) las órdenes limitadas se tratan como
+          agresivas, porque las estrategias cotizan al último precio operado
+        - Con cross_spread=False las limitadas no marketables quedan en espera y
+          se ejecutan cuando el mercado las alcanza
+        - Se rechaza (también al llegar el precio de una limitada en espera) toda orden
+          que deje el efectivo por debajo del margen de la cartera: por vencimiento, la
+          peor pérdida al vencimiento de las opciones con el subyacente entre 0 y
+          margin_stress veces el strike mayor. Las compras pagan la prima, los spreads
+          cubiertos sólo inmovilizan su ancho y las ventas descubiertas la pérdida del
+          escenario extremo"""
+
+    def __init__(self, md, initial_cash=1_000_000.0, multiplier=None,
+                 fee_rate=0.006, fee_per_contract=0.0, cross_spread=True, margin_stress=1.5):
+        self.md = md
+        self.cash = float(initial_cash)
+        self.multiplier = multiplier or Config.SYMBOL_MAP['GGAL']['multiplier']
+        self.fee_rate = fee_rate
+        self.fee_per_contract = fee_per_contract
+        self.cross_spread = cross_spread
+        self.margin_stress = margin_stress
+        self.positions = np.zeros(256)
+        self.fees = 0.0
+        self.fills = []
+        self.pending = []
+        self.rejects = 0
+        self._next_id = 1
+        self._contracts = {}  # código -> (vencimiento, strike, tipo) o None si no es una opción de GGAL
+
+    def _ensure_positions(self, size):
+        if size > len(self.positions):
+            positions = np.zeros(max(size, len(self.positions) * 2))
+            positions[:len(self.positions)] = self.positions
+            self.positions = positions
+
+    def _fee(self, qty, price):
+        return price * qty * self.multiplier * self.fee_rate + qty * self.fee_per_contract
+
+    def _contract(self, code):
+        if code not in self._contracts:
+            m = GGAL_SYMBOL_RE.match(self.md.stream.symbols[code])
+            self._contracts[code] = None if m is None else (
+                m.group(3), float(m.group(2)) / Config.SYMBOL_MAP['GGAL']['strike_divisor'],
+                1 if m.group(1) == 'C' else -1)
+        return self._contracts[code]
+
+    def margin(self, positions=None):
+        """Margen requerido por las opciones en cartera (pesos)"""
+        positions = self.positions if positions is None else positions
+        groups = {}
+        for code in np.flatnonzero(positions):
+            contract = self._contract(int(code))
+            if contract is not None:
+                groups.setdefault(contract[0], []).append((positions[code],) + contract[1:])
+        total = 0.0
+        for legs in groups.values():
+            qty, strike, kind = (np.array(v) for v in zip(*legs))
+            prices = np.union1d([0.0, self.margin_stress * strike.max()], strike)
+            pnl = payoff_matrix(prices, qty, strike, kind, np.zeros(len(qty)))
+            total += max(0.0, -float(pnl.min())) * self.multiplier
+        return total
+
+    def buying_power(self):
+        return self.cash - self.margin()
+
+    def _affordable(self, code, side, qty, price):
+        """True si después del fill el efectivo cubre el margen de la cartera"""
+        self._ensure_positions(code + 1)
+        signed = qty if side == 'BUY' else -qty
+        positions = self.positions.copy()
+        positions[code] += signed
+        cash = self.cash - signed * price * self.multiplier - self._fee(qty, price)
+        return cash >= self.margin(positions)
+
+    def _fill(self, order_id, code, side, qty, price):
+        self._ensure_positions(code + 1)
+        fee = self._fee(qty, price)
+        signed = qty if side == 'BUY' else -qty
+        self.positions[code] += signed
+        self.cash -= signed * price * self.multiplier + fee
+        self.fees += fee
+        self.fills.append((self.md.now, order_id, self.md.stream.symbols[code], side, qty, price, fee))
+
+    def send_order(self, order_params):
+        symbol = order_params.get('symbol')
+        side = str(order_params.get('side', '')).upper()
+        qty = int(order_params.get('orderQty') or 0)
+        ord_type = str(order_params.get('ordType', 'LIMIT')).upper()
+        limit = order_params.get('price')
+        code = self.md.code(symbol)
+
+        if code is None or qty <= 0 or side not in ('BUY', 'SELL') or (ord_type != 'MARKET' and limit is None):
+            self.rejects += 1
+            return None
+
+        order_id = str(self._next_id)
+        self._next_id += 1
+        touch = self.md.ask[code] if side == 'BUY' else self.md.bid[code]
+
+        if np.isnan(touch):
+            if ord_type == 'MARKET' or self.cross_spread:
+                self.rejects += 1
+                return None
+        elif ord_type == 'MARKET' or self.cross_spread or \
+                (side == 'BUY' and limit >= touch) or (side == 'SELL' and limit <= touch):
+            if not self._affordable(code, side, qty, float(touch)):
+                self.rejects += 1
+                return None
+            self._fill(order_id, code, side, qty, float(touch))
+            return {'status': 'OK', 'order': {'clientId': order_id, 'proprietary': 'PBCP'}}
+
+        self.pending.append((order_id, code, side, qty, float(limit)))
+        return {'status': 'OK', 'order': {'clientId': order_id, 'proprietary': 'PBCP'}}
+
+    def match_pending(self, codes):
+        """Revisar las limitadas en espera sólo para los símbolos del snapshot"""
+        if not self.pending:
+            return
+        touched = set(codes.tolist())
+        still = []
+        for order_id, code, side, qty, limit in self.pending:
+            if code in touched:
+                touch = self.md.ask[code] if side == 'BUY' else self.md.bid[code]
+                if not np.isnan(touch) and ((side == 'BUY' and limit >= touch) or
+                                            (side == 'SELL' and limit <= touch)):
+                    if self._affordable(code, side, qty, float(touch)):
+                        self._fill(order_id, code, side, qty, float(touch))
+                    else:
+                        self.rejects += 1
+                    continue
+            still.append((order_id, code, side, qty, limit))
+        self.pending = still
+
+    def equity(self):
+        n = len(self.md.stream.symbols)
+        self._ensure_positions(n)
+        positions = self.positions[:n]
+        held = positions != 0
+        if not held.any():
+            return self.cash
+        marks = self.md.mark()[held]
+        return self.cash + float(np.nansum(positions[held] * marks)) * self.multiplier
+
+
+class SimulatedRiskManager(RiskManager):
+    """RiskManager que toma el poder de compra de la cuenta simulada (efectivo menos margen)
+        y dimensiona en contratos: la prima por acción se lleva a prima por contrato, y las
+        patas compradas (que se envían antes que las vendidas) tienen que entrar en el efectivo"""
+
+    def __init__(self, om):
+        super().__init__(auth=None)
+        self.om = om
+
+    def get_account_balance(self):
+        return max(self.om.buying_power(), 0.0)
+
+    def _ask(self, leg):
+        # Las compras se ejecutan al ask, no al último operado con el que cotiza la estrategia
+        code = self.om.md.code(leg['symbol'])
+        ask = self.om.md.ask[code] if code is not None else np.nan
+        return leg['price'] if np.isnan(ask) else max(ask, leg['price'])
+
+    def size_for_balance(self, balance, premium, stop_loss_pct=0.10, legs=None, contracts=1):
+        if not premium:
+            return 0
+        size = super().size_for_balance(balance, premium * self.om.multiplier, stop_loss_pct, legs, contracts)
+        bought = sum(leg['qty'] * self._ask(leg) for leg in legs or [] if leg['qty'] > 0)
+        if bought > 0:
+            per_unit = bought * self.om.multiplier * (1 + self.om.fee_rate) * contracts
+            size = min(size, int(balance // per_unit))
+        return size
+
+
+# ==========================
+# MOTOR DE BACKTEST
+# ==========================
+class BacktestEngine:
+    """Reproduce los ticks grabados y llama a la estrategia en cada snapshot
+        La estrategia es un callable strategy(engine, ts, codes) que opera con
+        engine.strategies (un OptionsStrategies con md/om/rm simulados)"""
+
+    def __init__(self, db_path, strategy=None, start=None, end=None,
+                 initial_cash=1_000_000.0, fee_rate=0.006, fee_per_contract=0.0,
+                 cross_spread=True, chunksize=250_000):
+        self.stream = TickStream(db_path, start, end, chunksize)
+        self.md = SimulatedMarketData(self.stream)
+        self.om = SimulatedOrderManager(self.md, initial_cash, fee_rate=fee_rate,
+                                        fee_per_contract=fee_per_contract,
+                                        cross_spread=cross_spread)
+        self.rm = SimulatedRiskManager(self.om)
+
+        self.strategies = OptionsStrategies(auth=None)
+        self.strategies.md = self.md
+        self.strategies.om = self.om
+        self.strategies.rm = self.rm
+
+        self.strategy = strategy
+        self.ticks = 0
+        self.events = 0
+        self.elapsed = 0.0
+        self._equity_ts = []
+        self._equity = []
+
+    @property
+    def symbols(self):
+        return self.stream.symbols
+
+    def run(self):
+        started = time.perf_counter()
+        for ts, ticks in self.stream.events():
+            self.md.apply(ts, ticks)
+            self.om.match_pending(ticks['code'])
+            if self.strategy is not None:
+                try:
+                    self.strategy(self, ts, ticks['code'])
+                except Exception as e:
+                    print(f"Error en la estrategia ({pd.Timestamp(ts)}): {e}")
+            self._equity_ts.append(ts)
+            self._equity.append(self.om.equity())
+            self.ticks += len(ticks['code'])
+            self.events += 1
+        self.elapsed = time.perf_counter() - started
+        return self.results()
+
+    def results(self):
+        equity = pd.Series(self._equity, index=pd.to_datetime(np.array(self._equity_ts, dtype='datetime64[ns]')),
+                           name='equity', dtype=float)
+        fills = pd.DataFrame(self.om.fills, columns=['fecha_hora', 'order_id', 'simbolo', 'side', 'qty', 'price', 'fee'])
+        if not fills.empty:
+            fills['fecha_hora'] = pd.to_datetime(fills['fecha_hora'])
+        return {
+            'equity': equity,
+            'fills': fills,
+            'final_equity': equity.iloc[-1] if len(equity) else self.om.cash,
+            'fees': self.om.fees,
+            'rejects': self.om.rejects,
+            'ticks': self.ticks,
+            'events': self.events,
+            'elapsed': self.elapsed,
+            'ticks_per_sec': self.ticks / self.elapsed if self.elapsed else 0.0,
+            'events_per_sec': self.events / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+# ==========================
+# ESTRATEGIA DE EJEMPLO
+# ==========================
+
+class DemoBullCallSpread:
+    """Abre un único bull call spread en el primer vencimiento, comprando el call del
+        strike más cercano al dinero (call y put de igual precio) y vendiendo el siguiente,
+        y lo mantiene hasta el final"""
+
+    def __init__(self):
+        self.done = False
+
+    def __call__(self, engine, ts, codes):
+        if self.done:
+            return
+
+        marks = engine.md.mark()
+        chains = {}  # vencimiento -> strike -> {'C': mark, 'V': mark}
+        for code, simbolo in enumerate(engine.symbols):
+            m = GGAL_SYMBOL_RE.match(simbolo)
+            if m and not np.isnan(marks[code]):
+                chains.setdefault(m.group(3), {}).setdefault(int(m.group(2)), {})[m.group(1)] = marks[code]
+        if not chains:
+            return
+        chain = chains[sorted(chains)[0]]
+        pairs = {k: abs(p['C'] - p['V']) for k, p in chain.items() if 'C' in p and 'V' in p}
+        if not pairs:
+            return
+        atm = min(pairs, key=pairs.get)
+        above = sorted(k for k in chain if k > atm and 'C' in chain[k])
+        if not above:
+            return
+        engine.strategies.vertical_spread('bull_call', 'GGAL', sorted(chains)[0],
+                                          short_strike=above[0], long_strike=atm)
+        self.done = True
+
+
+class DemoStraddle:
+    """Compra un straddle en el strike más cercano al dinero del primer vencimiento con
+        volatility_play, una vez que hay `min_days` cierres para la volatilidad histórica"""
+
+    def __init__(self, min_days=5):
+        self.min_days = min_days
+        self.result = None
+
+    def __call__(self, engine, ts, codes):
+        if self.result is not None or len(engine.md.closes) < self.min_days:
+            return
+        spot = engine.md.parity_spot()
+        strikes = {}  # vencimiento -> strikes del símbolo (formato 40000)
+        for simbolo in engine.symbols:
+            m = GGAL_SYMBOL_RE.match(simbolo)
+            if m:
+                strikes.setdefault(m.group(3), set()).add(int(m.group(2)))
+        if not strikes or np.isnan(spot):
+            return
+        expiry = sorted(strikes)[0]
+        divisor = Config.SYMBOL_MAP['GGAL']['strike_divisor']
+        atm = min(strikes[expiry], key=lambda k: abs(k / divisor - spot))
+        self.result = engine.strategies.volatility_play('straddle', 'GGAL', expiry, atm)
+
+
+# ==========================
+# BENCHMARK
+# ==========================
+def create_synthetic_db(path, days=21, strikes=20, interval=10, seed=0):
+    """Genera una cinta GGAL sintética con el esquema del grabador:
+        strikes calls + strikes puts, un snapshot cada `interval` segundos de 11 a 17 hs"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS opciones_ggal (
+            id INTEGER PRIMARY KEY, simbolo VARCHAR, vencimiento VARCHAR, tipo_opcion VARCHAR,
+            strike FLOAT, tamano_bid INTEGER, bid FLOAT, ask FLOAT, tamano_ask INTEGER,
+            ultimo FLOAT, cambio FLOAT, apertura FLOAT, maximo FLOAT, minimo FLOAT,
+            cierre_previo FLOAT, monto_operado FLOAT, volumen INTEGER, operaciones INTEGER,
+            fecha_hora DATETIME, timestamp DATETIME)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_opciones_ggal_fecha_hora ON opciones_ggal (fecha_hora)")
+
+    strike_grid = 4000 + 200 * np.arange(strikes)
+    symbols = [f"GFGC{k * 10}FE" for k in strike_grid] + [f"GFGV{k * 10}FE" for k in strike_grid]
+    is_call = np.array([True] * strikes + [False] * strikes)
+    k = np.concatenate([strike_grid, strike_grid]).astype(float)
+
+    spot = 5000.0
+    day = datetime(2024, 2, 1)
+    n_snap = 6 * 3600 // interval
+    for _ in range(days):
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        path_s = spot * np.exp(np.cumsum(rng.normal(0, 0.0005, n_snap)))
+        spot = path_s[-1]
+        intrinsic = np.where(is_call[None, :], path_s[:, None] - k[None, :], k[None, :] - path_s[:, None])
+        mid = np.maximum(intrinsic, 0) + 150 * np.exp(-((path_s[:, None] - k[None, :]) / 800) ** 2) + 5
+        spread = np.maximum(mid * 0.02, 1.0)
+        stamps = [(day + timedelta(hours=11, seconds=int(i * interval))).strftime('%Y-%m-%d %H:%M:%S.%f')
+                  for i in range(n_snap)]
+        rows = [
+            (symbols[j], 'FE', 'Call' if is_call[j] else 'Put', float(k[j]), 10,
+             float(mid[i, j] - spread[i, j]), float(mid[i, j] + spread[i, j]), 10,
+             float(mid[i, j]), stamps[i])
+            for i in range(n_snap) for j in range(len(symbols))
+        ]
+        conn.executemany(
+            "INSERT INTO opciones_ggal (simbolo, vencimiento, tipo_opcion, strike, tamano_bid, bid, ask, "
+            "tamano_ask, ultimo, fecha_hora) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        day += timedelta(days=1)
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest de OptionsStrategies sobre la cinta grabada de opciones GGAL")
+    parser.add_argument('db', nargs='?', help="Ruta a opciones_ggal.db (si se omite se genera una cinta sintética)")
+    parser.add_argument('--start', help="Fecha inicial (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Fecha final exclusiva (YYYY-MM-DD)")
+    parser.add_argument('--days', type=int, default=21, help="Días de la cinta sintética")
+    parser.add_argument('--interval', type=int, default=10, help="Segundos entre snapshots sintéticos")
+    args = parser.parse_args()
+
+    db_path = args.db
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(), 'opciones_ggal_sintetico.db')
+        print(f"Generando cinta sintética de {args.days} días en {db_path} ...")
+        create_synthetic_db(db_path, days=args.days, interval=args.interval)
+
+    engine = BacktestEngine(db_path, strategy=DemoBullCallSpread(), start=args.start, end=args.end)
+    res = engine.run()
+
+    print(f"Ticks: {res['ticks']:,}  Snapshots: {res['events']:,}  Tiempo: {res['elapsed']:.2f}s")
+    print(f"Throughput: {res['ticks_per_sec']:,.0f} ticks/s  {res['events_per_sec']:,.0f} eventos/s")
+    print(f"Fills: {len(res['fills'])}  Rechazos: {res['rejects']}  Comisiones: {res['fees']:,.2f}")
+    print(f"Equity final: {res['final_equity']:,.2f}")
+
+    # volatility_play sin superficie: la IV de referencia es la histórica del subyacente por paridad
+    straddle = DemoStraddle()
+    res = BacktestEngine(db_path, strategy=straddle, start=args.start, end=args.end).run()
+    if straddle.result is None:
+        print("Straddle: no se abrió (faltan días de cinta)")
+    else:
+        print(f"Straddle: vol histórica {straddle.result['implied_vol']:.1%}  costo {straddle.result['total_cost']:,.2f}  "
+              f"fills {len(res['fills'])}  rechazos {res['rejects']}  equity final {res['final_equity']:,.2f}")
@@ -0,0 +1,118 @@
+"""
+Black-Scholes vectorizado para opciones europeas
+Precio, griegas y volatilidad implícita sobre arrays de NumPy (sin scipy):
+todas las funciones aceptan escalares o arrays que se combinan por broadcasting.
+t en años, vol y rate anualizados, is_call booleano.
+"""
+
+import numpy as np
+
+_SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def norm_cdf(x):
+    """Normal acumulada (Abramowitz-Stegun 26.2.17, error < 7.5e-8)"""
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x)
+    k = 1.0 / (1.0 + 0.2316419 * z)
+    poly = k * (0.319381530 + k * (-0.356563782 + k * (1.781477937 + k * (-1.821255978 + k * 1.330274429))))
+    tail = norm_pdf(z) * poly
+    return np.where(x >= 0, 1.0 - tail, tail)
+
+
+def _d1_d2(spot, strike, t, vol, rate):
+    sqrt_t = np.sqrt(t)
+    vs = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / vs
+    return d1, d1 - vs, sqrt_t
+
+
+def bs_price(spot, strike, t, vol, is_call, rate=0.0):
+    """Precio europeo; con t o vol nulos devuelve el valor intrínseco"""
+    spot, strike, t, vol = (np.asarray(a, dtype=float) for a in (spot, strike, t, vol))
+    is_call = np.asarray(is_call, dtype=bool)
+    vivo = (t > 0) & (vol > 0)
+    todos_vivos = bool(vivo.all())
+    t_ = t if todos_vivos else np.where(vivo, t, 1.0)
+    vol_ = vol if todos_vivos else np.where(vivo, vol, 1.0)
+    d1, d2, _ = _d1_d2(spot, strike, t_, vol_, rate)
+    kdf = strike * np.exp(-rate * t_)
+    call = spot * norm_cdf(d1) - kdf * norm_cdf(d2)
+    # Put por paridad put-call: una sola evaluación de la normal por opción
+    precio = np.where(is_call, call, call - spot + kdf)
+    if todos_vivos:
+        return precio
+    intrinseco = np.maximum(np.where(is_call, spot - strike, strike - spot), 0.0)
+    return np.where(vivo, precio, intrinseco)
+
+
+def bs_greeks(spot, strike, t, vol, is_call, rate=0.0):
+    """Delta, gamma, vega (por 1.00 de vol), theta (por año) y rho como dict de arrays"""
+    spot, strike, t, vol = (np.asarray(a, dtype=float) for a in (spot, strike, t, vol))
+    is_call = np.asarray(is_call, dtype=bool)
+    vivo = (t > 0) & (vol > 0)
+    t_ = np.where(vivo, t, 1.0)
+    vol_ = np.where(vivo, vol, 1.0)
+    d1, d2, sqrt_t = _d1_d2(spot, strike, t_, vol_, rate)
+    df = np.exp(-rate * t_)
+    pdf = norm_pdf(d1)
+    nd1, nd2 = norm_cdf(d1), norm_cdf(d2)
+
+    delta = np.where(is_call, nd1, nd1 - 1.0)
+    gamma = pdf / (spot * vol_ * sqrt_t)
+    vega = spot * pdf * sqrt_t
+    theta_comun = -spot * pdf * vol_ / (2.0 * sqrt_t)
+    theta = np.where(is_call, theta_comun - rate * strike * df * nd2,
+                     theta_comun + rate * strike * df * (1.0 - nd2))
+    rho = np.where(is_call, strike * t_ * df * nd2, -strike * t_ * df * (1.0 - nd2))
+
+    # Vencidas o sin volatilidad: delta intrínseca, el resto cero
+    itm = np.where(is_call, spot > strike, spot < strike)
+    delta_intr = np.where(itm, np.where(is_call, 1.0, -1.0), 0.0)
+    cero = np.zeros_like(gamma)
+    return {
+        'delta': np.where(vivo, delta, delta_intr),
+        'gamma': np.where(vivo, gamma, cero),
+        'vega': np.where(vivo, vega, cero),
+        'theta': np.where(vivo, theta, cero),
+        'rho': np.where(vivo, rho, cero),
+    }
+
+
+def implied_vol(price, spot, strike, t, is_call, rate=0.0, tol=1e-6, max_iter=50,
+                vol_min=1e-4, vol_max=5.0):
+    """Volatilidad implícita vectorizada: Newton con salvaguarda de bisección
+        Devuelve NaN donde el precio está fuera de los límites de no arbitraje"""
+    price, spot, strike, t = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, spot, strike, t)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    df = np.exp(-rate * t)
+    inferior = np.maximum(np.where(is_call, spot - strike * df, strike * df - spot), 0.0)
+    superior = np.where(is_call, spot, strike * df)
+    valido = (t > 0) & (price > inferior) & (price < superior) & np.isfinite(price)
+
+    bajo = np.full(price.shape, vol_min)
+    alto = np.full(price.shape, vol_max)
+    # Arranque de Brenner-Subrahmanyam, acotado al intervalo
+    vol = np.clip(np.sqrt(2.0 * np.pi / np.where(t > 0, t, 1.0)) * price / spot, 0.05, 2.0)
+    activo = valido.copy()
+    for _ in range(max_iter):
+        if not activo.any():
+            break
+        d1, d2, sqrt_t = _d1_d2(spot, strike, np.where(activo, t, 1.0), vol, rate)
+        modelo = np.where(is_call,
+                          spot * norm_cdf(d1) - strike * df * norm_cdf(d2),
+                          strike * df * norm_cdf(-d2) - spot * norm_cdf(-d1))
+        error = modelo - price
+        activo &= np.abs(error) > tol
+        alto = np.where(activo & (error > 0), vol, alto)
+        bajo = np.where(activo & (error < 0), vol, bajo)
+        vega = spot * norm_pdf(d1) * sqrt_t
+        newton = vol - error / np.where(vega > 1e-12, vega, np.nan)
+        # Si Newton sale del intervalo (o la vega es ínfima) se usa bisección
+        fuera = ~np.isfinite(newton) | (newton <= bajo) | (newton >= alto)
+        vol = np.where(activo, np.where(fuera, 0.5 * (bajo + alto), newton), vol)
+    return np.where(valido, vol, np.nan)
@@ -0,0 +1,312 @@
+"""
+Cobertura automática de delta de la cartera de opciones
+DeltaHedger recibe los ticks del subyacente (on_tick, desde el callback del feed
+sin bloquearlo) y en un hilo propio recalcula el delta neto de la cartera con el
+RiskEngine (griegas de todas las patas con la IV de la superficie si la tiene)
+más la posición de cobertura. Si el delta sale de la banda, envía por el
+OrderManager la orden en el subyacente (acciones de GGAL o futuros de DLR) que
+lo devuelve al objetivo.
+
+Los ticks se agrupan: la evaluación espera `debounce` segundos sin ticks nuevos
+(o como máximo `max_delay` desde el primero de la ráfaga) y usa sólo el último
+precio, y entre dos órdenes pasan al menos `min_interval` segundos. Una ráfaga
+de ticks produce entonces a lo sumo una orden.
+
+La posición de cobertura sale de los execution reports del OrderStore (un OK del
+REST sólo dice que la orden entró al libro): cada fill la mueve, y lo enviado
+que todavía no se ejecutó cuenta como en vuelo para no volver a mandarlo. Una
+orden sin ejecutar después de `order_timeout` segundos se cancela y lo que
+falte se vuelve a evaluar. Se mide la latencia desde el primer tick de la ráfaga
+hasta el envío, la confirmación y la ejecución completa (delta_hedge_seconds con
+BOT_METRICS=1; la de ejecución también en .latencies).
+
+NaiveHedger es la referencia: evalúa y cubre en cada tick, dentro del callback.
+
+Uso:
+    store = OrderStore('ordenes.jsonl')
+    PrimaryOrderStream(auth, store).start()
+    engine = RiskEngine(multiplier=100, rate=Config.RISK_FREE_RATE)
+    strategies = OptionsStrategies(auth, chain=cadena, engine=engine, store=store)
+    hedger = DeltaHedger(engine, strategies.om, symbol='GGAL', band=200).start()
+    hedger.on_tick(spot, bid, ask)     # desde el feed del subyacente
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+from order_store import FILLED
+
+
+class DeltaHedger:
+    """Cobertura de delta con banda, debounce y espaciado mínimo entre órdenes"""
+
+    def __init__(self, engine, om, symbol='GGAL', hedge_multiplier=1.0, band=100.0, target=0.0,
+                 lot=1, debounce=0.25, max_delay=1.0, min_interval=1.0, position=0.0, order_timeout=5.0,
+                 store=None, history=10_000):
+        self.engine = engine
+        self.om = om
+        self.store = store if store is not None else getattr(om, 'store', None)
+        if self.store is None:
+            raise ValueError("DeltaHedger necesita un OrderStore (om.store) para seguir los fills de la cobertura")
+        self.symbol = symbol
+        # Delta (en acciones) que aporta una unidad del instrumento de cobertura: 1 por acción de GGAL,
+        # el multiplicador del contrato para futuros de DLR
+        self.hedge_multiplier = hedge_multiplier
+        self.band = band
+        self.target = target
+        self.lot = lot
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.min_interval = min_interval
+        self.order_timeout = order_timeout
+        self.position = position  # Unidades del instrumento de cobertura ejecutadas
+        self.ticks = 0
+        self.evaluations = 0
+        self.orders = 0
+        self.rejects = 0
+        self.cancels = 0
+        self.filled = 0.0
+        self.latencies = deque(maxlen=history)    # primer tick de la ráfaga -> orden ejecutada completa
+        self.hedges = deque(maxlen=history)       # (time.monotonic(), cantidad, precio, delta previo)
+
+        self._spot = self._bid = self._ask = None
+        self._first_tick = None   # perf_counter del primer tick no evaluado
+        self._last_tick = None
+        self._last_order = -np.inf
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inflight = {}  # clOrdId -> orden de cobertura enviada y no terminada
+        self.store.add_listener(self._on_order)
+
+    # ---------- entrada ----------
+    def on_tick(self, spot, bid=None, ask=None):
+        """Último precio del subyacente (y sus puntas para el precio límite). No bloquea."""
+        ahora = time.perf_counter()
+        with self._lock:
+            self._spot, self._bid, self._ask = spot, bid, ask
+            if self._first_tick is None:
+                self._first_tick = ahora
+            self._last_tick = ahora
+            self.ticks += 1
+        self._pending.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='delta-hedger', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pending.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    # ---------- bucle ----------
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._pending.wait(0.5):
+                self._expire()
+                continue
+            self._settle()
+            if self._stop.is_set():
+                return
+            with self._lock:
+                self._pending.clear()
+                spot, bid, ask, first = self._spot, self._bid, self._ask, self._first_tick
+                self._first_tick = None
+            if spot is None:
+                continue
+            try:
+                self._expire()
+                self.evaluate(spot, bid, ask, first)
+            except Exception as e:
+                print(f"Error en la cobertura de delta: {e}")
+
+    def _settle(self):
+        """Esperar a que la ráfaga se calme (debounce) sin pasar max_delay, y respetar min_interval"""
+        while not self._stop.is_set():
+            ahora = time.perf_counter()
+            with self._lock:
+                quieto = ahora - self._last_tick
+                desde_primero = ahora - self._first_tick if self._first_tick is not None else 0.0
+            espera = max(min(self.debounce - quieto, self.max_delay - desde_primero),
+                         self._last_order + self.min_interval - ahora)
+            if espera <= 0:
+                return
+            self._stop.wait(espera)
+
+    # ---------- cobertura ----------
+    @property
+    def inflight(self):
+        """Unidades enviadas y todavía sin ejecutar (con signo)"""
+        with self._lock:
+            return sum(o['qty'] - o['filled'] * np.sign(o['qty']) for o in self._inflight.values())
+
+    def net_delta(self, spot):
+        """Delta neto (acciones): cartera de opciones + posición de cobertura ejecutada"""
+        return self.engine.greeks(spot)['delta'] + self.position * self.hedge_multiplier
+
+    def order_qty(self, delta):
+        """Unidades a comprar (+) o vender (-) para volver al objetivo; 0 si está dentro de la banda"""
+        desvio = delta - self.target
+        if abs(desvio) <= self.band:
+            return 0
+        return int(round(-desvio / self.hedge_multiplier / self.lot)) * self.lot
+
+    def evaluate(self, spot, bid=None, ask=None, first_tick=None):
+        """Recalcular el delta (contando lo que está en vuelo) y enviar la orden de cobertura si
+            hace falta; devuelve la cantidad enviada"""
+        self.evaluations += 1
+        self.engine.spot = spot
+        delta = self.net_delta(spot)
+        qty = self.order_qty(delta + self.inflight * self.hedge_multiplier)
+        if qty == 0:
+            return 0
+        # Límite agresivo contra la punta opuesta para calzar al llegar
+        price = (ask if qty > 0 else bid) or spot
+        trace = metrics.trace('delta_hedge', start=None if first_tick is None else int(first_tick * 1e9))
+        result = self.om.send_order({
+            "symbol": self.symbol,
+            "orderQty": abs(qty),
+            "price": price,
+            "ordType": "LIMIT",
+            "side": "BUY" if qty > 0 else "SELL"
+        })
+        trace.mark('order_sent')
+        self._last_order = time.perf_counter()
+        if not result or result.get('status') != 'OK':
+            self.rejects += 1
+            print(f"Cobertura rechazada ({qty} {self.symbol}): {result}")
+            return 0
+        trace.mark('ack')
+        cl_ord_id = str(result['order']['clientId'])
+        with self._lock:
+            self._inflight[cl_ord_id] = {'qty': qty, 'filled': 0.0, 'sent': self._last_order,
+                                         'first_tick': first_tick, 'trace': trace, 'cancelling': False}
+        self.orders += 1
+        self.hedges.append((time.monotonic(), qty, price, delta))
+        # Reportes que llegaron antes de registrar la orden
+        state = self.store.get(cl_ord_id)
+        if state is not None:
+            self._on_order(state, None)
+        return qty
+
+    def _on_order(self, order, event):
+        """Listener del OrderStore: mover la posición con cada fill de una orden de cobertura"""
+        with self._lock:
+            sent = self._inflight.get(order.cl_ord_id)
+            if sent is None:
+                return
+            nuevo = max(order.cum_qty - sent['filled'], 0.0)
+            sent['filled'] = max(order.cum_qty, sent['filled'])
+            self.position += nuevo * np.sign(sent['qty'])
+            self.filled += nuevo
+            if not order.done:
+                return
+            del self._inflight[order.cl_ord_id]
+        if order.status == FILLED:
+            sent['trace'].mark('filled')
+            if sent['first_tick'] is not None:
+                self.latencies.append(time.perf_counter() - sent['first_tick'])
+        else:
+            # Cancelada o rechazada con remanente: volver a evaluar con el último precio
+            self._pending.set()
+
+    def _expire(self):
+        """Cancelar las órdenes de cobertura que siguen sin ejecutarse después de order_timeout"""
+        limite = time.perf_counter() - self.order_timeout
+        with self._lock:
+            vencidas = [cl for cl, o in self._inflight.items() if o['sent'] < limite and not o['cancelling']]
+            for cl in vencidas:
+                self._inflight[cl]['cancelling'] = True
+        for cl in vencidas:
+            result = self.om.cancel_order(cl)
+            if result and result.get('status') == 'OK':
+                self.cancels += 1
+            else:
+                print(f"No se pudo cancelar la cobertura {cl}: {result}")
+
+
+class NaiveHedger(DeltaHedger):
+    """Referencia: cubre en cada tick, dentro del callback del feed"""
+
+    def on_tick(self, spot, bid=None, ask=None):
+        self.ticks += 1
+        self._expire()
+        self.evaluate(spot, bid, ask, time.perf_counter())
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+if __name__ == "__main__":
+    # Benchmark contra el simulador (5 ms por respuesta): un straddle y un ratio spread de GGAL,
+    # ráfagas de ticks del subyacente con un paseo aleatorio que el market maker del simulador
+    # sigue, cubiertos por tick (sin banda y con banda) y con debounce. La posición sale de los
+    # execution reports del canal de órdenes. Se comparan órdenes, fills, bloqueo del feed,
+    # latencia tick -> cobertura ejecutada y el delta neto (ejecutado) que quedó sin cubrir.
+    from main2 import Config, AuthManager, OrderManager
+    from exchange_sim import ExchangeSimulator
+    from order_store import OrderStore, PrimaryOrderStream
+    from risk_engine import RiskEngine
+
+    sim = ExchangeSimulator(rate=1e9, burst=1e9, latency=0.005).start()
+    Config.API_BASE_URL = sim.url
+    auth = AuthManager("bench", "bench")
+    rng = np.random.default_rng(0)
+    spot0 = 4000.0
+    legs = [
+        {'symbol': 'GFGC40000ABR', 'qty': 50, 'strike': 4000.0, 'expiry': 'ABR', 'is_call': True, 'vol': 0.55},
+        {'symbol': 'GFGV40000ABR', 'qty': 50, 'strike': 4000.0, 'expiry': 'ABR', 'is_call': False, 'vol': 0.55},
+        {'symbol': 'GFGC42000ABR', 'qty': 50, 'strike': 4200.0, 'expiry': 'ABR', 'is_call': True, 'vol': 0.52},
+        {'symbol': 'GFGC44000ABR', 'qty': -100, 'strike': 4400.0, 'expiry': 'ABR', 'is_call': True, 'vol': 0.50},
+    ]
+    # 20 ráfagas de 50 ticks (1 ms entre ticks) separadas por 300 ms, un único paseo aleatorio
+    rafagas = np.split(spot0 * np.exp(np.cumsum(rng.normal(0, 0.001, 20 * 50))), 20)
+
+    for nombre, clase, kwargs in (('por tick, sin banda', NaiveHedger, {'band': 0.0}),
+                                  ('por tick, banda 20', NaiveHedger, {'band': 20.0}),
+                                  ('debounce, banda 20', DeltaHedger,
+                                   {'band': 20.0, 'debounce': 0.02, 'max_delay': 0.1, 'min_interval': 0.1})):
+        store = OrderStore()
+        stream = PrimaryOrderStream(auth, store)
+        stream.start()
+        time.sleep(0.3)
+        engine = RiskEngine(multiplier=100, rate=Config.RISK_FREE_RATE)
+        engine.add_legs(legs)
+        hedger = clase(engine, OrderManager(auth, store=store), position=-round(engine.greeks(spot0)['delta']),
+                       **kwargs).start()  # Arranca cubierto
+        bloqueo, desvio = [], []
+        for precios in rafagas:
+            for precio in precios:
+                precio = float(precio)
+                with sim._lock:
+                    sim._mm_quote('GGAL', [('BUY', precio - 0.5, 1e6), ('SELL', precio + 0.5, 1e6)])
+                inicio = time.perf_counter()
+                hedger.on_tick(precio, precio - 0.5, precio + 0.5)
+                bloqueo.append(time.perf_counter() - inicio)
+                time.sleep(0.001)
+            time.sleep(0.3)
+            desvio.append(abs(hedger.net_delta(float(precios[-1]))))
+        hedger.stop()
+        stream.stop()
+        lat = np.array(hedger.latencies) * 1e3
+        print(f"{nombre:<20} ticks {hedger.ticks:>5}  órdenes {hedger.orders:>5}  "
+              f"ejecutado {hedger.filled:>7.0f}  en vuelo {hedger.inflight:>4.0f}  "
+              f"bloqueo del feed p99 {np.percentile(bloqueo, 99) * 1e3:7.2f} ms  "
+              f"tick->fill p50 {np.percentile(lat, 50) if len(lat) else 0:6.1f} ms "
+              f"p99 {np.percentile(lat, 99) if len(lat) else 0:6.1f} ms  "
+              f"|delta| tras cada ráfaga {np.mean(desvio):6.1f} acciones")
+    sim.stop()
@@ -0,0 +1,323 @@
+"""
+Dispatcher de órdenes con límite de mensajes para OrderManager
+Todas las altas, cancelaciones y reemplazos pasan por una cola con tres carriles
+de prioridad (cancelaciones, salidas, entradas) y salen al mercado a la tasa que
+permite un token bucket. Un reemplazo sobre una orden que ya tiene otro reemplazo
+en cola se fusiona con él (sale sólo el último precio/cantidad), y una cancelación
+descarta los reemplazos pendientes de esa orden. Cada reemplazo confirmado deja
+el par clOrdId viejo -> nuevo, así las cancelaciones y reemplazos posteriores
+(aunque se hayan encolado con el id viejo mientras el anterior estaba en vuelo)
+salen contra la orden vigente. Se mide el tiempo de espera en cola por carril.
+
+Uso:
+    om = ThrottledOrderManager(OrderManager(auth))
+    strategies.om = om
+    om.send_order({...}, exit=True)
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from main2 import Config
+
+CANCEL, EXIT, ENTRY = 0, 1, 2
+LANES = {CANCEL: 'cancel', EXIT: 'exit', ENTRY: 'entry'}
+
+
+class TokenBucket:
+    """Token bucket: `rate` mensajes por segundo con ráfagas de hasta `burst`"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Tomar un token si hay; si no, devolver los segundos hasta el próximo"""
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+    def drain(self):
+        self._refill()
+        self.tokens = 0.0
+
+
+class _Request:
+    __slots__ = ('lane', 'action', 'args', 'cl_ord_id', 'future', 'followers', 'enqueued')
+
+    def __init__(self, lane, action, args, cl_ord_id=None):
+        self.lane = lane
+        self.action = action
+        self.args = args
+        self.cl_ord_id = cl_ord_id
+        self.future = Future()
+        self.followers = []  # futures de reemplazos fusionados en este
+        self.enqueued = time.monotonic()
+
+    def resolve(self, result=None, error=None):
+        for future in [self.future] + self.followers:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class OrderDispatcher:
+    """Cola priorizada y limitada en tasa delante de un OrderManager
+        om debe tener send_order(params), cancel_order(id, prop) y replace_order(id, price, qty, prop)"""
+
+    def __init__(self, om, rate=Config.ORDER_RATE_LIMIT, burst=Config.ORDER_BURST, history=10_000):
+        self.om = om
+        self.bucket = TokenBucket(rate, burst)
+        self.sent = 0
+        self.coalesced = 0
+        self.rejects = 0
+        self.retried = 0
+        self.errors = 0
+
+        self._lanes = {lane: deque() for lane in LANES}
+        self._replaces = {}  # clOrdId -> reemplazo en cola
+        self._aliases = {}   # clOrdId reemplazado -> clOrdId que lo reemplazó
+        self._waits = {lane: deque(maxlen=history) for lane in LANES}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='order-dispatcher', daemon=True)
+        self._thread.start()
+
+    # ---------- encolado ----------
+    def new_order(self, order_params, exit=False):
+        return self._submit(EXIT if exit else ENTRY, 'send_order', (order_params,))
+
+    def cancel(self, cl_ord_id, proprietary="PBCP"):
+        return self._submit(CANCEL, 'cancel_order', (cl_ord_id, proprietary), cl_ord_id)
+
+    def replace(self, cl_ord_id, price, order_qty, proprietary="PBCP", exit=False):
+        return self._submit(EXIT if exit else ENTRY, 'replace_order', (cl_ord_id, price, order_qty, proprietary), cl_ord_id)
+
+    def _latest(self, cl_ord_id):
+        """clOrdId vigente de una orden después de los reemplazos ya confirmados"""
+        cl_ord_id = str(cl_ord_id)
+        while cl_ord_id in self._aliases:
+            cl_ord_id = self._aliases[cl_ord_id]
+        return cl_ord_id
+
+    def _submit(self, lane, action, args, cl_ord_id=None):
+        with self._cond:
+            if self._stop:
+                raise RuntimeError("Dispatcher detenido")
+            if cl_ord_id is not None:
+                cl_ord_id = self._latest(cl_ord_id)
+                args = (cl_ord_id,) + args[1:]
+            if action == 'replace_order':
+                pending = self._replaces.get(cl_ord_id)
+                if pending is not None:
+                    # Reemplazo sobre reemplazo: gana el último, la orden conserva su lugar en la cola
+                    pending.args = args
+                    if lane < pending.lane:
+                        self._lanes[pending.lane].remove(pending)
+                        pending.lane = lane
+                        self._lanes[lane].append(pending)
+                    self.coalesced += 1
+                    future = Future()
+                    pending.followers.append(future)
+                    return future
+            elif action == 'cancel_order':
+                pending = self._replaces.pop(cl_ord_id, None)
+                if pending is not None:
+                    # Reemplazar algo que se va a cancelar es un mensaje perdido
+                    self._lanes[pending.lane].remove(pending)
+                    self.coalesced += 1 + len(pending.followers)
+                    pending.resolve({'status': 'COALESCED', 'description': 'Superseded by cancel'})
+
+            request = _Request(lane, action, args, cl_ord_id)
+            self._lanes[lane].append(request)
+            if action == 'replace_order':
+                self._replaces[cl_ord_id] = request
+            self._cond.notify()
+        return request.future
+
+    # ---------- envío ----------
+    def _pending(self):
+        return any(self._lanes.values())
+
+    def _pop(self):
+        for lane in LANES:
+            if self._lanes[lane]:
+                request = self._lanes[lane].popleft()
+                if request.action == 'replace_order' and self._replaces.get(request.cl_ord_id) is request:
+                    del self._replaces[request.cl_ord_id]
+                if request.cl_ord_id is not None:
+                    # Encolado antes de que se confirmara un reemplazo de la misma orden
+                    latest = self._latest(request.cl_ord_id)
+                    if latest != request.cl_ord_id:
+                        request.cl_ord_id = latest
+                        request.args = (latest,) + request.args[1:]
+                return request
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending() and not self._stop:
+                    self._cond.wait()
+                if self._stop and not self._pending():
+                    return
+
+            # Esperar el token fuera del lock, y recién después elegir: una cancelación
+            # que llega durante la espera sale antes que las entradas ya encoladas
+            wait = self.bucket.try_acquire()
+            while wait > 0:
+                time.sleep(wait)
+                wait = self.bucket.try_acquire()
+
+            with self._cond:
+                request = self._pop()
+            if request is None:
+                self.bucket.refund()
+                continue
+            self._dispatch(request)
+
+    def _dispatch(self, request):
+        started = time.monotonic()
+        try:
+            result = getattr(self.om, request.action)(*request.args)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error al enviar {request.action}: {e}")
+            request.resolve(error=e)
+            return
+
+        self.sent += 1
+        if result is not None and 'rate limit' in str(result.get('description', '')).lower():
+            # El mercado igual rechazó por tasa: reencolar adelante y vaciar el bucket
+            self.retried += 1
+            self.bucket.drain()
+            with self._cond:
+                self._lanes[request.lane].appendleft(request)
+                if request.action == 'replace_order':
+                    self._replaces.setdefault(request.cl_ord_id, request)
+            return
+
+        if result is None or result.get('status') != 'OK':
+            self.rejects += 1
+        elif request.action == 'replace_order':
+            self._replaced(request.cl_ord_id, str(result['order']['clientId']))
+        self._waits[request.lane].append(started - request.enqueued)
+        request.resolve(result)
+
+    def _replaced(self, old, new):
+        """Registrar old -> new y pasar al id nuevo el reemplazo que quedó en cola para old"""
+        with self._cond:
+            self._aliases[old] = new
+            pending = self._replaces.pop(old, None)
+            if pending is not None:
+                pending.cl_ord_id = new
+                pending.args = (new,) + pending.args[1:]
+                self._replaces[new] = pending
+
+    def close(self, timeout=None):
+        """Enviar lo que queda en cola y detener el hilo"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    # ---------- métricas ----------
+    def metrics(self):
+        """Espera en cola por carril (ms) y contadores"""
+        with self._cond:
+            queued = {LANES[lane]: len(q) for lane, q in self._lanes.items()}
+        resultado = {'sent': self.sent, 'coalesced': self.coalesced, 'rejects': self.rejects,
+                     'retried': self.retried, 'errors': self.errors, 'queued': queued}
+        for lane, waits in self._waits.items():
+            if waits:
+                ms = np.array(waits) * 1000
+                resultado[LANES[lane]] = {'count': len(ms), 'mean_ms': float(ms.mean()),
+                                          'p50_ms': float(np.percentile(ms, 50)),
+                                          'p95_ms': float(np.percentile(ms, 95)), 'max_ms': float(ms.max())}
+        return resultado
+
+
+class ThrottledOrderManager:
+    """Reemplazo directo de OrderManager para las estrategias: misma interfaz bloqueante,
+        pero cada mensaje pasa por el dispatcher. exit=True manda la orden por el carril
+        de salidas, que tiene prioridad sobre las entradas nuevas."""
+
+    def __init__(self, om, rate=Config.ORDER_RATE_LIMIT, burst=Config.ORDER_BURST, timeout=None):
+        self.dispatcher = OrderDispatcher(om, rate, burst)
+        self.timeout = timeout
+
+    def send_order(self, order_params, exit=False):
+        return self.dispatcher.new_order(order_params, exit).result(self.timeout)
+
+    def cancel_order(self, cl_ord_id, proprietary="PBCP"):
+        return self.dispatcher.cancel(cl_ord_id, proprietary).result(self.timeout)
+
+    def replace_order(self, cl_ord_id, price, order_qty, proprietary="PBCP", exit=False):
+        return self.dispatcher.replace(cl_ord_id, price, order_qty, proprietary, exit).result(self.timeout)
+
+    def metrics(self):
+        return self.dispatcher.metrics()
+
+    def close(self):
+        self.dispatcher.close()
+
+
+if __name__ == "__main__":
+    # Tres estrategias en paralelo contra el mock con límite de 10 mensajes/s (ráfaga 5):
+    # primero sin dispatcher y después con él
+    from main2 import AuthManager, OrderManager
+    from exchange_sim import ExchangeSimulator
+
+    def strategy(om, n, async_api=None):
+        ids = []
+        for i in range(n):
+            r = om.send_order({"symbol": f"GFGC4{i:02d}00FE", "side": "BUY", "orderQty": 1, "price": 100 + i})
+            if r and r.get('status') == 'OK':
+                ids.append(r['order']['clientId'])
+        if ids:
+            # Ráfaga de reemplazos sobre la misma orden (persiguiendo el precio)
+            if async_api is not None:
+                futures = [async_api.replace(ids[0], 101 + k, 1) for k in range(5)]
+                [f.result() for f in futures]
+            else:
+                for k in range(5):
+                    om.replace_order(ids[0], 101 + k, 1)
+            for cl_ord_id in ids[1:3]:
+                om.cancel_order(cl_ord_id)
+        om.send_order({"symbol": "GFGC4000FE", "side": "SELL", "orderQty": 1, "price": 90}, **({'exit': True} if async_api else {}))
+
+    for throttled in (False, True):
+        sim = ExchangeSimulator(rate=10, burst=5).start()
+        Config.API_BASE_URL = sim.url
+        om = OrderManager(AuthManager("demo", "demo"))
+        if throttled:
+            om = ThrottledOrderManager(om, rate=10, burst=5)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=strategy, args=(om, 8, om.dispatcher if throttled else None)) for _ in range(3)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        elapsed = time.perf_counter() - started
+        print(f"{'Con' if throttled else 'Sin'} dispatcher: {sim.messages} mensajes, {sim.rejects} rechazos por tasa, {elapsed:.1f}s")
+        if throttled:
+            for key, value in om.metrics().items():
+                print(f"  {key}: {value}")
+            om.close()
+        sim.stop()
@@ -0,0 +1,730 @@
+"""
+Simulador local de Primary/ROFEX con motor de calce para pruebas de carga y latencia
+Implementa por REST auth/getToken, newSingleOrder, cancelById, replaceById, el
+reporte de cuenta, el maestro de instrumentos, marketdata/get y data/getTrades, y
+por WebSocket las suscripciones de market data ("smd") y de execution reports
+("os"). Cada símbolo tiene un libro límite con prioridad precio-tiempo; las órdenes
+de las estrategias se calzan contra la liquidez del mercado, que sale de:
+    - cotizaciones sintéticas alrededor de un valor teórico (por defecto), o
+    - la reproducción de la tabla opciones_ggal que graba DB/script-db.py.
+Aplica un límite de mensajes por token con un token bucket (los mensajes que lo
+exceden se rechazan igual que en el mercado) y una demora configurable, con
+jitter, en las respuestas REST y en los mensajes de WebSocket.
+
+Uso:
+    sim = ExchangeSimulator(rate=10, burst=5, latency=0.005, jitter=0.002).start()
+    sim.replay('../DB/opciones_ggal.db', speed=10)
+    Config.API_BASE_URL = sim.url
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import queue
+import random
+import struct
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from dispatcher import TokenBucket
+
+MARKET_MAKER = 'MM'  # Dueño de la liquidez sintética o reproducida
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+ACTIVE = ('NEW', 'PARTIALLY_FILLED')
+
+
+# ==========================
+# LIBRO DE ÓRDENES
+# ==========================
+class OrderBook:
+    """Libro límite de un símbolo con prioridad precio-tiempo
+        Cada punta es un dict precio -> deque de órdenes más la lista ordenada de precios"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.levels = {'BUY': {}, 'SELL': {}}
+        self.prices = {'BUY': [], 'SELL': []}  # ascendentes; el mejor bid es el último
+        self.last = None  # (precio, cantidad, timestamp ms)
+        self.volume = 0.0
+
+    def best(self, side):
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == 'BUY' else prices[0]
+
+    def _rest(self, order):
+        side, price = order['side'], order['price']
+        level = self.levels[side].get(price)
+        if level is None:
+            level = self.levels[side][price] = deque()
+            insort(self.prices[side], price)
+        level.append(order)
+
+    def remove(self, order):
+        side, price = order['side'], order['price']
+        level = self.levels[side].get(price)
+        if level is None:
+            return False
+        try:
+            level.remove(order)
+        except ValueError:
+            return False
+        if not level:
+            self._drop_level(side, price)
+        return True
+
+    def _drop_level(self, side, price):
+        del self.levels[side][price]
+        prices = self.prices[side]
+        del prices[bisect_left(prices, price)]
+
+    def match(self, order, now_ms):
+        """Calzar una orden entrante; devuelve [(orden_pasiva, cantidad, precio)]
+            y deja el remanente en el libro si es límite DAY"""
+        contra = 'SELL' if order['side'] == 'BUY' else 'BUY'
+        fills = []
+        while order['leaves'] > 0:
+            price = self.best(contra)
+            if price is None:
+                break
+            if order['ordType'] == 'LIMIT':
+                if (order['side'] == 'BUY' and price > order['price']) or \
+                        (order['side'] == 'SELL' and price < order['price']):
+                    break
+            level = self.levels[contra][price]
+            while level and order['leaves'] > 0:
+                maker = level[0]
+                qty = min(order['leaves'], maker['leaves'])
+                fills.append((maker, qty, price))
+                for o in (order, maker):
+                    o['avgPx'] = (o['avgPx'] * o['cumQty'] + price * qty) / (o['cumQty'] + qty)
+                    o['cumQty'] += qty
+                    o['leaves'] -= qty
+                if maker['leaves'] <= 0:
+                    level.popleft()
+                self.last = (price, qty, now_ms)
+                self.volume += qty
+            if not level:
+                self._drop_level(contra, price)
+        if order['leaves'] > 0 and order['ordType'] == 'LIMIT' and order['timeInForce'] == 'DAY':
+            self._rest(order)
+        return fills
+
+    def depth(self, side, n):
+        prices = self.prices[side]
+        best = reversed(prices[-n:]) if side == 'BUY' else prices[:n]
+        return [{'price': p, 'size': sum(o['leaves'] for o in self.levels[side][p])} for p in best]
+
+    def market_data(self, depth=5):
+        last = self.last
+        return {
+            'BI': self.depth('BUY', depth),
+            'OF': self.depth('SELL', depth),
+            'LA': {'price': last[0], 'size': last[1], 'date': last[2]} if last else None,
+            'TV': self.volume,
+        }
+
+
+# ==========================
+# HTTP / WEBSOCKET
+# ==========================
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Con keep-alive, Nagle + ACK diferido agregan ~40 ms por respuesta
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.server.sim.handle(self, 'POST')
+
+    def do_GET(self):
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            return self.server.sim.websocket(self)
+        self.server.sim.handle(self, 'GET')
+
+    # ---------- frames de WebSocket (RFC 6455, sin extensiones) ----------
+    def ws_handshake(self):
+        key = self.headers['Sec-WebSocket-Key'] + WS_GUID
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', base64.b64encode(hashlib.sha1(key.encode()).digest()).decode())
+        self.end_headers()
+        self.wfile.flush()
+
+    def ws_read(self):
+        """(opcode, payload) del próximo frame del cliente, o (None, None) si se cerró"""
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return None, None
+        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if header[1] & 0x80 else b'\0\0\0\0'
+        payload = bytearray(self.rfile.read(length))
+        for i in range(length):
+            payload[i] ^= mask[i % 4]
+        return opcode, bytes(payload)
+
+    def ws_send(self, payload, opcode=0x1):
+        n = len(payload)
+        if n < 126:
+            header = struct.pack('!BB', 0x80 | opcode, n)
+        elif n < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # Con el backlog por defecto (5) las ráfagas esperan el reintento de SYN
+
+    def handle_error(self, request, client_address):
+        pass  # Clientes que cierran conexiones keep-alive al terminar
+
+
+class _Session:
+    """Conexión WebSocket: suscripciones y cola de salida con la demora inyectada"""
+
+    def __init__(self, request):
+        self.request = request
+        self.symbols = set()
+        self.depth = 1
+        self.accounts = None  # None: sin suscripción a órdenes; set() vacío: todas las cuentas
+        self.outbox = queue.Queue()
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def push(self, message, due):
+        self.outbox.put((due, json.dumps(message).encode()))
+
+    def send(self, payload, opcode=0x1):
+        with self._send_lock:
+            self.request.ws_send(payload, opcode)
+
+    def writer(self):
+        while not self.closed:
+            try:
+                due, data = self.outbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.send(data)
+            except OSError:
+                self.closed = True
+
+
+# ==========================
+# SIMULADOR
+# ==========================
+class ExchangeSimulator:
+    """Servidor HTTP/WebSocket en un hilo que imita los endpoints de Primary que usa el código"""
+
+    def __init__(self, host='127.0.0.1', port=0, rate=10.0, burst=5, balance=1_000_000.0, latency=0.0,
+                 jitter=0.0, spot=4000.0, vol=0.5, seed=0):
+        self.rate = rate
+        self.burst = burst
+        self.balance = balance
+        self.latency = latency  # Segundos de demora por mensaje (ida y vuelta de red)
+        self.jitter = jitter    # Demora extra uniforme entre 0 y jitter
+        self.spot = spot        # Subyacente de la liquidez sintética
+        self.vol = vol
+        self.random = random.Random(seed)
+        self.synthetic = True   # Se desactiva al reproducir datos grabados
+
+        self.books = {}
+        self.orders = {}        # clOrdId -> orden
+        self.trades = {}        # símbolo -> [(timestamp ms, precio, cantidad)]
+        self.messages = 0
+        self.rejects = 0
+        self.reports = 0
+        self.log = []  # (tiempo, acción, clOrdId, status)
+        self.replayed = 0
+        self.replay_done = threading.Event()
+        self._catalog = None
+        self._mm_orders = {}    # símbolo -> órdenes del market maker en el libro
+        self._sessions = []
+        self._buckets = {}
+        self._ids = itertools.count(1)
+        self._exec_ids = itertools.count(1)
+        self._clock_ms = None   # Reloj del replay; None: hora real
+        self._lock = threading.RLock()
+        self._server = _Server((host, port), _Handler)
+        self._server.sim = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='exchange-sim', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        for session in list(self._sessions):
+            session.closed = True
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def _now_ms(self):
+        return self._clock_ms if self._clock_ms is not None else int(time.time() * 1000)
+
+    # ---------- endpoints REST ----------
+    def handle(self, request, method):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        url = urlparse(request.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == '/auth/getToken':
+            token = f"token-{request.headers.get('X-Username', 'anon')}"
+            return request._reply(200, {'status': 'OK'}, {'X-Auth-Token': token})
+
+        token = request.headers.get('X-Auth-Token')
+        if token is None:
+            return request._reply(401, {'status': 'ERROR', 'description': 'Missing token'})
+        if url.path.startswith('/rest/risk/accountReport'):
+            return request._reply(200, {'status': 'OK', 'accountData': {'availableToCollateral': self.balance}})
+        if url.path == '/rest/instruments/details':
+            return request._reply(200, {'status': 'OK', 'instruments': self.instruments()})
+        # Las consultas de market data no consumen el límite de mensajes de órdenes
+        if url.path == '/rest/marketdata/get':
+            depth = int(params.get('depth', 5))
+            with self._lock:
+                data = self._book(params.get('symbol')).market_data(depth)
+            return request._reply(200, {'status': 'OK', 'marketData': data, 'depth': depth, 'aggregated': True})
+        if url.path == '/rest/data/getTrades':
+            return request._reply(200, {'status': 'OK', 'trades': self.get_trades(params)})
+
+        actions = {
+            '/rest/order/newSingleOrder': self.new_order,
+            '/rest/order/cancelById': self.cancel_order,
+            '/rest/order/replaceById': self.replace_order,
+        }
+        action = actions.get(url.path)
+        if action is None:
+            return request._reply(404, {'status': 'ERROR', 'description': f'Unknown path {url.path}'})
+
+        with self._lock:
+            self.messages += 1
+            bucket = self._buckets.setdefault(token, TokenBucket(self.rate, self.burst))
+            if bucket.try_acquire() > 0:
+                self.rejects += 1
+                self.log.append((time.monotonic(), url.path.rsplit('/', 1)[-1], params.get('clOrdId'), 'REJECTED'))
+                return request._reply(200, {'status': 'ERROR', 'description': 'Message rate limit exceeded'})
+            body = action(params)
+            self.log.append((time.monotonic(), url.path.rsplit('/', 1)[-1],
+                             body.get('order', {}).get('clientId'), body['status']))
+        request._reply(200, body)
+
+    def get_trades(self, params):
+        desde = params.get('dateFrom', '0000-01-01')
+        hasta = params.get('dateTo', '9999-12-31')
+        resultado = []
+        with self._lock:
+            trades = list(self.trades.get(params.get('symbol'), ()))
+        for ts, price, size in trades:
+            momento = datetime.fromtimestamp(ts / 1000)
+            if desde <= momento.strftime('%Y-%m-%d') <= hasta:
+                resultado.append({'symbol': params.get('symbol'), 'price': price, 'size': size,
+                                  'datetime': momento.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]})
+        return resultado
+
+    # ---------- maestro de instrumentos ----------
+    def instruments(self):
+        """Maestro sintético: GGAL, un futuro de dólar y la cadena de opciones de GGAL
+            de los próximos seis vencimientos pares (strikes de 2000 a 8000 cada 100)"""
+        if self._catalog is not None:
+            return list(self._catalog.values())
+        from vol_surface import MONTH_CODES, third_friday
+        codes = {month: code for code, month in MONTH_CODES.items() if len(code) == 2}
+        items = [
+            {'instrumentId': {'marketId': 'ROFX', 'symbol': 'GGAL'}, 'cficode': 'ESXXXX',
+             'minPriceIncrement': 0.05, 'contractMultiplier': 1, 'minTradeVol': 1, 'currency': 'ARS'},
+            {'instrumentId': {'marketId': 'ROFX', 'symbol': 'DLR/FEB24'}, 'cficode': 'FXXXSX',
+             'minPriceIncrement': 0.5, 'contractMultiplier': 1000, 'minTradeVol': 1, 'currency': 'ARS',
+             'maturityDate': '20240229', 'underlying': 'DLR'},
+        ]
+        hoy = datetime.now().date()
+        meses = [(hoy.year + (hoy.month - 1 + k) // 12, (hoy.month - 1 + k) % 12 + 1) for k in range(13)]
+        vencimientos = [third_friday(y, m) for y, m in meses if m % 2 == 0 and third_friday(y, m) >= hoy][:6]
+        for vencimiento in vencimientos:
+            for strike in range(2000, 8001, 100):
+                for letra, cfi in (('C', 'OCASPS'), ('V', 'OPASPS')):
+                    items.append({
+                        'instrumentId': {'marketId': 'ROFX', 'symbol': f"GFG{letra}{strike * 10}{codes[vencimiento.month]}"},
+                        'cficode': cfi, 'underlying': 'GGAL', 'strikePrice': float(strike),
+                        'maturityDate': vencimiento.strftime('%Y%m%d'), 'minPriceIncrement': 0.001,
+                        'contractMultiplier': 100, 'minTradeVol': 1, 'currency': 'ARS',
+                    })
+        self._catalog = {item['instrumentId']['symbol']: item for item in items}
+        return items
+
+    def _theoretical(self, symbol):
+        """Valor teórico de la liquidez sintética: Black-Scholes para las opciones del maestro"""
+        self.instruments()
+        item = self._catalog.get(symbol)
+        if item is None or item.get('strikePrice') is None:
+            return 50.0 + sum(map(ord, symbol or '')) % 200
+        from black_scholes import bs_price
+        t = (datetime.strptime(item['maturityDate'], '%Y%m%d') - datetime.now()).total_seconds() / (365 * 86400)
+        value = float(bs_price(self.spot, item['strikePrice'], max(t, 1 / 365), self.vol, item['cficode'][1] == 'C'))
+        return max(round(value, 2), 0.01)
+
+    # ---------- libro y market maker ----------
+    def _book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+            if self.synthetic:
+                self._synthetic_quote(symbol)
+        return book
+
+    def _synthetic_quote(self, symbol, levels=3, size=10):
+        theo = self._theoretical(symbol)
+        half = max(0.01, round(theo * 0.01, 2))
+        quotes = []
+        for k in range(levels):
+            step = half * (1 + 2 * k)
+            if theo - step > 0:
+                quotes.append(('BUY', round(theo - step, 3), size))
+            quotes.append(('SELL', round(theo + step, 3), size))
+        self._mm_quote(symbol, quotes)
+        if self.books[symbol].last is None:
+            self.books[symbol].last = (theo, 0, self._now_ms())
+
+    def _mm_quote(self, symbol, quotes):
+        """Reemplazar las órdenes del market maker de un símbolo por [(lado, precio, cantidad)]
+            Si una cotización nueva cruza órdenes de las estrategias, se calzan"""
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        for order in self._mm_orders.pop(symbol, ()):
+            book.remove(order)
+        resting = []
+        for side, price, qty in quotes:
+            if not qty > 0 or price != price:  # sin cantidad o precio NaN
+                continue
+            order = self._order(MARKET_MAKER, symbol, side, price, qty)
+            self._execute(book, order, publish=False)
+            if order['leaves'] > 0:
+                resting.append(order)
+        self._mm_orders[symbol] = resting
+        self._publish_md(book)
+
+    # ---------- órdenes ----------
+    def _order(self, account, symbol, side, price, qty, ord_type='LIMIT', tif='DAY'):
+        return {
+            'clOrdId': str(next(self._ids)), 'account': account, 'symbol': symbol, 'side': side,
+            'price': float(price or 0), 'orderQty': float(qty), 'ordType': ord_type, 'timeInForce': tif,
+            'leaves': float(qty), 'cumQty': 0.0, 'avgPx': 0.0, 'status': 'NEW', 'origClOrdId': None,
+        }
+
+    def _execute(self, book, order, publish=True):
+        """Calzar una orden y emitir los execution reports de las órdenes de las estrategias"""
+        now_ms = self._now_ms()
+        fills = book.match(order, now_ms)
+        mm_hit = False
+        for maker, qty, price in fills:
+            self.trades.setdefault(book.symbol, []).append((now_ms, price, qty))
+            for o in (maker, order):
+                if o['account'] == MARKET_MAKER:
+                    mm_hit = True
+                    continue
+                o['status'] = 'FILLED' if o['leaves'] <= 0 else 'PARTIALLY_FILLED'
+                self._report(o, last=(qty, price))
+        if order['leaves'] > 0 and order['account'] != MARKET_MAKER and \
+                (order['ordType'] != 'LIMIT' or order['timeInForce'] != 'DAY'):
+            order['status'] = 'CANCELLED'  # Remanente de una orden de mercado o IOC
+            self._report(order)
+        if fills and publish:
+            if mm_hit and self.synthetic:
+                self._synthetic_quote(book.symbol)  # La liquidez sintética se repone (y se publica)
+            else:
+                self._publish_md(book)
+
+    def new_order(self, params):
+        symbol, side = params.get('symbol'), params.get('side', '').upper()
+        qty = float(params.get('orderQty', 0) or 0)
+        if side not in ('BUY', 'SELL') or qty <= 0:
+            return {'status': 'ERROR', 'description': 'Invalid side or orderQty'}
+        order = self._order(params.get('account'), symbol, side, params.get('price'), qty,
+                            params.get('ordType', 'LIMIT').upper(), params.get('timeInForce', 'DAY').upper())
+        self.orders[order['clOrdId']] = order
+        self._report(order)
+        self._execute(self._book(symbol), order)
+        return {'status': 'OK', 'order': {'clientId': order['clOrdId'], 'proprietary': 'PBCP'}}
+
+    def cancel_order(self, params):
+        order = self.orders.get(params.get('clOrdId'))
+        if order is None or order['status'] not in ACTIVE:
+            return {'status': 'ERROR', 'description': 'Order not found'}
+        self.books[order['symbol']].remove(order)
+        order['status'] = 'CANCELLED'
+        self._report(order)
+        return {'status': 'OK', 'order': {'clientId': params['clOrdId'], 'proprietary': 'PBCP'}}
+
+    def replace_order(self, params):
+        old = self.orders.get(params.get('clOrdId'))
+        if old is None or old['status'] not in ACTIVE:
+            return {'status': 'ERROR', 'description': 'Order not found'}
+        # El reemplazo es una orden nueva por lo que queda pendiente: pierde la prioridad.
+        # Como en FIX, orderQty es el total y cumQty/avgPx siguen desde la orden original
+        book = self.books[old['symbol']]
+        book.remove(old)
+        old['status'] = 'REPLACED'
+        qty = float(params.get('orderQty', old['orderQty']))
+        order = self._order(old['account'], old['symbol'], old['side'], params.get('price', old['price']),
+                            qty, old['ordType'], old['timeInForce'])
+        order.update(origClOrdId=old['clOrdId'], cumQty=old['cumQty'], avgPx=old['avgPx'],
+                     leaves=max(qty - old['cumQty'], 0.0))
+        if order['leaves'] <= 0:
+            order['status'] = 'FILLED'  # Reducida a lo ya ejecutado
+        self.orders[order['clOrdId']] = order
+        self._report(order)
+        self._execute(book, order)
+        return {'status': 'OK', 'order': {'clientId': order['clOrdId'], 'proprietary': 'PBCP'}}
+
+    # ---------- WebSocket ----------
+    def websocket(self, request):
+        if request.headers.get('X-Auth-Token') is None:
+            return request._reply(401, {'status': 'ERROR', 'description': 'Missing token'})
+        request.ws_handshake()
+        request.close_connection = True
+        session = _Session(request)
+        threading.Thread(target=session.writer, name='exchange-sim-ws', daemon=True).start()
+        with self._lock:
+            self._sessions.append(session)
+        try:
+            while not session.closed:
+                opcode, payload = request.ws_read()
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    session.send(payload, 0xA)  # pong
+                elif opcode == 0x1:
+                    self._subscribe(session, json.loads(payload))
+        except (OSError, ValueError):
+            pass
+        finally:
+            session.closed = True
+            with self._lock:
+                self._sessions.remove(session)
+
+    def _subscribe(self, session, message):
+        due = time.monotonic() + self._delay()
+        with self._lock:
+            if message.get('type') == 'smd':
+                session.depth = int(message.get('depth', 1))
+                for product in message.get('products', []):
+                    session.symbols.add(product['symbol'])
+                    session.push(self._md_message(self._book(product['symbol']), session.depth), due)
+            elif message.get('type') == 'os':
+                account = (message.get('account') or {}).get('id')
+                session.accounts = session.accounts or set()
+                if account:
+                    session.accounts.add(account)
+                # Snapshot de las órdenes vivas de la cuenta
+                for order in self.orders.values():
+                    if order['status'] in ACTIVE and (not session.accounts or order['account'] in session.accounts):
+                        session.push({'type': 'or', 'orderReport': self._report_body(order)}, due)
+
+    def _md_message(self, book, depth):
+        return {'type': 'Md', 'timestamp': self._now_ms(),
+                'instrumentId': {'marketId': 'ROFX', 'symbol': book.symbol},
+                'marketData': book.market_data(depth)}
+
+    def _publish_md(self, book):
+        if not self._sessions:
+            return
+        due = time.monotonic() + self._delay()
+        for session in self._sessions:
+            if book.symbol in session.symbols:
+                session.push(self._md_message(book, session.depth), due)
+
+    def _report_body(self, order, last=None):
+        body = {
+            'orderId': order['clOrdId'], 'clOrdId': order['clOrdId'], 'proprietary': 'PBCP',
+            'accountId': {'id': order['account']},
+            'instrumentId': {'marketId': 'ROFX', 'symbol': order['symbol']},
+            'price': order['price'], 'orderQty': order['orderQty'], 'ordType': order['ordType'],
+            'side': order['side'], 'timeInForce': order['timeInForce'],
+            'transactTime': datetime.fromtimestamp(self._now_ms() / 1000).strftime('%Y%m%d-%H:%M:%S.%f')[:-3],
+            'avgPx': order['avgPx'], 'cumQty': order['cumQty'], 'leavesQty': order['leaves'],
+            'status': order['status'],
+        }
+        if order['origClOrdId']:
+            body['origClOrdId'] = order['origClOrdId']
+        if last is not None:
+            body['lastQty'], body['lastPx'] = last
+            body['execId'] = f"E{next(self._exec_ids)}"
+        return body
+
+    def _report(self, order, last=None):
+        self.reports += 1
+        if not self._sessions:
+            return
+        message = {'type': 'or', 'orderReport': self._report_body(order, last)}
+        due = time.monotonic() + self._delay()
+        for session in self._sessions:
+            if session.accounts is not None and (not session.accounts or order['account'] in session.accounts):
+                session.push(message, due)
+
+    # ---------- replay de datos grabados ----------
+    def replay(self, db_path, speed=0.0, start=None, end=None, block=False):
+        """Reproducir la tabla opciones_ggal como el mercado: en cada snapshot el market
+            maker cotiza el bid/ask grabado, y los cambios del último precio quedan como trades.
+            speed=0 reproduce lo más rápido posible; speed=10 a diez veces el tiempo real."""
+        from backtest import TickStream
+
+        stream = TickStream(db_path, start, end)
+        with self._lock:
+            self.synthetic = False
+            for symbol in list(self._mm_orders):
+                self._mm_quote(symbol, [])
+        self.replay_done.clear()
+
+        def run():
+            inicio = time.monotonic()
+            origen = None
+            for ts, ticks in stream.events():
+                ts_ms = int(ts // 1_000_000)
+                if origen is None:
+                    origen = ts_ms
+                elif speed:
+                    espera = inicio + (ts_ms - origen) / 1000 / speed - time.monotonic()
+                    if espera > 0:
+                        time.sleep(espera)
+                with self._lock:
+                    self._clock_ms = ts_ms
+                    for i in range(len(ticks['code'])):
+                        symbol = stream.symbols[ticks['code'][i]]
+                        self._mm_quote(symbol, [('BUY', float(ticks['bid'][i]), float(ticks['bid_size'][i])),
+                                                ('SELL', float(ticks['ask'][i]), float(ticks['ask_size'][i]))])
+                        last, book = float(ticks['last'][i]), self.books[symbol]
+                        if last == last and (book.last is None or book.last[0] != last):
+                            book.last = (last, 0, ts_ms)
+                            self.trades.setdefault(symbol, []).append((ts_ms, last, 0))
+                    self.replayed += len(ticks['code'])
+            self.replay_done.set()
+            print(f"Replay terminado: {self.replayed:,} ticks")
+
+        thread = threading.Thread(target=run, name='exchange-sim-replay', daemon=True)
+        thread.start()
+        if block:
+            thread.join()
+        return thread
+
+
+if __name__ == "__main__":
+    # Benchmark de la pila completa contra el simulador con 2 ms + hasta 1 ms de demora:
+    # latencia de confirmación REST, throughput asíncrono y latencia orden -> fill por WebSocket
+    # Uso: python exchange_sim.py [opciones_ggal.db]
+    import asyncio
+    import sys
+
+    import numpy as np
+
+    from main2 import Config, AuthManager, OrderManager
+    from async_client import AsyncPrimaryClient
+    from order_store import OrderStore, PrimaryOrderStream
+
+    def percentiles(nombre, muestras):
+        ms = np.array(muestras) * 1000
+        print(f"{nombre:<32} n={len(ms):>5}  p50={np.percentile(ms, 50):6.2f} ms  "
+              f"p99={np.percentile(ms, 99):6.2f} ms  max={ms.max():6.2f} ms")
+
+    sim = ExchangeSimulator(rate=1e9, burst=1e9, latency=0.002, jitter=0.001).start()
+    Config.API_BASE_URL = sim.url
+    Config.ACCOUNT_ID = 'BENCH'
+    if len(sys.argv) > 1:
+        sim.replay(sys.argv[1], block=True)
+        symbols = sorted(sim.books, key=lambda s: -len(sim.trades.get(s, ())))[:40]
+    else:
+        symbols = [f"GFGC{k * 10}{c}" for k in range(3000, 5001, 100) for c in ('DI', 'FE')]
+
+    # 1. Órdenes bloqueantes de main2 (conexión y token nuevos en cada llamada)
+    om = OrderManager(AuthManager("bench", "bench"))
+    latencias = []
+    for i in range(200):
+        inicio = time.perf_counter()
+        om.send_order({"symbol": symbols[i % len(symbols)], "side": "BUY", "orderQty": 1, "price": 0.001})
+        latencias.append(time.perf_counter() - inicio)
+    percentiles("main2 send_order (secuencial)", latencias)
+
+    # 2. Cliente asíncrono con 50 órdenes en vuelo (órdenes pasivas que quedan en el libro)
+    async def carga(n=5000, concurrencia=50):
+        async with AsyncPrimaryClient("bench", "bench", max_connections=concurrencia) as api:
+            await api.auth.get_token()
+            sem = asyncio.Semaphore(concurrencia)
+            latencias = []
+
+            async def una(i):
+                async with sem:
+                    inicio = time.perf_counter()
+                    await api.om.send_order({"symbol": symbols[i % len(symbols)], "side": "BUY" if i % 2 else "SELL",
+                                             "orderQty": 1, "price": 0.001 if i % 2 else 100_000})
+                    latencias.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(una(i) for i in range(n)))
+            print(f"Asíncrono: {n / (time.perf_counter() - inicio):,.0f} órdenes/s")
+            percentiles("async send_order (50 en vuelo)", latencias)
+
+    asyncio.run(carga())
+
+    # 3. Latencia orden -> fill: órdenes marketables y execution reports por WebSocket
+    auth = AuthManager("bench", "bench")
+    store = OrderStore()
+    stream = PrimaryOrderStream(auth, store).start()
+    time.sleep(0.5)
+    om = OrderManager(auth, store=store)
+    latencias = []
+    for i in range(200):
+        symbol = symbols[i % len(symbols)]
+        with sim._lock:
+            ask = sim._book(symbol).best('SELL')
+        if ask is None:
+            continue
+        inicio = time.perf_counter()
+        r = om.send_order({"symbol": symbol, "side": "BUY", "orderQty": 1, "price": ask})
+        orden = store.wait_for_fill(r['order']['clientId'], timeout=5)
+        latencias.append(time.perf_counter() - inicio)
+    percentiles("orden -> FILLED (REST + WS)", latencias)
+    stream.stop()
+    print(f"Mensajes: {sim.messages:,}, rechazos: {sim.rejects}, execution reports: {sim.reports:,}, "
+          f"trades: {sum(map(len, sim.trades.values())):,}")
+    sim.stop()
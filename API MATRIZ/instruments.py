@@ -0,0 +1,197 @@
+"""
+Maestro de instrumentos de Primary
+Descarga una vez por día /rest/instruments/details, lo guarda en un índice
+compacto en disco (columnas NumPy comprimidas) y resuelve en memoria, con
+diccionarios, (subyacente, vencimiento, tipo, strike) -> símbolo y símbolo ->
+tick, multiplicador y lote mínimo. Con el maestro cargado, MarketData y
+OrderManager rechazan localmente los símbolos inexistentes en lugar de gastar
+un round trip en un error del mercado.
+
+Uso:
+    instruments = InstrumentMaster('instrumentos.npz').refresh(auth)
+    symbol = instruments.resolve('GGAL', 'FEB', 'C', 4028.3)
+    strategies = OptionsStrategies(auth, instruments=instruments)
+"""
+
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+
+from vol_surface import MONTH_CODES
+
+Instrument = namedtuple('Instrument', ['symbol', 'underlying', 'maturity', 'right', 'strike',
+                                       'tick', 'multiplier', 'min_size', 'cfi', 'currency'])
+
+# Columnas del índice en disco (mismo orden que Instrument)
+_COLUMNS = {
+    'symbol': str, 'underlying': str, 'maturity': 'datetime64[D]', 'right': str, 'strike': float,
+    'tick': float, 'multiplier': float, 'min_size': float, 'cfi': str, 'currency': str,
+}
+# GGAL usa 'V' para las puts en el ticker
+_RIGHTS = {'C': 'C', 'CALL': 'C', 'P': 'P', 'V': 'P', 'PUT': 'P'}
+
+
+def parse_instrument(data):
+    """Instrument a partir de un elemento de la respuesta de instruments/details"""
+    cfi = data.get('cficode') or ''
+    right = ('C' if cfi[1:2] == 'C' else 'P') if cfi.startswith('O') else ''
+    strike = data.get('strikePrice', data.get('strike'))
+    maturity = data.get('maturityDate')
+    return Instrument(
+        symbol=data['instrumentId']['symbol'],
+        underlying=data.get('underlying') or '',
+        maturity=np.datetime64(datetime.strptime(maturity, '%Y%m%d').date(), 'D') if maturity else np.datetime64('NaT', 'D'),
+        right=right,
+        strike=float(strike) if strike is not None else np.nan,
+        tick=float(data.get('minPriceIncrement') or data.get('tickSize') or 0.0),
+        multiplier=float(data.get('contractMultiplier') or 1.0),
+        min_size=float(data.get('minTradeVol') or 1.0),
+        cfi=cfi,
+        currency=data.get('currency') or '',
+    )
+
+
+class InstrumentMaster:
+    """Índice de instrumentos en memoria respaldado por un archivo .npz"""
+
+    def __init__(self, path='instrumentos.npz'):
+        self.path = path
+        self.downloaded = None
+        self.by_symbol = {}
+        self.by_contract = {}  # (subyacente, vencimiento, tipo, strike) -> símbolo
+        self.maturities = {}   # (subyacente, año, mes) -> vencimientos ordenados
+        if path and os.path.exists(path):
+            self.load()
+
+    # ---------- carga ----------
+    def refresh(self, auth, force=False):
+        """Descargar el maestro si el índice en disco no es de hoy"""
+        if not force and self.downloaded == date.today() and self.by_symbol:
+            return self
+        from main2 import Config, http_request
+        url = f"{Config.API_BASE_URL}/rest/instruments/details"
+        response = http_request("GET", url, headers={"X-Auth-Token": auth.get_token()})
+        if response.status_code != 200 or response.json().get('status') != 'OK':
+            print(f"Error al descargar instrumentos: {response.text[:200]}")
+            return self
+        self.build([parse_instrument(item) for item in response.json()['instruments']])
+        self.downloaded = date.today()
+        if self.path:
+            self.save()
+        return self
+
+    def build(self, instruments):
+        self.by_symbol = {inst.symbol: inst for inst in instruments}
+        self.by_contract = {}
+        maturities = {}
+        for inst in self.by_symbol.values():
+            if not inst.right or np.isnat(inst.maturity):
+                continue
+            for underlying in self._underlying_keys(inst.underlying):
+                key = (underlying, inst.maturity.item(), inst.right, round(inst.strike, 3))
+                self.by_contract[key] = inst.symbol
+                d = inst.maturity.item()
+                maturities.setdefault((underlying, d.year, d.month), set()).add(d)
+        self.maturities = {key: sorted(days) for key, days in maturities.items()}
+
+    @staticmethod
+    def _underlying_keys(underlying):
+        # Primary informa el subyacente a veces con el plazo ("GGAL - 48hs"); indexar ambos
+        base = underlying.split(' ')[0]
+        return {underlying, base} if base else {underlying}
+
+    def save(self):
+        columns = {name: np.array([getattr(inst, name) for inst in self.by_symbol.values()],
+                                  dtype=kind if kind is not str else None)
+                   for name, kind in _COLUMNS.items()}
+        with open(self.path, 'wb') as f:
+            np.savez_compressed(f, downloaded=np.datetime64(self.downloaded, 'D'), **columns)
+
+    def load(self):
+        with np.load(self.path) as data:
+            self.downloaded = data['downloaded'].item()
+            columns = [data[name].tolist() if name != 'maturity' else list(data[name]) for name in _COLUMNS]
+        self.build([Instrument(*row) for row in zip(*columns)])
+        return self
+
+    # ---------- consultas ----------
+    def __contains__(self, symbol):
+        return symbol in self.by_symbol
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+    def get(self, symbol):
+        return self.by_symbol.get(symbol)
+
+    def check(self, symbol):
+        """None si el símbolo existe; si no, un error con la forma de las respuestas de la API"""
+        if symbol in self.by_symbol:
+            return None
+        return {'status': 'ERROR', 'description': f'Unknown instrument {symbol}'}
+
+    def expiry(self, underlying, expiration, today=None):
+        """Vencimiento listado para un código de mes ('FEB', 'FE'), una fecha o un datetime"""
+        if isinstance(expiration, datetime):
+            return expiration.date()
+        if isinstance(expiration, date):
+            return expiration
+        today = today or date.today()
+        month = MONTH_CODES[expiration.upper()]
+        for year in (today.year, today.year + 1):
+            for d in self.maturities.get((underlying, year, month), ()):
+                if d >= today:
+                    return d
+        return None
+
+    def resolve(self, underlying, expiration, right, strike, today=None):
+        """Símbolo de la opción o None si no está listada"""
+        maturity = self.expiry(underlying, expiration, today)
+        if maturity is None:
+            return None
+        return self.by_contract.get((underlying, maturity, _RIGHTS[right.upper()], round(float(strike), 3)))
+
+    def chain(self, underlying, expiration, today=None):
+        """Símbolos listados de un vencimiento: {(tipo, strike): símbolo}"""
+        maturity = self.expiry(underlying, expiration, today)
+        return {(right, strike): symbol for (u, m, right, strike), symbol in self.by_contract.items()
+                if u == underlying and m == maturity}
+
+    def round_price(self, symbol, price):
+        """Redondear un precio al tick del instrumento"""
+        tick = self.by_symbol[symbol].tick
+        return round(round(price / tick) * tick, 10) if tick else price
+
+
+if __name__ == "__main__":
+    import time
+
+    from main2 import Config, AuthManager
+    from exchange_sim import ExchangeSimulator
+
+    sim = ExchangeSimulator().start()
+    Config.API_BASE_URL = sim.url
+    path = '/tmp/instrumentos.npz'
+    if os.path.exists(path):
+        os.remove(path)
+
+    inicio = time.perf_counter()
+    instruments = InstrumentMaster(path).refresh(AuthManager("demo", "demo"))
+    print(f"Descarga e indexado de {len(instruments)} instrumentos: {(time.perf_counter() - inicio) * 1000:.0f} ms, "
+          f"{os.path.getsize(path) / 1024:.0f} KB en disco")
+    inicio = time.perf_counter()
+    instruments = InstrumentMaster(path)
+    print(f"Carga desde disco: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    strikes = [k for (_, k) in instruments.chain('GGAL', 'FEB')][:20]
+    inicio = time.perf_counter()
+    for _ in range(10_000):
+        for strike in strikes:
+            instruments.resolve('GGAL', 'FEB', 'C', strike)
+    print(f"resolve: {(time.perf_counter() - inicio) / (10_000 * len(strikes)) * 1e6:.2f} µs")
+    symbol = instruments.resolve('GGAL', 'FEB', 'V', strikes[0])
+    print(symbol, instruments.get(symbol))
+    print(instruments.check('GFGC99999FE'))
+    sim.stop()
@@ -8,13 +8,16 @@ Fecha: Agosto 2023
 # ========================
 # MÓDULO DE CONFIGURACIÓN
 # ========================
-import requests
 import json
 import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from payoff import analyze as analyze_payoff
+from main2 import http_request
+import metrics
+
 class Config:
     API_BASE_URL = "https://api.remarkets-primary.com.ar"
     ACCOUNT_ID = "TU_CUENTA"
@@ -40,7 +43,7 @@ class AuthManager:
             "X-Username": self._username,
             "X-Password": self._password
         }
-        response = requests.post(url, headers=headers)
+        response = http_request("POST", url, headers=headers)
         if response.status_code == 200:
             self._token = response.headers.get("X-Auth-Token")
             return self._token
@@ -51,10 +54,14 @@ class AuthManager:
 # MÓDULO DE MARKET DATA
 # ==========================
 class MarketData:
-    def __init__(self, auth):
+    def __init__(self, auth, instruments=None):
         self.auth = auth
+        # InstrumentMaster opcional: los símbolos inexistentes se rechazan sin ir al mercado
+        self.instruments = instruments
         
     def get_real_time_data(self, symbol, entries="BI,OF,LA,OP,CL,SE,OI"):
+        if self.instruments is not None and symbol not in self.instruments:
+            return self.instruments.check(symbol)
         url = f"{Config.API_BASE_URL}/rest/marketdata/get"
         headers = {"X-Auth-Token": self.auth.get_token()}
         params = {
@@ -63,7 +70,7 @@ class MarketData:
             "entries": entries,
             "depth": 5
         }
-        response = requests.get(url, headers=headers, params=params)
+        response = http_request("GET", url, headers=headers, params=params)
         return response.json() if response.status_code == 200 else None
 
     def get_historical_volatility(self, symbol, days=Config.VOLATILITY_WINDOW):
@@ -79,7 +86,7 @@ class MarketData:
             "dateTo": end_date.strftime("%Y-%m-%d")
         }
         
-        response = requests.get(url, headers=headers, params=params)
+        response = http_request("GET", url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json().get('trades', [])
             closes = [float(trade['price']) for trade in data]
@@ -97,7 +104,7 @@ class RiskManager:
     def get_account_balance(self):
         url = f"{Config.API_BASE_URL}/rest/risk/accountReport/{Config.ACCOUNT_ID}"
         headers = {"X-Auth-Token": self.auth.get_token()}
-        response = requests.get(url, headers=headers)
+        response = http_request("GET", url, headers=headers)
         if response.status_code == 200:
             return float(response.json()['accountData']['availableToCollateral'])
         return 0.0
@@ -111,10 +118,13 @@ class RiskManager:
 # MÓDULO DE EJECUCIÓN DE ÓRDENES
 # ==========================
 class OrderManager:
-    def __init__(self, auth):
+    def __init__(self, auth, instruments=None):
         self.auth = auth
+        self.instruments = instruments
         
     def send_order(self, order_params):
+        if self.instruments is not None and order_params.get('symbol') not in self.instruments:
+            return self.instruments.check(order_params.get('symbol'))
         url = f"{Config.API_BASE_URL}/rest/order/newSingleOrder"
         headers = {"X-Auth-Token": self.auth.get_token()}
         
@@ -126,18 +136,48 @@ class OrderManager:
             "account": Config.ACCOUNT_ID
         }
         
-        response = requests.get(url, headers=headers, params={**default_params, **order_params})
+        response = http_request("GET", url, headers=headers, params={**default_params, **order_params})
         return response.json() if response.status_code == 200 else None
 
 # ==========================
 # ESTRATEGIAS COMPLETAS
 # ==========================
 class OptionsStrategies:
-    def __init__(self, auth):
-        self.md = MarketData(auth)
-        self.om = OrderManager(auth)
+    def __init__(self, auth, instruments=None):
+        self.md = MarketData(auth, instruments)
+        self.om = OrderManager(auth, instruments)
         self.rm = RiskManager(auth)
         self.symbol_config = Config.SYMBOL_MAP
+        self.instruments = instruments
+
+    def option_symbol(self, symbol, expiration, option_type, strike):
+        """Símbolo de la opción: del maestro de instrumentos si está cargado,
+            si no con el formato {subyacente}{vencimiento}{C|P}{strike}"""
+        if self.instruments is not None:
+            option = self.instruments.resolve(symbol, expiration, option_type, strike)
+            if option is None:
+                raise ValueError(f"Opción no listada: {symbol} {expiration} {option_type} {strike}")
+            return option
+        return f"{symbol}{expiration}{option_type}{strike}"
+
+    def payoff_summary(self, legs, symbol):
+        """Máxima ganancia, máxima pérdida y breakevens al vencimiento por unidad
+            legs: (cantidad, strike, tipo 'C'/'P', prima) con cantidad + compra, - venta"""
+        analysis = analyze_payoff(
+            [{'qty': qty, 'strike': strike, 'is_call': option_type == 'C', 'price': price}
+             for qty, strike, option_type, price in legs],
+            multiplier=self.symbol_config[symbol]['multiplier'])
+        return {key: analysis[key] for key in ('max_profit', 'max_loss', 'breakevens')}
+
+    def send_legs(self, trace, orders):
+        """Enviar las órdenes de una estrategia en secuencia: order_sent al volver cada envío,
+            ack cuando respondieron todas las patas"""
+        results = []
+        for order in orders:
+            results.append(self.om.send_order(order))
+            trace.mark('order_sent')
+        trace.mark('ack')
+        return results
 
     # --------------------------------------------------
     # 1. BULL/BEAR SPREADS
@@ -147,12 +187,13 @@ class OptionsStrategies:
         Estrategia genérica para spreads verticales
         Types: 'bull_call', 'bear_put', 'bear_call', 'bull_put'
         """
+        trace = metrics.trace('strategy_order', strategy='vertical_spread')
         option_type = 'C' if 'call' in strategy_type else 'P'
         multiplier = self.symbol_config[symbol]['multiplier']
         
         # Construir símbolos de opciones
-        short_leg = f"{symbol}{expiration}{option_type}{short_strike}"
-        long_leg = f"{symbol}{expiration}{option_type}{long_strike}"
+        short_leg = self.option_symbol(symbol, expiration, option_type, short_strike)
+        long_leg = self.option_symbol(symbol, expiration, option_type, long_strike)
         
         # Obtener precios en tiempo real
         px_short = self.md.get_real_time_data(short_leg)['marketData']['LA']['price']
@@ -172,27 +213,31 @@ class OptionsStrategies:
         position_size = self.rm.calculate_position_size(debit) * contracts
         
         # Ejecutar órdenes
-        orders = [
-            self.om.send_order({
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {
                 "symbol": long_leg,
                 "orderQty": position_size,
                 "price": px_long,
                 "ordType": "LIMIT",
                 "side": side_long
-            }),
-            self.om.send_order({
+            },
+            {
                 "symbol": short_leg,
                 "orderQty": position_size,
                 "price": px_short,
                 "ordType": "LIMIT",
                 "side": side_short
-            })
-        ]
+            }
+        ])
+        
+        sign = 1 if side_long == 'BUY' else -1
+        legs = [(sign, long_strike, option_type, px_long), (-sign, short_strike, option_type, px_short)]
         
         return {
             "strategy": strategy_type,
             "net_debit": debit * multiplier,
-            "max_profit": (long_strike - short_strike - debit) * multiplier if 'bull' in strategy_type else (short_strike - long_strike - debit) * multiplier,
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -208,11 +253,12 @@ class OptionsStrategies:
         - Buy CALL (K4)
         Donde K1 < K2 < K3 < K4
         """
+        trace = metrics.trace('strategy_order', strategy='iron_condor')
         # Construir símbolos
-        put_short = f"{symbol}{expiration}P{put_spread[0]}"
-        put_long = f"{symbol}{expiration}P{put_spread[1]}"
-        call_short = f"{symbol}{expiration}C{call_spread[0]}"
-        call_long = f"{symbol}{expiration}C{call_spread[1]}"
+        put_short = self.option_symbol(symbol, expiration, 'P', put_spread[0])
+        put_long = self.option_symbol(symbol, expiration, 'P', put_spread[1])
+        call_short = self.option_symbol(symbol, expiration, 'C', call_spread[0])
+        call_long = self.option_symbol(symbol, expiration, 'C', call_spread[1])
         
         # Obtener primas
         px_put_short = self.md.get_real_time_data(put_short)['marketData']['LA']['price']
@@ -225,19 +271,25 @@ class OptionsStrategies:
         position_size = self.rm.calculate_position_size(net_credit) * contracts
         
         # Ejecutar órdenes
-        orders = [
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
             # Put Spread
-            self.om.send_order({"symbol": put_short, "side": "SELL", "orderQty": position_size, "price": px_put_short}),
-            self.om.send_order({"symbol": put_long, "side": "BUY", "orderQty": position_size, "price": px_put_long}),
+            {"symbol": put_short, "side": "SELL", "orderQty": position_size, "price": px_put_short},
+            {"symbol": put_long, "side": "BUY", "orderQty": position_size, "price": px_put_long},
             # Call Spread
-            self.om.send_order({"symbol": call_short, "side": "SELL", "orderQty": position_size, "price": px_call_short}),
-            self.om.send_order({"symbol": call_long, "side": "BUY", "orderQty": position_size, "price": px_call_long})
+            {"symbol": call_short, "side": "SELL", "orderQty": position_size, "price": px_call_short},
+            {"symbol": call_long, "side": "BUY", "orderQty": position_size, "price": px_call_long}
+        ])
+        
+        legs = [
+            (-1, put_spread[0], 'P', px_put_short), (1, put_spread[1], 'P', px_put_long),
+            (-1, call_spread[0], 'C', px_call_short), (1, call_spread[1], 'C', px_call_long)
         ]
         
         return {
             "strategy": "iron_condor",
             "net_credit": net_credit * self.symbol_config[symbol]['multiplier'],
-            "max_loss": (put_spread[1] - put_spread[0] + call_spread[1] - call_spread[0] - net_credit) * self.symbol_config[symbol]['multiplier'],
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -251,13 +303,14 @@ class OptionsStrategies:
         - Sell 2 K2
         - Buy 1 K3
         """
+        trace = metrics.trace('strategy_order', strategy='butterfly_spread')
         option_type = 'C' if strategy_type == 'call' else 'P'
         multiplier = self.symbol_config[symbol]['multiplier']
         
         # Construir símbolos
-        leg1 = f"{symbol}{expiration}{option_type}{lower_strike}"
-        leg2 = f"{symbol}{expiration}{option_type}{middle_strike}"
-        leg3 = f"{symbol}{expiration}{option_type}{upper_strike}"
+        leg1 = self.option_symbol(symbol, expiration, option_type, lower_strike)
+        leg2 = self.option_symbol(symbol, expiration, option_type, middle_strike)
+        leg3 = self.option_symbol(symbol, expiration, option_type, upper_strike)
         
         # Obtener primas
         px_leg1 = self.md.get_real_time_data(leg1)['marketData']['LA']['price']
@@ -269,16 +322,22 @@ class OptionsStrategies:
         position_size = self.rm.calculate_position_size(abs(net_debit)) * contracts
         
         # Ejecutar órdenes
-        orders = [
-            self.om.send_order({"symbol": leg1, "side": "BUY", "orderQty": position_size, "price": px_leg1}),
-            self.om.send_order({"symbol": leg2, "side": "SELL", "orderQty": position_size * 2, "price": px_leg2}),
-            self.om.send_order({"symbol": leg3, "side": "BUY", "orderQty": position_size, "price": px_leg3})
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": leg1, "side": "BUY", "orderQty": position_size, "price": px_leg1},
+            {"symbol": leg2, "side": "SELL", "orderQty": position_size * 2, "price": px_leg2},
+            {"symbol": leg3, "side": "BUY", "orderQty": position_size, "price": px_leg3}
+        ])
+        
+        legs = [
+            (1, lower_strike, option_type, px_leg1), (-2, middle_strike, option_type, px_leg2),
+            (1, upper_strike, option_type, px_leg3)
         ]
         
         return {
             "strategy": f"{strategy_type}_butterfly",
             "net_cost": net_debit * multiplier,
-            "max_profit": (middle_strike - lower_strike - net_debit) * multiplier,
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -291,12 +350,13 @@ class OptionsStrategies:
         - Buy 1 ITM option
         - Sell X OTM options (ratio typically 2:1 or 3:1)
         """
+        trace = metrics.trace('strategy_order', strategy='ratio_spread')
         option_type = 'C' if strategy_type == 'call' else 'P'
         multiplier = self.symbol_config[symbol]['multiplier']
         
         # Construir símbolos
-        long_leg = f"{symbol}{expiration}{option_type}{long_strike}"
-        short_leg = f"{symbol}{expiration}{option_type}{short_strike}"
+        long_leg = self.option_symbol(symbol, expiration, option_type, long_strike)
+        short_leg = self.option_symbol(symbol, expiration, option_type, short_strike)
         
         # Obtener primas
         px_long = self.md.get_real_time_data(long_leg)['marketData']['LA']['price']
@@ -307,15 +367,19 @@ class OptionsStrategies:
         position_size = self.rm.calculate_position_size(net_credit) * contracts
         
         # Ejecutar órdenes
-        orders = [
-            self.om.send_order({"symbol": long_leg, "side": "BUY", "orderQty": position_size, "price": px_long}),
-            self.om.send_order({"symbol": short_leg, "side": "SELL", "orderQty": position_size * ratio, "price": px_short})
-        ]
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": long_leg, "side": "BUY", "orderQty": position_size, "price": px_long},
+            {"symbol": short_leg, "side": "SELL", "orderQty": position_size * ratio, "price": px_short}
+        ])
+        
+        summary = self.payoff_summary([(1, long_strike, option_type, px_long), (-ratio, short_strike, option_type, px_short)], symbol)
         
         return {
             "strategy": f"{strategy_type}_ratio_{ratio}1",
             "net_credit": net_credit * multiplier,
-            "max_risk": "Unlimited" if strategy_type == 'call' else (long_strike - (net_credit/multiplier)) * multiplier,
+            **summary,
+            "max_risk": "Unlimited" if summary['max_loss'] == float('inf') else summary['max_loss'],
             "orders": orders
         }
 
@@ -328,32 +392,31 @@ class OptionsStrategies:
         - Straddle (mismo strike)
         - Strangle (strikes diferentes)
         """
+        trace = metrics.trace('strategy_order', strategy='volatility_play')
         if strategy_type == 'straddle':
             call_strike = put_strike = strike1
         else:
             call_strike, put_strike = sorted([strike1, strike2], reverse=True)
         
-        call_symbol = f"{symbol}{expiration}C{call_strike}"
-        put_symbol = f"{symbol}{expiration}P{put_strike}"
+        call_symbol = self.option_symbol(symbol, expiration, 'C', call_strike)
+        put_symbol = self.option_symbol(symbol, expiration, 'P', put_strike)
         
         px_call = self.md.get_real_time_data(call_symbol)['marketData']['LA']['price']
         px_put = self.md.get_real_time_data(put_symbol)['marketData']['LA']['price']
         
         total_cost = (px_call + px_put) * self.symbol_config[symbol]['multiplier']
-        position_size = self.rm.calculate_position_size(total_cost) * contracts
+        position_size = self.rm.calculate_position_size(px_call + px_put) * contracts
         
-        orders = [
-            self.om.send_order({"symbol": call_symbol, "side": "BUY", "orderQty": position_size, "price": px_call}),
-            self.om.send_order({"symbol": put_symbol, "side": "BUY", "orderQty": position_size, "price": px_put})
-        ]
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": call_symbol, "side": "BUY", "orderQty": position_size, "price": px_call},
+            {"symbol": put_symbol, "side": "BUY", "orderQty": position_size, "price": px_put}
+        ])
         
         return {
             "strategy": strategy_type,
             "total_cost": total_cost,
-            "breakevens": [
-                call_strike + total_cost,
-                put_strike - total_cost
-            ],
+            **self.payoff_summary([(1, call_strike, 'C', px_call), (1, put_strike, 'P', px_put)], symbol),
             "orders": orders
         }
 
@@ -361,6 +424,9 @@ class OptionsStrategies:
 # MAIN & EJECUCIÓN
 # ==========================
 if __name__ == "__main__":
+    # BOT_METRICS=1 mide latencias y sirve /metrics en BOT_METRICS_PORT
+    metrics.enable_from_env('metricas_estrategias')
+
     # Configurar credenciales
     auth = AuthManager("tu_usuario", "tu_password")
     
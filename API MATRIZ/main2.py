@@ -11,16 +11,26 @@ Modificado para soportar opciones de GGAL
 # ========================
 import requests
 import json
+import threading
 import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from payoff import analyze as analyze_payoff
+from vol_surface import VolSurface
+import metrics
+
 class Config:
     API_BASE_URL = "https://api.remarkets-primary.com.ar"
     ACCOUNT_ID = "TU_CUENTA"
     RISK_LIMIT = 0.02  # 2% de capital por operación
     VOLATILITY_WINDOW = 20  # Días para cálculo de volatilidad histórica
+    RISK_FREE_RATE = 0.30  # Tasa anual en pesos para valuar opciones (ajustar a la caución vigente)
+    ORDER_RATE_LIMIT = 5  # Mensajes de órdenes por segundo (ajustar al límite de la cuenta)
+    ORDER_BURST = 5  # Ráfaga máxima de mensajes de órdenes
+    CHAIN_MAX_AGE = 5.0  # Segundos sin publicaciones del grabador antes de volver a pedir por REST
+    HIST_VOL_TTL = 3600.0  # Segundos que se reutiliza la volatilidad histórica sin volver a pedir operaciones
     SYMBOL_MAP = {
         'DLR': {'cfi': 'FXXXSX', 'multiplier': 1000},
         'GGAL': {
@@ -31,6 +41,12 @@ class Config:
         }
     }
 
+def http_request(method, url, **kwargs):
+    """requests.request con la latencia del round trip medida por endpoint"""
+    endpoint = '/'.join(url.split('://', 1)[-1].split('?')[0].split('/')[1:4])
+    with metrics.span('http_request', endpoint=f"/{endpoint}"):
+        return requests.request(method, url, **kwargs)
+
 # ==========================
 # MÓDULO DE AUTENTICACIÓN
 # ==========================
@@ -46,7 +62,7 @@ class AuthManager:
             "X-Username": self._username,
             "X-Password": self._password
         }
-        response = requests.post(url, headers=headers)
+        response = http_request("POST", url, headers=headers)
         if response.status_code == 200:
             self._token = response.headers.get("X-Auth-Token")
             return self._token
@@ -57,10 +73,20 @@ class AuthManager:
 # MÓDULO DE MARKET DATA
 # ==========================
 class MarketData:
-    def __init__(self, auth):
+    def __init__(self, auth, instruments=None, chain=None):
         self.auth = auth
+        # InstrumentMaster opcional: los símbolos inexistentes se rechazan sin ir al mercado
+        self.instruments = instruments
+        # LectorCadena opcional (DB/memoria_compartida.py): precios del grabador sin round trip
+        self.chain = chain
+        self._hist_vol = {}  # (símbolo, días) -> (time.monotonic(), volatilidad)
         
     def get_real_time_data(self, symbol, entries="BI,OF,LA,OP,CL,SE,OI"):
+        if self.instruments is not None and symbol not in self.instruments:
+            return self.instruments.check(symbol)
+        data = self.chain_quote(self.chain, symbol)
+        if data is not None:
+            return data
         url = f"{Config.API_BASE_URL}/rest/marketdata/get"
         headers = {"X-Auth-Token": self.auth.get_token()}
         params = {
@@ -69,61 +95,164 @@ class MarketData:
             "entries": entries,
             "depth": 5
         }
-        response = requests.get(url, headers=headers, params=params)
+        response = http_request("GET", url, headers=headers, params=params)
         return response.json() if response.status_code == 200 else None
 
     def get_historical_volatility(self, symbol, days=Config.VOLATILITY_WINDOW):
+        """Volatilidad de las operaciones de los últimos `days` días; se reutiliza
+            durante Config.HIST_VOL_TTL segundos para no pedir getTrades en cada entrada"""
+        cached = self._hist_vol.get((symbol, days))
+        if cached is not None and time.monotonic() - cached[0] < Config.HIST_VOL_TTL:
+            return cached[1]
         url = f"{Config.API_BASE_URL}/rest/data/getTrades"
         headers = {"X-Auth-Token": self.auth.get_token()}
+        params = self.history_params(symbol, days)
+        
+        response = http_request("GET", url, headers=headers, params=params)
+        if response.status_code == 200:
+            vol = self.annualized_volatility(response.json().get('trades', []))
+            self._hist_vol[(symbol, days)] = (time.monotonic(), vol)
+            return vol
+        return 0.0
+
+    @staticmethod
+    def chain_quote(chain, symbol):
+        """Cotización de la memoria compartida con la forma de marketdata/get, o None si no está
+            o el grabador dejó de publicar"""
+        if chain is None or chain.edad() > Config.CHAIN_MAX_AGE:
+            return None
+        quote = chain.cotizacion(symbol)
+        if quote is None:
+            return None
+
+        def level(price, size):
+            return [{"price": float(price), "size": float(size)}] if np.isfinite(price) else []
+        last = float(quote['ultimo'])
+        return {
+            "status": "OK",
+            "marketData": {
+                "BI": level(quote['bid'], quote['tamano_bid']),
+                "OF": level(quote['ask'], quote['tamano_ask']),
+                "LA": {"price": last, "size": None, "date": None} if np.isfinite(last) else None,
+            },
+        }
+
+    @staticmethod
+    def annualized_volatility(trades):
+        closes = [float(trade['price']) for trade in trades]
+        returns = np.log(np.array(closes[1:]) / np.array(closes[:-1]))
+        return np.std(returns) * np.sqrt(252)  # Volatilidad anualizada
+
+    @staticmethod
+    def history_params(symbol, days):
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
-        
-        params = {
+        return {
             "marketId": "ROFX",
             "symbol": symbol,
             "dateFrom": start_date.strftime("%Y-%m-%d"),
             "dateTo": end_date.strftime("%Y-%m-%d")
         }
-        
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json().get('trades', [])
-            closes = [float(trade['price']) for trade in data]
-            returns = np.log(np.array(closes[1:]) / np.array(closes[:-1]))
-            return np.std(returns) * np.sqrt(252)  # Volatilidad anualizada
-        return 0.0
 
 # ==========================
 # MÓDULO DE GESTIÓN DE RIESGO
 # ==========================
 class RiskManager:
-    def __init__(self, auth):
+    def __init__(self, auth, engine=None, store=None):
         self.auth = auth
+        # Motor de riesgo de cartera opcional (risk_engine.RiskEngine con el spot actualizado)
+        self.engine = engine
+        # OrderStore opcional: las patas entran al motor a medida que se ejecutan sus órdenes
+        self.store = store
+        self._tracked = {}  # clOrdId -> [pata por unidad con el signo del lado, cantidad ya aplicada]
+        self._lock = threading.Lock()
+        if store is not None:
+            store.add_listener(self._on_order)
         
     def get_account_balance(self):
         url = f"{Config.API_BASE_URL}/rest/risk/accountReport/{Config.ACCOUNT_ID}"
         headers = {"X-Auth-Token": self.auth.get_token()}
-        response = requests.get(url, headers=headers)
+        response = http_request("GET", url, headers=headers)
         if response.status_code == 200:
             return float(response.json()['accountData']['availableToCollateral'])
         return 0.0
 
-    def calculate_position_size(self, premium, stop_loss_pct=0.10):
-        balance = self.get_account_balance()
+    def calculate_position_size(self, premium, stop_loss_pct=0.10, legs=None, contracts=1):
+        return self.size_for_balance(self.get_account_balance(), premium, stop_loss_pct, legs, contracts)
+
+    def size_for_balance(self, balance, premium, stop_loss_pct=0.10, legs=None, contracts=1):
         max_risk = balance * Config.RISK_LIMIT
-        return int(max_risk / (premium * stop_loss_pct))
+        size = int(max_risk / (abs(premium) * stop_loss_pct))
+        # Con el motor de riesgo, limitar además por la pérdida del peor escenario
+        # de la cartera completa (posiciones abiertas + la nueva operación)
+        if self.engine is not None and legs and self.engine.spot is not None:
+            max_contracts = self.engine.max_contracts(legs, max_risk)
+            if max_contracts is not None:
+                size = min(size, max_contracts // contracts)
+        return size
+
+    @staticmethod
+    def accepted(result):
+        return bool(result) and result.get('status') == 'OK'
+
+    def register_position(self, legs, size, orders):
+        """Registrar en el motor de riesgo las patas cuyas órdenes fueron aceptadas (orders en el
+            mismo orden que legs). Con OrderStore cada pata suma sólo lo ejecutado; sin él, entera"""
+        if self.engine is None or not legs:
+            return
+        # El subyacente (conversiones/reversiones) no entra al motor de opciones
+        accepted = [(leg, order) for leg, order in zip(legs, orders) if self.accepted(order) and 'strike' in leg]
+        if self.store is None:
+            self.engine.add_legs([leg for leg, _ in accepted], size)
+            return
+        for leg, order in accepted:
+            cl_ord_id = str(order['order']['clientId'])
+            with self._lock:
+                self._tracked[cl_ord_id] = [{**leg, 'qty': 1 if leg['qty'] > 0 else -1}, 0.0]
+            # Los fills que llegaron antes de registrar la pata
+            state = self.store.get(cl_ord_id)
+            if state is not None:
+                self._on_order(state, None)
+
+    def _on_order(self, order, event):
+        """Listener del OrderStore: sumar al motor la cantidad ejecutada desde el último reporte"""
+        with self._lock:
+            tracked = self._tracked.get(order.cl_ord_id)
+            if tracked is None:
+                return
+            leg, applied = tracked
+            filled = max(order.cum_qty - applied, 0.0)
+            tracked[1] = max(order.cum_qty, applied)
+            if order.done:
+                del self._tracked[order.cl_ord_id]
+                if order.replaced_by:
+                    # Cancel/replace: la orden nueva arrastra el cumQty de la original
+                    self._tracked[str(order.replaced_by)] = [leg, tracked[1]]
+            if filled > 0:
+                self.engine.add_legs([leg], filled)
 
 # ==========================
 # MÓDULO DE EJECUCIÓN DE ÓRDENES
 # ==========================
 class OrderManager:
-    def __init__(self, auth):
+    def __init__(self, auth, store=None, instruments=None):
         self.auth = auth
+        # OrderStore opcional: registra cada orden aceptada para seguir sus execution reports
+        self.store = store
+        self.instruments = instruments
         
     def send_order(self, order_params):
+        if self.instruments is not None and order_params.get('symbol') not in self.instruments:
+            return self.instruments.check(order_params.get('symbol'))
         url = f"{Config.API_BASE_URL}/rest/order/newSingleOrder"
         headers = {"X-Auth-Token": self.auth.get_token()}
-        
+        response = http_request("GET", url, headers=headers, params=self.order_params(order_params))
+        result = response.json() if response.status_code == 200 else None
+        self._record_new(result, order_params)
+        return result
+
+    @staticmethod
+    def order_params(order_params):
         default_params = {
             "marketId": "ROFX",
             "timeInForce": "DAY",
@@ -131,19 +260,78 @@ class OrderManager:
             "cancelPrevious": False,
             "account": Config.ACCOUNT_ID
         }
-        
-        response = requests.get(url, headers=headers, params={**default_params, **order_params})
-        return response.json() if response.status_code == 200 else None
+        return {**default_params, **order_params}
+
+    def cancel_order(self, cl_ord_id, proprietary="PBCP"):
+        url = f"{Config.API_BASE_URL}/rest/order/cancelById"
+        headers = {"X-Auth-Token": self.auth.get_token()}
+        params = {"clOrdId": cl_ord_id, "proprietary": proprietary}
+        response = http_request("GET", url, headers=headers, params=params)
+        result = response.json() if response.status_code == 200 else None
+        self._record_cancel(result, cl_ord_id)
+        return result
+
+    def replace_order(self, cl_ord_id, price, order_qty, proprietary="PBCP"):
+        url = f"{Config.API_BASE_URL}/rest/order/replaceById"
+        headers = {"X-Auth-Token": self.auth.get_token()}
+        params = {"clOrdId": cl_ord_id, "proprietary": proprietary, "price": price, "orderQty": order_qty}
+        response = http_request("GET", url, headers=headers, params=params)
+        result = response.json() if response.status_code == 200 else None
+        self._record_replace(result, cl_ord_id, price, order_qty)
+        return result
+
+    # Registro en el OrderStore de las respuestas aceptadas
+    def _record_new(self, result, order_params):
+        if self.store is not None and result and result.get('status') == 'OK':
+            self.store.register(result['order']['clientId'], order_params.get('symbol'), order_params.get('side'),
+                                order_params.get('orderQty'), order_params.get('price'))
+
+    def _record_cancel(self, result, cl_ord_id):
+        if self.store is not None and result and result.get('status') == 'OK':
+            # El CANCELLED definitivo llega por el canal de órdenes
+            self.store.apply({'type': 'report', 'cl_ord_id': str(cl_ord_id), 'status': 'PENDING_CANCEL'})
+
+    def _record_replace(self, result, cl_ord_id, price, order_qty):
+        if self.store is not None and result and result.get('status') == 'OK':
+            new_id = result['order']['clientId']
+            old = self.store.get(cl_ord_id)
+            self.store.apply({'type': 'report', 'cl_ord_id': str(cl_ord_id), 'status': 'REPLACED', 'replaced_by': new_id})
+            self.store.register(new_id, old.symbol if old else None, old.side if old else None, order_qty, price)
 
 # ==========================
 # ESTRATEGIAS COMPLETAS
 # ==========================
 class OptionsStrategies:
-    def __init__(self, auth):
-        self.md = MarketData(auth)
-        self.om = OrderManager(auth)
-        self.rm = RiskManager(auth)
+    def __init__(self, auth, instruments=None, chain=None, surface=None, engine=None, store=None):
+        self.md = MarketData(auth, instruments, chain)
+        self.om = OrderManager(auth, store=store, instruments=instruments)
+        # Superficie de IV (vol_surface.VolSurface); con la cadena compartida se arma una propia
+        if surface is None and chain is not None:
+            surface = VolSurface(rate=Config.RISK_FREE_RATE)
+        self.surface = surface
+        # El motor de riesgo valúa las patas sin 'vol' con la IV de la superficie
+        if engine is not None and engine.surface is None:
+            engine.surface = surface
+        self.rm = RiskManager(auth, engine, store)
         self.symbol_config = Config.SYMBOL_MAP
+        self.instruments = instruments
+
+    def refresh_surface(self, spot=None):
+        """Reajustar la superficie con la cadena compartida (sólo los vencimientos que cambiaron)"""
+        if self.surface is None:
+            return []
+        chain = self.md.chain
+        quotes = chain.a_dataframe() if chain is not None and chain.edad() <= Config.CHAIN_MAX_AGE else None
+        return self.surface.update(quotes, spot)
+
+    def implied_vol(self, strike, expiration, symbol='GGAL'):
+        """IV de la superficie para el strike y vencimiento; la histórica si la superficie no lo cubre"""
+        if self.surface is not None:
+            self.refresh_surface()
+            vol = self.surface.iv(strike, expiration)
+            if np.isfinite(vol):
+                return vol
+        return self.md.get_historical_volatility(symbol)
 
     def parse_ggal_strike(self, strike_str):
         """Convierte el strike de formato 40283 a 4028.30"""
@@ -155,9 +343,35 @@ class OptionsStrategies:
         Ejemplo: GGAL + FEB + C + 40283
         """
         # Asumimos que el strike viene como float (ej: 4028.30)
+        if self.instruments is not None:
+            # Con el maestro de instrumentos el símbolo sale del listado, no de adivinar el formato
+            symbol = self.instruments.resolve(base_symbol, expiration, option_type, strike)
+            if symbol is None:
+                raise ValueError(f"Opción no listada: {base_symbol} {expiration} {option_type} {strike}")
+            return symbol
         strike_formatted = str(int(strike * self.symbol_config['GGAL']['strike_divisor']))
         return f"GFG{option_type}{strike_formatted}{expiration}"
 
+    def option_leg(self, option_symbol, qty, strike, expiration, option_type, price):
+        """Pata de la estrategia por unidad (+ compra, - venta) con su prima de entrada"""
+        return {'symbol': option_symbol, 'qty': qty, 'strike': strike,
+                'expiry': expiration, 'is_call': option_type == 'C', 'price': price}
+
+    def payoff_summary(self, legs, symbol):
+        """Máxima ganancia, máxima pérdida y breakevens al vencimiento por unidad"""
+        analysis = analyze_payoff(legs, multiplier=self.symbol_config[symbol]['multiplier'])
+        return {key: analysis[key] for key in ('max_profit', 'max_loss', 'breakevens')}
+
+    def send_legs(self, trace, orders):
+        """Enviar las órdenes de una estrategia en secuencia: order_sent al volver cada envío,
+            ack cuando respondieron todas las patas"""
+        results = []
+        for order in orders:
+            results.append(self.om.send_order(order))
+            trace.mark('order_sent')
+        trace.mark('ack')
+        return results
+
     # --------------------------------------------------
     # 1. BULL/BEAR SPREADS
     # --------------------------------------------------
@@ -166,6 +380,7 @@ class OptionsStrategies:
         Estrategia genérica para spreads verticales
         Types: 'bull_call', 'bear_put', 'bear_call', 'bull_put'
         """
+        trace = metrics.trace('strategy_order', strategy='vertical_spread')
         if symbol == 'GGAL':
             # Convertir strikes si es necesario
             short_strike = self.parse_ggal_strike(str(short_strike))
@@ -191,29 +406,36 @@ class OptionsStrategies:
             side_long = 'SELL'
             side_short = 'BUY'
         
-        position_size = self.rm.calculate_position_size(debit) * contracts
+        sign = 1 if side_long == 'BUY' else -1
+        legs = [
+            self.option_leg(long_leg, sign, long_strike, expiration, option_type, px_long),
+            self.option_leg(short_leg, -sign, short_strike, expiration, option_type, px_short),
+        ]
+        position_size = self.rm.calculate_position_size(debit, legs=legs, contracts=contracts) * contracts
         
-        orders = [
-            self.om.send_order({
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {
                 "symbol": long_leg,
                 "orderQty": position_size,
                 "price": px_long,
                 "ordType": "LIMIT",
                 "side": side_long
-            }),
-            self.om.send_order({
+            },
+            {
                 "symbol": short_leg,
                 "orderQty": position_size,
                 "price": px_short,
                 "ordType": "LIMIT",
                 "side": side_short
-            })
-        ]
+            }
+        ])
+        self.rm.register_position(legs, position_size, orders)
         
         return {
             "strategy": strategy_type,
             "net_debit": debit * multiplier,
-            "max_profit": (long_strike - short_strike - debit) * multiplier if 'bull' in strategy_type else (short_strike - long_strike - debit) * multiplier,
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -229,6 +451,7 @@ class OptionsStrategies:
         - Buy CALL (K4)
         Donde K1 < K2 < K3 < K4
         """
+        trace = metrics.trace('strategy_order', strategy='iron_condor')
         if symbol == 'GGAL':
             put_spread = [self.parse_ggal_strike(str(k)) for k in put_spread]
             call_spread = [self.parse_ggal_strike(str(k)) for k in call_spread]
@@ -247,22 +470,30 @@ class OptionsStrategies:
         
         # Calcular crédito neto
         net_credit = (px_put_short - px_put_long) + (px_call_short - px_call_long)
-        position_size = self.rm.calculate_position_size(net_credit) * contracts
+        legs = [
+            self.option_leg(put_short, -1, put_spread[0], expiration, 'V', px_put_short),
+            self.option_leg(put_long, 1, put_spread[1], expiration, 'V', px_put_long),
+            self.option_leg(call_short, -1, call_spread[0], expiration, 'C', px_call_short),
+            self.option_leg(call_long, 1, call_spread[1], expiration, 'C', px_call_long),
+        ]
+        position_size = self.rm.calculate_position_size(net_credit, legs=legs, contracts=contracts) * contracts
         
         # Ejecutar órdenes
-        orders = [
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
             # Put Spread
-            self.om.send_order({"symbol": put_short, "side": "SELL", "orderQty": position_size, "price": px_put_short}),
-            self.om.send_order({"symbol": put_long, "side": "BUY", "orderQty": position_size, "price": px_put_long}),
+            {"symbol": put_short, "side": "SELL", "orderQty": position_size, "price": px_put_short},
+            {"symbol": put_long, "side": "BUY", "orderQty": position_size, "price": px_put_long},
             # Call Spread
-            self.om.send_order({"symbol": call_short, "side": "SELL", "orderQty": position_size, "price": px_call_short}),
-            self.om.send_order({"symbol": call_long, "side": "BUY", "orderQty": position_size, "price": px_call_long})
-        ]
+            {"symbol": call_short, "side": "SELL", "orderQty": position_size, "price": px_call_short},
+            {"symbol": call_long, "side": "BUY", "orderQty": position_size, "price": px_call_long}
+        ])
+        self.rm.register_position(legs, position_size, orders)
         
         return {
             "strategy": "iron_condor",
             "net_credit": net_credit * self.symbol_config[symbol]['multiplier'],
-            "max_loss": (put_spread[1] - put_spread[0] + call_spread[1] - call_spread[0] - net_credit) * self.symbol_config[symbol]['multiplier'],
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -276,6 +507,7 @@ class OptionsStrategies:
         - Sell 2 K2
         - Buy 1 K3
         """
+        trace = metrics.trace('strategy_order', strategy='butterfly_spread')
         if symbol == 'GGAL':
             lower_strike = self.parse_ggal_strike(str(lower_strike))
             middle_strike = self.parse_ggal_strike(str(middle_strike))
@@ -296,19 +528,26 @@ class OptionsStrategies:
         
         # Calcular costo/net debit
         net_debit = px_leg1 - (2 * px_leg2) + px_leg3
-        position_size = self.rm.calculate_position_size(abs(net_debit)) * contracts
+        legs = [
+            self.option_leg(leg1, 1, lower_strike, expiration, option_type, px_leg1),
+            self.option_leg(leg2, -2, middle_strike, expiration, option_type, px_leg2),
+            self.option_leg(leg3, 1, upper_strike, expiration, option_type, px_leg3),
+        ]
+        position_size = self.rm.calculate_position_size(abs(net_debit), legs=legs, contracts=contracts) * contracts
         
         # Ejecutar órdenes
-        orders = [
-            self.om.send_order({"symbol": leg1, "side": "BUY", "orderQty": position_size, "price": px_leg1}),
-            self.om.send_order({"symbol": leg2, "side": "SELL", "orderQty": position_size * 2, "price": px_leg2}),
-            self.om.send_order({"symbol": leg3, "side": "BUY", "orderQty": position_size, "price": px_leg3})
-        ]
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": leg1, "side": "BUY", "orderQty": position_size, "price": px_leg1},
+            {"symbol": leg2, "side": "SELL", "orderQty": position_size * 2, "price": px_leg2},
+            {"symbol": leg3, "side": "BUY", "orderQty": position_size, "price": px_leg3}
+        ])
+        self.rm.register_position(legs, position_size, orders)
         
         return {
             "strategy": f"{strategy_type}_butterfly",
             "net_cost": net_debit * multiplier,
-            "max_profit": (middle_strike - lower_strike - net_debit) * multiplier,
+            **self.payoff_summary(legs, symbol),
             "orders": orders
         }
 
@@ -321,6 +560,7 @@ class OptionsStrategies:
         - Buy 1 ITM option
         - Sell X OTM options (ratio typically 2:1 or 3:1)
         """
+        trace = metrics.trace('strategy_order', strategy='ratio_spread')
         if symbol == 'GGAL':
             long_strike = self.parse_ggal_strike(str(long_strike))
             short_strike = self.parse_ggal_strike(str(short_strike))
@@ -338,18 +578,26 @@ class OptionsStrategies:
         
         # Calcular crédito/débito
         net_credit = (px_short * ratio) - px_long
-        position_size = self.rm.calculate_position_size(net_credit) * contracts
+        legs = [
+            self.option_leg(long_leg, 1, long_strike, expiration, option_type, px_long),
+            self.option_leg(short_leg, -ratio, short_strike, expiration, option_type, px_short),
+        ]
+        position_size = self.rm.calculate_position_size(net_credit, legs=legs, contracts=contracts) * contracts
         
         # Ejecutar órdenes
-        orders = [
-            self.om.send_order({"symbol": long_leg, "side": "BUY", "orderQty": position_size, "price": px_long}),
-            self.om.send_order({"symbol": short_leg, "side": "SELL", "orderQty": position_size * ratio, "price": px_short})
-        ]
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": long_leg, "side": "BUY", "orderQty": position_size, "price": px_long},
+            {"symbol": short_leg, "side": "SELL", "orderQty": position_size * ratio, "price": px_short}
+        ])
+        self.rm.register_position(legs, position_size, orders)
+        summary = self.payoff_summary(legs, symbol)
         
         return {
             "strategy": f"{strategy_type}_ratio_{ratio}1",
             "net_credit": net_credit * multiplier,
-            "max_risk": "Unlimited" if strategy_type == 'call' else (long_strike - (net_credit/multiplier)) * multiplier,
+            **summary,
+            "max_risk": "Unlimited" if summary['max_loss'] == float('inf') else summary['max_loss'],
             "orders": orders
         }
 
@@ -362,6 +610,7 @@ class OptionsStrategies:
         - Straddle (mismo strike)
         - Strangle (strikes diferentes)
         """
+        trace = metrics.trace('strategy_order', strategy='volatility_play')
         if symbol == 'GGAL':
             strike1 = self.parse_ggal_strike(str(strike1))
             if strike2:
@@ -380,20 +629,67 @@ class OptionsStrategies:
         px_put = self.md.get_real_time_data(put_symbol)['marketData']['LA']['price']
         
         total_cost = (px_call + px_put) * self.symbol_config[symbol]['multiplier']
-        position_size = self.rm.calculate_position_size(total_cost) * contracts
-        
-        orders = [
-            self.om.send_order({"symbol": call_symbol, "side": "BUY", "orderQty": position_size, "price": px_call}),
-            self.om.send_order({"symbol": put_symbol, "side": "BUY", "orderQty": position_size, "price": px_put})
+        # IV actual de la superficie: referencia para la volatilidad que se compra
+        implied = self.implied_vol(call_strike, expiration, symbol)
+        legs = [
+            self.option_leg(call_symbol, 1, call_strike, expiration, 'C', px_call),
+            self.option_leg(put_symbol, 1, put_strike, expiration, 'V', px_put),
         ]
+        position_size = self.rm.calculate_position_size(px_call + px_put, legs=legs, contracts=contracts) * contracts
+        
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {"symbol": call_symbol, "side": "BUY", "orderQty": position_size, "price": px_call},
+            {"symbol": put_symbol, "side": "BUY", "orderQty": position_size, "price": px_put}
+        ])
+        self.rm.register_position(legs, position_size, orders)
         
         return {
             "strategy": strategy_type,
             "total_cost": total_cost,
-            "breakevens": [
-                call_strike + total_cost/self.symbol_config[symbol]['multiplier'],
-                put_strike - total_cost/self.symbol_config[symbol]['multiplier']
-            ],
+            "implied_vol": implied,
+            **self.payoff_summary(legs, symbol),
+            "orders": orders
+        }
+
+    # --------------------------------------------------
+    # 6. ARBITRAJES DE PARIDAD (alertas de ParityScanner)
+    # --------------------------------------------------
+    def arbitrage(self, alert, symbol='GGAL', contracts=1):
+        """
+        Ejecuta una alerta de parity_scanner.ParityScanner:
+        - Box spread (4 opciones)
+        - Conversión / reversión (2 opciones + subyacente)
+        Las patas van como órdenes límite a los precios de la alerta
+        """
+        trace = metrics.trace('strategy_order', strategy='arbitrage')
+        multiplier = self.symbol_config[symbol]['multiplier']
+        option_legs = [leg for leg in alert['legs'] if 'strike' in leg]
+        premium = alert['net_debit'] or alert['edge']
+        size = self.rm.calculate_position_size(premium, legs=option_legs, contracts=contracts)
+        # No pedir más de lo que muestran las puntas
+        position_size = min(size, int(alert['max_size']) // contracts) * contracts
+        if position_size <= 0:
+            return {"strategy": alert['kind'], "expected_profit": 0.0, "orders": []}
+
+        trace.mark('signal')
+        orders = self.send_legs(trace, [
+            {
+                "symbol": leg['symbol'],
+                # El subyacente se opera en acciones: un contrato son `multiplier` acciones
+                "orderQty": position_size * (1 if 'strike' in leg else multiplier),
+                "price": leg['price'],
+                "ordType": "LIMIT",
+                "side": "BUY" if leg['qty'] > 0 else "SELL"
+            }
+            for leg in alert['legs']
+        ])
+        self.rm.register_position(alert['legs'], position_size, orders)
+
+        return {
+            "strategy": alert['kind'],
+            "expiry": alert['expiry'],
+            "expected_profit": alert['edge'] * multiplier * position_size,
             "orders": orders
         }
 
@@ -401,6 +697,9 @@ class OptionsStrategies:
 # MAIN & EJECUCIÓN
 # ==========================
 if __name__ == "__main__":
+    # BOT_METRICS=1 mide latencias y sirve /metrics en BOT_METRICS_PORT
+    metrics.enable_from_env('metricas_estrategias')
+
     # Configurar credenciales
     auth = AuthManager("tu_usuario", "tu_password")
     
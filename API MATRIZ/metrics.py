@@ -0,0 +1,310 @@
+"""
+Instrumentación de latencia para los bots
+Spans con reloj monótono (perf_counter_ns) que se acumulan en histogramas de
+buckets fijos al estilo HDR: log-lineales, 64 sub-buckets por potencia de 2
+(error relativo < 1,6%) entre 1 µs y ~38 horas, sin guardar las muestras. Los
+histogramas se exponen en formato de texto de Prometheus en un endpoint local
+y se resumen en percentiles al cierre del día.
+
+Desactivada por defecto: span() y trace() devuelven un objeto nulo compartido y
+observe() retorna de inmediato, así que el costo en el camino caliente es una
+consulta a una variable global. Se activa con enable() o con BOT_METRICS=1.
+
+Uso:
+    metrics.enable(port=9108)
+    with metrics.span('http_request', endpoint='/rest/order/newSingleOrder'):
+        ...
+    t = metrics.trace('strategy', strategy='iron_condor')  # desde la señal
+    t.mark('order_sent'); ...; t.mark('ack')
+    print(metrics.summary())
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF = SUB_COUNT >> 1
+MAX_BITS = 37  # 2^37 µs ~ 38 horas
+BUCKETS = SUB_COUNT + (MAX_BITS - SUB_BITS) * HALF
+# Límites (segundos) de los buckets que se exportan a Prometheus
+EXPORT_BOUNDS = [m * 10.0 ** e for e in range(-5, 2) for m in (1, 2, 5)]
+
+ENABLED = os.environ.get('BOT_METRICS', '') not in ('', '0')
+now = time.perf_counter_ns
+
+
+def bucket_index(us):
+    """Índice del bucket de un valor entero en microsegundos"""
+    if us < SUB_COUNT:
+        return max(us, 0)
+    shift = us.bit_length() - SUB_BITS
+    if shift > MAX_BITS - SUB_BITS:
+        return BUCKETS - 1
+    return SUB_COUNT + (shift - 1) * HALF + (us >> shift) - HALF
+
+
+def bucket_upper(index):
+    """Límite superior (exclusivo, en µs) del bucket"""
+    if index < SUB_COUNT:
+        return index + 1
+    shift, offset = divmod(index - SUB_COUNT, HALF)
+    return (HALF + offset + 1) << (shift + 1)
+
+
+class Histogram:
+    """Histograma de latencias de tamaño fijo"""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record_ns(self, ns):
+        us = ns // 1000
+        i = bucket_index(us)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total_us += us
+            if us > self.max_us:
+                self.max_us = us
+
+    def percentile(self, q):
+        """Percentil q (0-100) en segundos, con la resolución del bucket"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            objetivo = q / 100 * self.count
+            acumulado = 0
+            for i, c in enumerate(self.counts):
+                acumulado += c
+                if c and acumulado >= objetivo:
+                    return min(bucket_upper(i), self.max_us) / 1e6
+        return self.max_us / 1e6
+
+    def cumulative(self, bounds):
+        """Conteos acumulados para los límites dados (segundos), más el total"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        resultado, acumulado, i = [], 0, 0
+        for bound in bounds:
+            limite = bound * 1e6
+            while i < BUCKETS and bucket_upper(i) <= limite:
+                acumulado += counts[i]
+                i += 1
+            resultado.append(acumulado)
+        return resultado, total
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * BUCKETS
+            self.count = self.total_us = self.max_us = 0
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    h = _registry.get(key)
+    if h is None:
+        with _registry_lock:
+            h = _registry.setdefault(key, Histogram(name, dict(key[1])))
+    return h
+
+
+def observe(name, seconds, **labels):
+    """Registrar una duración medida por otro medio (ej. response.elapsed)"""
+    if ENABLED:
+        histogram(name, **labels).record_ns(int(seconds * 1e9))
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, h):
+        self.histogram = h
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record_ns(now() - self.start)
+        return False
+
+
+class Trace:
+    """Etapas de un mismo evento medidas desde su origen (llegada del tick, señal...)
+        Cada mark(etapa) registra el tiempo transcurrido en {name}_seconds{stage=etapa}"""
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, start=None, **labels):
+        self.name = name
+        self.labels = labels
+        self.start = start if start is not None else now()
+
+    def mark(self, stage):
+        histogram(f"{self.name}_seconds", stage=stage, **self.labels).record_ns(now() - self.start)
+
+
+class _Null:
+    """Span/Trace nulo cuando la instrumentación está desactivada"""
+
+    __slots__ = ()
+    start = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mark(self, stage):
+        pass
+
+
+_NULL = _Null()
+
+
+def span(name, **labels):
+    """Context manager que mide un bloque en {name}_seconds"""
+    if not ENABLED:
+        return _NULL
+    return _Span(histogram(f"{name}_seconds", **labels))
+
+
+def trace(name, start=None, **labels):
+    if not ENABLED:
+        return _NULL
+    return Trace(name, start, **labels)
+
+
+# ---------- exportación ----------
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+
+def prometheus_text():
+    """Histogramas en el formato de exposición de texto de Prometheus"""
+    lineas = []
+    vistos = set()
+    for h in sorted(list(_registry.values()), key=lambda h: (h.name, sorted(h.labels.items()))):
+        if h.name not in vistos:
+            vistos.add(h.name)
+            lineas.append(f"# TYPE {h.name} histogram")
+        acumulados, total = h.cumulative(EXPORT_BOUNDS)
+        for bound, acumulado in zip(EXPORT_BOUNDS, acumulados):
+            lineas.append(f"{h.name}_bucket{_label_text(h.labels, {'le': f'{bound:g}'})} {acumulado}")
+        lineas.append(f"{h.name}_bucket{_label_text(h.labels, {'le': '+Inf'})} {total}")
+        lineas.append(f"{h.name}_sum{_label_text(h.labels)} {h.total_us / 1e6:.6f}")
+        lineas.append(f"{h.name}_count{_label_text(h.labels)} {total}")
+    return '\n'.join(lineas) + '\n'
+
+
+def summary(percentiles=(50, 90, 99, 99.9)):
+    """Tabla de percentiles (ms) por histograma para el informe de fin de día"""
+    filas = [(h.name + _label_text(h.labels), h)
+             for h in sorted(list(_registry.values()), key=lambda h: (h.name, sorted(h.labels.items()))) if h.count]
+    ancho = max([len(nombre) for nombre, _ in filas] + [7]) + 2
+    lineas = [f"Latencias (ms) - {datetime.now():%Y-%m-%d %H:%M}",
+              f"{'métrica':<{ancho}}{'n':>9}" + ''.join(f"{'p' + format(p, 'g'):>10}" for p in percentiles) + f"{'max':>10}"]
+    for nombre, h in filas:
+        lineas.append(f"{nombre:<{ancho}}{h.count:>9}" + ''.join(f"{h.percentile(p) * 1000:>10.2f}" for p in percentiles)
+                      + f"{h.max_us / 1000:>10.2f}")
+    return '\n'.join(lineas)
+
+
+def reset():
+    for h in list(_registry.values()):
+        h.reset()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+_server = None
+
+
+def serve(port=9108, host='127.0.0.1'):
+    """Endpoint /metrics local en un hilo de fondo"""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    return _server
+
+
+def enable(port=None, summary_path=None):
+    """Activar la instrumentación; con port sirve /metrics y con summary_path
+        escribe el resumen de percentiles al terminar el proceso"""
+    global ENABLED
+    ENABLED = True
+    if port:
+        serve(port)
+    if summary_path:
+        atexit.register(write_summary, summary_path)
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def enable_from_env(prefix=None):
+    """BOT_METRICS=1 activa; BOT_METRICS_PORT elige el puerto del endpoint (9108).
+        Con prefix, el resumen se agrega a {prefix}_{fecha}.txt al terminar"""
+    if ENABLED:
+        summary_path = f"{prefix}_{datetime.now():%Y-%m-%d}.txt" if prefix else None
+        enable(int(os.environ.get('BOT_METRICS_PORT', 9108)), summary_path)
+
+
+def write_summary(path):
+    texto = summary()
+    print(texto)
+    with open(path, 'a') as f:
+        f.write(texto + '\n\n')
+
+
+if __name__ == "__main__":
+    # Costo por span con la instrumentación apagada y encendida
+    n = 200_000
+    for activo in (False, True):
+        ENABLED = activo
+        inicio = time.perf_counter()
+        for _ in range(n):
+            with span('bench'):
+                pass
+        print(f"span {'activado' if activo else 'desactivado'}: {(time.perf_counter() - inicio) / n * 1e9:.0f} ns")
+    h = histogram('prueba_seconds')
+    for us in range(1, 100_001):
+        h.record_ns(us * 1000)
+    print(f"p50={h.percentile(50) * 1e3:.2f} ms (50.00)  p99={h.percentile(99) * 1e3:.2f} ms (99.00)")
+    print(summary())
+    print(prometheus_text()[:400])
@@ -0,0 +1,353 @@
+"""
+Estado de órdenes y ejecuciones
+Tabla en memoria de órdenes indexada por clOrdId (consultas O(1)), actualizada
+con los execution reports del canal de órdenes del WebSocket de Primary o con
+execDetailsEvent/orderStatusEvent de IB. Cada evento se agrega a un log JSONL
+append-only desde el que se reconstruye el estado al reiniciar. Las estrategias
+pueden esperar el fill de una orden en lugar de consultar en un bucle.
+
+Uso:
+    store = OrderStore('ordenes.jsonl')
+    om = OrderManager(auth, store=store)
+    PrimaryOrderStream(auth, store).start()
+    resultado = om.send_order({...})
+    orden = store.wait_for_fill(resultado['order']['clientId'], timeout=30)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+# Estados normalizados (los de Primary; los de IB se traducen)
+PENDING_NEW = 'PENDING_NEW'
+NEW = 'NEW'
+PARTIALLY_FILLED = 'PARTIALLY_FILLED'
+FILLED = 'FILLED'
+PENDING_CANCEL = 'PENDING_CANCEL'
+CANCELLED = 'CANCELLED'
+REPLACED = 'REPLACED'
+REJECTED = 'REJECTED'
+EXPIRED = 'EXPIRED'
+
+TERMINAL = {FILLED, CANCELLED, REPLACED, REJECTED, EXPIRED}
+
+IB_STATUS = {
+    'PendingSubmit': PENDING_NEW, 'ApiPending': PENDING_NEW, 'PreSubmitted': NEW, 'Submitted': NEW,
+    'PendingCancel': PENDING_CANCEL, 'ApiCancelled': CANCELLED, 'Cancelled': CANCELLED,
+    'Filled': FILLED, 'Inactive': REJECTED,
+}
+
+
+class OrderState:
+    """Estado vivo de una orden"""
+
+    __slots__ = ('cl_ord_id', 'order_id', 'symbol', 'side', 'qty', 'price', 'status', 'cum_qty',
+                 'leaves_qty', 'avg_px', 'fills', 'text', 'created', 'updated', 'replaced_by')
+
+    def __init__(self, cl_ord_id, symbol=None, side=None, qty=0.0, price=None, status=PENDING_NEW):
+        self.cl_ord_id = cl_ord_id
+        self.order_id = None
+        self.symbol = symbol
+        self.side = side
+        self.qty = float(qty or 0)
+        self.price = price
+        self.status = status
+        self.cum_qty = 0.0
+        self.leaves_qty = self.qty
+        self.avg_px = 0.0
+        self.fills = []  # (exec_id, cantidad, precio, hora)
+        self.text = None
+        self.created = time.time()
+        self.updated = self.created
+        self.replaced_by = None
+
+    @property
+    def done(self):
+        return self.status in TERMINAL
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class OrderStore:
+    """Tabla de órdenes por clOrdId con log append-only y espera de fills"""
+
+    def __init__(self, log_path=None):
+        self.orders = {}
+        self.by_symbol = {}     # símbolo -> {clOrdId} de órdenes abiertas
+        self._exec_ids = set()  # para descartar reportes duplicados
+        self._waiters = {}      # clOrdId -> [Future]
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._log = None
+        self.log_path = log_path
+        if log_path:
+            if os.path.exists(log_path):
+                self.replay(log_path)
+            self._log = open(log_path, 'a', buffering=1)
+
+    # ---------- consultas O(1) ----------
+    def get(self, cl_ord_id):
+        return self.orders.get(str(cl_ord_id))
+
+    def status(self, cl_ord_id):
+        order = self.get(cl_ord_id)
+        return order.status if order else None
+
+    def open_orders(self, symbol=None):
+        with self._lock:
+            if symbol is not None:
+                return [self.orders[i] for i in self.by_symbol.get(symbol, ())]
+            return [o for ids in self.by_symbol.values() for o in (self.orders[i] for i in ids)]
+
+    def add_listener(self, callback):
+        """callback(order_state, evento) en cada actualización"""
+        self._listeners.append(callback)
+
+    # ---------- eventos ----------
+    def register(self, cl_ord_id, symbol=None, side=None, qty=0, price=None, status=PENDING_NEW):
+        """Alta de una orden enviada (al recibir el clOrdId de la respuesta REST)"""
+        self.apply({'type': 'new', 'cl_ord_id': str(cl_ord_id), 'symbol': symbol, 'side': side,
+                    'qty': qty, 'price': price, 'status': status})
+        return self.get(cl_ord_id)
+
+    def apply(self, event, persist=True):
+        """Aplicar un evento normalizado:
+            {'type': 'new'|'report', 'cl_ord_id', 'status', 'cum_qty', 'leaves_qty', 'avg_px',
+             'last_qty', 'last_px', 'exec_id', 'order_id', 'text', 'replaced_by', ...}"""
+        with self._lock:
+            exec_id = event.get('exec_id')
+            if exec_id is not None:
+                if exec_id in self._exec_ids:
+                    return None
+                self._exec_ids.add(exec_id)
+
+            cl_ord_id = str(event['cl_ord_id'])
+            order = self.orders.get(cl_ord_id)
+            if order is None:
+                order = OrderState(cl_ord_id, event.get('symbol'), event.get('side'),
+                                   event.get('qty'), event.get('price'))
+                self.orders[cl_ord_id] = order
+            elif event['type'] == 'new':
+                return order
+
+            for key in ('symbol', 'side', 'price', 'order_id', 'text', 'replaced_by'):
+                if event.get(key) is not None:
+                    setattr(order, key, event[key])
+            if event.get('qty'):
+                order.qty = float(event['qty'])
+            if event.get('last_qty'):
+                order.fills.append((exec_id, float(event['last_qty']), float(event.get('last_px') or 0),
+                                    event.get('time')))
+            if event.get('cum_qty') is not None:
+                order.cum_qty = float(event['cum_qty'])
+            elif event.get('last_qty'):
+                order.cum_qty += float(event['last_qty'])
+            if event.get('avg_px'):
+                order.avg_px = float(event['avg_px'])
+            elif order.fills:
+                notional = sum(q * p for _, q, p, _ in order.fills)
+                order.avg_px = notional / max(sum(q for _, q, _, _ in order.fills), 1e-12)
+            order.leaves_qty = float(event['leaves_qty']) if event.get('leaves_qty') is not None \
+                else max(order.qty - order.cum_qty, 0.0)
+            if event.get('status'):
+                # Un reporte atrasado no puede sacar a la orden de un estado terminal
+                if not (order.done and event['status'] not in TERMINAL):
+                    order.status = event['status']
+            order.updated = time.time()
+
+            abiertas = self.by_symbol.setdefault(order.symbol, set())
+            if order.done:
+                abiertas.discard(cl_ord_id)
+            else:
+                abiertas.add(cl_ord_id)
+
+            if persist and self._log is not None:
+                self._log.write(json.dumps({'ts': order.updated, **event}, default=str) + '\n')
+            waiters = self._waiters.pop(cl_ord_id, []) if order.done else []
+            if order.status == REPLACED and order.replaced_by:
+                # Quien esperaba la orden original pasa a esperar la que la reemplazó
+                self._waiters.setdefault(str(order.replaced_by), []).extend(waiters)
+                waiters = []
+
+        for future in waiters:
+            if not future.done():
+                future.set_result(order)
+        for listener in self._listeners:
+            try:
+                listener(order, event)
+            except Exception as e:
+                print(f"Error en listener de órdenes: {e}")
+        return order
+
+    def replay(self, log_path):
+        """Reconstruir el estado desde el log (sin volver a escribirlo)"""
+        with open(log_path) as f:
+            for linea in f:
+                linea = linea.strip()
+                if linea:
+                    event = json.loads(linea)
+                    event.pop('ts', None)
+                    self.apply(event, persist=False)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # ---------- espera de fills ----------
+    def fill_future(self, cl_ord_id):
+        """Future que se completa con el OrderState cuando la orden llega a un estado terminal"""
+        cl_ord_id = str(cl_ord_id)
+        future = Future()
+        with self._lock:
+            order = self.orders.get(cl_ord_id)
+            while order is not None and order.status == REPLACED and order.replaced_by:
+                cl_ord_id = str(order.replaced_by)
+                order = self.orders.get(cl_ord_id)
+            if order is not None and order.done:
+                future.set_result(order)
+            else:
+                self._waiters.setdefault(cl_ord_id, []).append(future)
+        return future
+
+    def wait_for_fill(self, cl_ord_id, timeout=None):
+        """Bloquear hasta que la orden termine (FILLED, CANCELLED, REJECTED...),
+            siguiendo la cadena de reemplazos"""
+        return self.fill_future(cl_ord_id).result(timeout)
+
+    async def filled(self, cl_ord_id, timeout=None):
+        """Versión awaitable para estrategias que corren en un event loop (ib_insync)"""
+        return await asyncio.wait_for(asyncio.wrap_future(self.fill_future(cl_ord_id)), timeout)
+
+    # ---------- adaptadores ----------
+    def on_primary_message(self, message):
+        """Execution report del canal de órdenes de Primary ({"type": "or", "orderReport": {...}})"""
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+        if message.get('type') != 'or':
+            return None
+        report = message['orderReport']
+        event = {
+            'type': 'report',
+            'cl_ord_id': report.get('clOrdId'),
+            'order_id': report.get('orderId'),
+            'exec_id': report.get('execId'),
+            'symbol': report.get('instrumentId', {}).get('symbol'),
+            'side': report.get('side'),
+            'qty': report.get('orderQty'),
+            'price': report.get('price'),
+            'status': report.get('status'),
+            'cum_qty': report.get('cumQty'),
+            'leaves_qty': report.get('leavesQty'),
+            'avg_px': report.get('avgPx'),
+            'last_qty': report.get('lastQty'),
+            'last_px': report.get('lastPx'),
+            'text': report.get('text'),
+            'time': report.get('transactTime'),
+        }
+        # Reemplazo: Primary informa la orden nueva con origClOrdId de la anterior
+        orig = report.get('origClOrdId')
+        if orig and orig != event['cl_ord_id']:
+            self.apply({'type': 'report', 'cl_ord_id': orig, 'status': REPLACED,
+                        'replaced_by': event['cl_ord_id']})
+        return self.apply(event)
+
+    def on_ib_exec(self, trade, fill):
+        """Handler para ib.execDetailsEvent"""
+        execution = fill.execution
+        status = IB_STATUS.get(getattr(trade.orderStatus, 'status', None))
+        event = {
+            'type': 'report',
+            'cl_ord_id': trade.order.orderId,
+            'order_id': getattr(trade.order, 'permId', None) or None,
+            'exec_id': execution.execId,
+            'symbol': trade.contract.localSymbol or trade.contract.symbol,
+            'side': 'BUY' if execution.side in ('BOT', 'BUY') else 'SELL',
+            'qty': trade.order.totalQuantity,
+            'last_qty': execution.shares,
+            'last_px': execution.price,
+            'cum_qty': execution.cumQty or None,
+            'avg_px': execution.avgPrice or None,
+            'time': str(fill.time),
+        }
+        # Hasta que llega el último fill IB puede seguir informando Submitted
+        if event['cum_qty'] is not None and event['cum_qty'] >= float(event['qty'] or 0):
+            event['status'] = FILLED
+        else:
+            event['status'] = PARTIALLY_FILLED if status in (None, NEW) else status
+        return self.apply(event)
+
+    def on_ib_status(self, trade):
+        """Handler para ib.orderStatusEvent (cancelaciones, rechazos, altas)"""
+        status = IB_STATUS.get(trade.orderStatus.status)
+        if status is None:
+            return None
+        order = self.get(trade.order.orderId)
+        # Los fills los informa execDetailsEvent con su execId
+        if status == FILLED and (order is None or order.cum_qty < float(trade.order.totalQuantity)):
+            return order
+        return self.apply({
+            'type': 'report', 'cl_ord_id': trade.order.orderId, 'status': status,
+            'symbol': trade.contract.localSymbol or trade.contract.symbol,
+            'side': trade.order.action, 'qty': trade.order.totalQuantity,
+            'text': trade.log[-1].message if getattr(trade, 'log', None) else None,
+        })
+
+
+class PrimaryOrderStream:
+    """Suscripción al canal de órdenes (execution reports) del WebSocket de Primary"""
+
+    def __init__(self, auth, store, account=None, base_url=None, reconnect_delay=5.0):
+        self.auth = auth
+        self.store = store
+        self.account = account
+        self.base_url = base_url
+        self.reconnect_delay = reconnect_delay
+        self._ws = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _url(self):
+        from main2 import Config
+        base = self.base_url or Config.API_BASE_URL
+        return base.replace('https://', 'wss://').replace('http://', 'ws://') + '/'
+
+    def _on_open(self, ws):
+        from main2 import Config
+        ws.send(json.dumps({'type': 'os', 'account': {'id': self.account or Config.ACCOUNT_ID},
+                            'snapshotOnlyActive': False}))
+        print(f"{datetime.now().strftime('%H:%M:%S')} - Suscripto al canal de órdenes de Primary")
+
+    def _on_message(self, ws, message):
+        try:
+            self.store.on_primary_message(message)
+        except Exception as e:
+            print(f"Error al procesar execution report: {e}")
+
+    def _on_error(self, ws, error):
+        print(f"Error en el WebSocket de órdenes: {error}")
+
+    def _run(self):
+        import websocket
+        while not self._stop.is_set():
+            self._ws = websocket.WebSocketApp(
+                self._url(), header={'X-Auth-Token': self.auth.get_token()},
+                on_open=self._on_open, on_message=self._on_message, on_error=self._on_error)
+            self._ws.run_forever(ping_interval=30)
+            if self._stop.wait(self.reconnect_delay):
+                break
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='primary-orders', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._ws is not None:
+            self._ws.close()
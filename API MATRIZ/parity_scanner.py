@@ -0,0 +1,342 @@
+"""
+Scanner de paridad put-call y box spreads sobre el stream de cotizaciones
+Cada vencimiento guarda sus pares call/put por strike en arreglos indexados por
+slot y, por strike, el valor del forward sintético comprado y vendido contra
+las puntas:
+    vendido(K) = K*DF + C.bid - P.ask     (vender call, comprar put)
+    comprado(K) = K*DF + C.ask - P.bid    (comprar call, vender put)
+Un box spread K1/K2 es comprar el sintético en K1 y venderlo en K2, así que su
+ganancia es vendido(K2) - comprado(K1): el mejor box del vencimiento sale del
+máximo de vendido y el mínimo de comprado, que se mantienen en dos árboles de
+segmentos. Con el subyacente, la conversión rinde vendido(K) - S.ask y la
+reversión S.bid - comprado(K). Cada actualización recalcula sólo los strikes
+con puntas nuevas y sus ancestros en los árboles (O(tocados * log n)), así que
+la latencia por callback no depende del tamaño de la cadena.
+
+Las opciones de GGAL son americanas: la pata vendida puede ejercerse antes y
+desarmar la estructura; los dividendos no se descuentan. Las alertas son
+candidatas a revisar, no arbitrajes garantizados.
+
+Uso desde el grabador (DB/script-db.py):
+    scanner = ParityScanner(rate=Config.RISK_FREE_RATE, min_edge=5.0)
+    registrar_consumidor(scanner.update)
+    scanner.subscribe(lambda alerta: print(alerta['kind'], alerta['edge']))
+
+Uso desde un bot (cadena en memoria compartida del grabador):
+    scanner.subscribe(lambda alerta: strategies.arbitrage(alerta))
+    scanner.update(lector.a_dataframe())   # en cada versión nueva de la cadena
+"""
+
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from vol_surface import expiry_datetime, SECONDS_PER_YEAR
+
+
+class _MaxTree:
+    """Árbol de segmentos de máximo (con su slot) sobre un arreglo de capacidad fija.
+        Las actualizaciones en lote suben nivel por nivel sólo por los ancestros tocados."""
+
+    def __init__(self, capacity):
+        self.size = 1 << max(capacity - 1, 1).bit_length()
+        self.value = np.full(2 * self.size, -np.inf)
+        self.slot = np.full(2 * self.size, -1, dtype=np.int64)
+        self.slot[self.size:] = np.arange(self.size)
+
+    def update(self, slots, values):
+        nodes = slots + self.size
+        self.value[nodes] = values
+        while True:
+            nodes = np.unique(nodes >> 1)
+            if nodes[-1] < 1:
+                return
+            left = nodes << 1
+            right = left + 1
+            take_right = self.value[right] > self.value[left]
+            child = np.where(take_right, right, left)
+            self.value[nodes] = self.value[child]
+            self.slot[nodes] = self.slot[child]
+            if nodes[0] == 1:
+                return
+
+    def best(self):
+        return self.value[1], int(self.slot[1])
+
+
+class _Expiry:
+    """Pares call/put de un vencimiento, un slot por strike"""
+
+    def __init__(self, code, capacity=64):
+        self.code = code
+        self.slots = {}  # strike -> slot
+        self.discount = None
+        self.discounted_at = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        n = len(self.slots)
+        arrays = {
+            'strike': np.full(capacity, np.nan),
+            'call_bid': np.full(capacity, np.nan), 'call_ask': np.full(capacity, np.nan),
+            'put_bid': np.full(capacity, np.nan), 'put_ask': np.full(capacity, np.nan),
+            'call_bid_size': np.zeros(capacity), 'call_ask_size': np.zeros(capacity),
+            'put_bid_size': np.zeros(capacity), 'put_ask_size': np.zeros(capacity),
+        }
+        for name, array in arrays.items():
+            if n:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        call_symbol = np.full(capacity, None, dtype=object)
+        put_symbol = np.full(capacity, None, dtype=object)
+        if n:
+            call_symbol[:n], put_symbol[:n] = self.call_symbol[:n], self.put_symbol[:n]
+        self.call_symbol, self.put_symbol = call_symbol, put_symbol
+        self.capacity = capacity
+        # Árboles: vendido(K) como máximo y -comprado(K) como máximo
+        self.sell = _MaxTree(capacity)
+        self.buy = _MaxTree(capacity)
+        if n and self.discount is not None:
+            self.refresh(np.arange(n))
+
+    def slot(self, strike):
+        slot = self.slots.get(strike)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == self.capacity:
+                self._allocate(self.capacity * 2)
+            self.slots[strike] = slot
+            self.strike[slot] = strike
+        return slot
+
+    def refresh(self, slots):
+        """Recalcular los forwards sintéticos de los slots dados y subirlos a los árboles"""
+        k = self.strike[slots] * self.discount
+        sell = k + self.call_bid[slots] - self.put_ask[slots]
+        buy = k + self.call_ask[slots] - self.put_bid[slots]
+        # Sin punta no hay sintético: queda fuera del máximo
+        self.sell.update(slots, np.where(np.isfinite(sell), sell, -np.inf))
+        self.buy.update(slots, np.where(np.isfinite(buy), -buy, -np.inf))
+
+
+def _valid(price):
+    return np.where(price > 0, price, np.nan)
+
+
+class ParityScanner:
+    """Scanner incremental de paridad put-call, conversiones/reversiones y box spreads"""
+
+    def __init__(self, rate=0.0, min_edge=0.0, underlying='GGAL', discount_refresh=60.0, history=1000):
+        self.rate = rate
+        # Ganancia mínima por unidad de subyacente (pesos) para alertar, neta de costos estimados
+        self.min_edge = min_edge
+        self.underlying = underlying
+        # Cada cuántos segundos se recalcula el factor de descuento de un vencimiento (rebuild completo)
+        self.discount_refresh = discount_refresh
+        self.expiries = {}
+        self.spot_bid = None
+        self.spot_ask = None
+        self.active = {}       # clave de la oportunidad -> ganancia alertada
+        self.alerts = deque(maxlen=history)
+        self.latencies = deque(maxlen=history)
+        self._listeners = []
+
+    def subscribe(self, callback):
+        """callback(alerta) por cada oportunidad nueva o cuya ganancia cambió"""
+        self._listeners.append(callback)
+
+    # ---------- ingreso de cotizaciones ----------
+    @staticmethod
+    def _normalize(quotes):
+        symbol = quotes['simbolo'].to_numpy() if 'simbolo' in quotes else quotes.index.to_numpy()
+        tipo = quotes['tipo_opcion'] if 'tipo_opcion' in quotes else quotes['tipo']
+        is_call = np.array([str(t)[:1].upper() == 'C' for t in tipo.tolist()], dtype=bool)
+
+        def number(*names):
+            name = next((n for n in names if n in quotes), None)
+            if name is None:
+                return np.zeros(len(quotes))
+            column = quotes[name]
+            if column.dtype.kind in 'fiu':
+                return column.to_numpy(float)
+            return pd.to_numeric(column, errors='coerce').to_numpy(float)
+
+        return (symbol, quotes['vencimiento'].to_numpy(), number('strike'), is_call,
+                _valid(number('bid')), _valid(number('ask')),
+                number('tamano_bid', 'bid_size'), number('tamano_ask', 'ask_size'))
+
+    def update(self, quotes, now=None):
+        """Incorporar un lote (simbolo, vencimiento, tipo_opcion, strike, bid, ask y tamaños),
+            recalcular los strikes tocados y emitir las alertas. Devuelve las alertas nuevas."""
+        if quotes is None or not len(quotes):
+            return []
+        inicio = time.perf_counter()
+        now = now or datetime.now()
+        symbol, code, strike, is_call, bid, ask, bid_size, ask_size = self._normalize(quotes)
+        ok = pd.notna(code) & np.isfinite(strike)
+        touched = []
+        for expiry_code in pd.unique(code[ok]):
+            rows = np.flatnonzero(ok & (code == expiry_code))
+            expiry = self.expiries.get(expiry_code)
+            if expiry is None:
+                expiry = self.expiries[expiry_code] = _Expiry(expiry_code)
+            slots = np.fromiter(map(expiry.slot, strike[rows].tolist()), np.int64, len(rows))
+            calls, puts = is_call[rows], ~is_call[rows]
+            for mask, side in ((calls, 'call'), (puts, 'put')):
+                s, r = slots[mask], rows[mask]
+                getattr(expiry, f'{side}_bid')[s] = bid[r]
+                getattr(expiry, f'{side}_ask')[s] = ask[r]
+                getattr(expiry, f'{side}_bid_size')[s] = bid_size[r]
+                getattr(expiry, f'{side}_ask_size')[s] = ask_size[r]
+                getattr(expiry, f'{side}_symbol')[s] = symbol[r]
+            if not self._discount(expiry, now):
+                expiry.refresh(np.unique(slots))
+            touched.append(expiry)
+        nuevas = []
+        for expiry in touched:
+            nuevas.extend(self._scan(expiry))
+        self.latencies.append(time.perf_counter() - inicio)
+        return nuevas
+
+    def update_spot(self, bid, ask):
+        """Puntas del subyacente: reevaluar conversiones y reversiones de todos los vencimientos"""
+        self.spot_bid = bid if bid and bid > 0 else None
+        self.spot_ask = ask if ask and ask > 0 else None
+        nuevas = []
+        for expiry in self.expiries.values():
+            nuevas.extend(self._scan(expiry))
+        return nuevas
+
+    def _discount(self, expiry, now):
+        """Actualizar el factor de descuento si pasó discount_refresh; True si reconstruyó los árboles"""
+        if expiry.discounted_at is not None and (now - expiry.discounted_at).total_seconds() < self.discount_refresh:
+            return False
+        try:
+            t = (expiry_datetime(expiry.code, now) - now).total_seconds() / SECONDS_PER_YEAR
+        except KeyError:
+            t = 0.0  # Código de vencimiento desconocido: sin descuento
+        expiry.discount = float(np.exp(-self.rate * max(t, 0.0)))
+        expiry.discounted_at = now
+        expiry.refresh(np.arange(len(expiry.slots)))
+        return True
+
+    # ---------- oportunidades ----------
+    def _scan(self, expiry):
+        sell, k_sell = expiry.sell.best()
+        buy, k_buy = expiry.buy.best()
+        buy = -buy
+        found = {}
+        # Box: comprar el sintético en k_buy y venderlo en k_sell (con el mismo strike la ganancia es < 0)
+        if np.isfinite(sell) and np.isfinite(buy) and k_sell != k_buy:
+            found['box'] = (sell - buy, k_buy, k_sell)
+        if self.spot_ask is not None and np.isfinite(sell):
+            found['conversion'] = (sell - self.spot_ask, None, k_sell)
+        if self.spot_bid is not None and np.isfinite(buy):
+            found['reversal'] = (self.spot_bid - buy, k_buy, None)
+
+        nuevas = []
+        for kind in ('box', 'conversion', 'reversal'):
+            prefix = (kind, expiry.code)
+            previous = next((key for key in self.active if key[:2] == prefix), None)
+            edge, k_long, k_short = found.get(kind, (-np.inf, None, None))
+            if edge <= self.min_edge:
+                if previous is not None:
+                    del self.active[previous]
+                continue
+            key = prefix + (k_long, k_short)
+            if previous is not None and previous != key:
+                del self.active[previous]
+            if self.active.get(key) == round(edge, 6):
+                continue
+            self.active[key] = round(edge, 6)
+            alert = self._alert(kind, expiry, edge, k_long, k_short)
+            self.alerts.append(alert)
+            nuevas.append(alert)
+            for callback in self._listeners:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    print(f"Error en el suscriptor del scanner: {e}")
+        return nuevas
+
+    def _alert(self, kind, expiry, edge, long_slot, short_slot):
+        """Alerta con las patas en el formato de OptionsStrategies.option_leg"""
+        legs, sizes = [], []
+
+        def option(slot, side, qty):
+            is_call = side == 'call'
+            taking_ask = qty > 0
+            price = getattr(expiry, f"{side}_{'ask' if taking_ask else 'bid'}")[slot]
+            sizes.append(getattr(expiry, f"{side}_{'ask' if taking_ask else 'bid'}_size")[slot])
+            legs.append({'symbol': getattr(expiry, f'{side}_symbol')[slot], 'qty': qty,
+                         'strike': float(expiry.strike[slot]), 'expiry': expiry.code,
+                         'is_call': is_call, 'price': float(price)})
+
+        if long_slot is not None:   # sintético comprado
+            option(long_slot, 'call', 1)
+            option(long_slot, 'put', -1)
+        if short_slot is not None:  # sintético vendido
+            option(short_slot, 'call', -1)
+            option(short_slot, 'put', 1)
+        if kind == 'conversion':
+            legs.append({'symbol': self.underlying, 'qty': 1, 'price': self.spot_ask})
+        elif kind == 'reversal':
+            legs.append({'symbol': self.underlying, 'qty': -1, 'price': self.spot_bid})
+        return {
+            'kind': kind,
+            'expiry': expiry.code,
+            'edge': float(edge),
+            'net_debit': float(sum(leg['qty'] * leg['price'] for leg in legs)),
+            'max_size': float(min(sizes)) if sizes else 0.0,
+            'legs': legs,
+            'time': datetime.now(),
+        }
+
+
+if __name__ == "__main__":
+    # Latencia por callback con cadenas de 20 a 640 strikes por vencimiento: 50 strikes tocados
+    # por lote en un vencimiento, más un box plantado para verificar la detección
+    rng = np.random.default_rng(0)
+    expiries = ['FE', 'AB', 'JU']
+    spot, rate = 4000.0, 0.30
+
+    now = datetime(2024, 2, 1, 12)
+
+    def chain(n_strikes):
+        strikes = 2000.0 + np.arange(n_strikes) * (4000.0 / n_strikes)
+        filas = []
+        for code in expiries:
+            df = np.exp(-rate * (expiry_datetime(code, now) - now).total_seconds() / SECONDS_PER_YEAR)
+            for k in strikes:
+                intrinsic = spot - k * df
+                call_mid = max(intrinsic, 0) + 150
+                put_mid = call_mid - intrinsic
+                for tipo, mid in (('C', call_mid), ('V', put_mid)):
+                    filas.append({'simbolo': f"GFG{tipo}{int(k * 10)}{code}", 'vencimiento': code, 'strike': k,
+                                  'tipo_opcion': 'Call' if tipo == 'C' else 'Put',
+                                  'bid': mid - 5, 'ask': mid + 5, 'bid_size': 10, 'ask_size': 10})
+        return pd.DataFrame(filas).set_index('simbolo')
+
+    for n_strikes in (20, 80, 320, 640):
+        df = chain(n_strikes)
+        scanner = ParityScanner(rate=rate, min_edge=1.0)
+        scanner.update(df, now)
+        scanner.update_spot(spot - 1, spot + 1)
+        fe = df[df['vencimiento'] == 'FE']
+        tiempos = []
+        for _ in range(300):
+            lote = fe.sample(min(100, len(fe)), random_state=rng.integers(1 << 31)).copy()
+            lote[['bid', 'ask']] += rng.normal(0, 0.5, (len(lote), 1))
+            inicio = time.perf_counter()
+            scanner.update(lote, now)
+            tiempos.append(time.perf_counter() - inicio)
+        # Box plantado: el put de un strike alto con el bid muy por encima de su valor
+        plantado = fe[(fe['tipo_opcion'] == 'Put')].iloc[[n_strikes // 2]].copy()
+        plantado[['bid', 'ask']] += 500
+        alertas = scanner.update(plantado, now)
+        print(f"{n_strikes:>4} strikes x {len(expiries)} vencimientos: p50 {np.percentile(tiempos, 50) * 1e6:6.0f} µs, "
+              f"p99 {np.percentile(tiempos, 99) * 1e6:6.0f} µs por lote de hasta 100 cotizaciones; "
+              f"alertas del plantado: {[(a['kind'], round(a['edge'], 1)) for a in alertas]}")
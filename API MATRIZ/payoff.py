@@ -0,0 +1,151 @@
+"""
+Payoff al vencimiento de estrategias de opciones definidas por patas
+Evalúa el P&L de cualquier lista de patas sobre una grilla de precios del
+subyacente con NumPy y obtiene máxima ganancia, máxima pérdida y todos los
+breakevens. El payoff es lineal por tramos con quiebres en los strikes, así
+que con los strikes incluidos en la grilla los resultados son exactos; más allá
+del último strike se extrapola con la pendiente final.
+
+Una pata es un dict como los de risk_engine, con el precio de entrada:
+    {'qty': -1, 'strike': 4200.0, 'is_call': True, 'price': 85.5}
+qty + comprada, - vendida; is_call None para una pata en el subyacente.
+"""
+
+import numpy as np
+
+POINTS = 2001
+
+
+def price_grid(strikes, points=POINTS, upper=3.0):
+    """Grilla de 0 a upper * strike máximo que incluye exactamente cada strike
+        Con points=0 quedan sólo los quiebres (0, strikes y el extremo), que alcanzan
+        para resultados exactos porque entre quiebres el payoff es lineal"""
+    strikes = np.asarray(strikes, dtype=float).ravel()
+    strikes = strikes[np.isfinite(strikes)]
+    top = upper * strikes.max() if strikes.size else 1.0
+    dense = np.linspace(0.0, top, points) if points else np.array([0.0, top])
+    return np.union1d(dense, strikes)
+
+
+def leg_arrays(legs):
+    """(qty, strike, kind, price): kind 1 call, -1 put, 0 subyacente"""
+    qty = np.array([leg['qty'] for leg in legs], dtype=float)
+    strike = np.array([leg.get('strike') or 0.0 for leg in legs], dtype=float)
+    kind = np.array([0 if leg.get('is_call') is None else (1 if leg['is_call'] else -1) for leg in legs])
+    price = np.array([leg.get('price', 0.0) for leg in legs], dtype=float)
+    return qty, strike, kind, price
+
+
+def payoff_matrix(prices, qty, strike, kind, premium):
+    """P&L por unidad al vencimiento para una o varias estrategias
+        qty/strike/kind/premium: (n_patas,) o (n_estrategias, n_patas); prices: (n_precios,)
+        Devuelve (n_precios,) o (n_estrategias, n_precios)"""
+    s = np.asarray(prices, dtype=float)[..., None]
+    strike = np.asarray(strike, dtype=float)[..., None, :]
+    kind = np.asarray(kind)[..., None, :]
+    value = np.where(kind > 0, np.maximum(s - strike, 0.0),
+                     np.where(kind < 0, np.maximum(strike - s, 0.0), s))
+    qty = np.asarray(qty, dtype=float)
+    premium = np.asarray(premium, dtype=float)
+    return np.einsum('...pl,...l->...p', value - premium[..., None, :], qty)
+
+
+def payoff(legs, prices, multiplier=1.0):
+    """P&L al vencimiento de las patas en cada precio"""
+    qty, strike, kind, premium = leg_arrays(legs)
+    return payoff_matrix(prices, qty, strike, kind, premium) * multiplier
+
+
+def _breakevens(prices, pnl, slope_end):
+    """Breakevens de cada fila de pnl (n_estrategias, n_precios): cruces por cero interpolados
+        (exactos entre quiebres), precios de la grilla con P&L cero y el cruce más allá de la
+        grilla según la pendiente final. Devuelve una lista de arrays, uno por estrategia."""
+    sign = np.sign(pnl)
+    # Cruces entre dos puntos de la grilla
+    fila_c, col = np.nonzero(sign[:, :-1] * sign[:, 1:] < 0)
+    x0, x1 = prices[col], prices[col + 1]
+    y0, y1 = pnl[fila_c, col], pnl[fila_c, col + 1]
+    cruces = x0 - y0 * (x1 - x0) / (y1 - y0)
+    # Ceros exactos en la grilla (extremos de un tramo plano en cero)
+    n = pnl.shape[1]
+    vecino = np.zeros_like(sign, dtype=bool)
+    vecino[:, 1:] |= sign[:, :-1] != 0
+    vecino[:, :-1] |= sign[:, 1:] != 0
+    fila_z, col_z = np.nonzero((sign == 0) & vecino)
+    # Cruce por extrapolación más allá del último precio
+    ultimo = pnl[:, n - 1]
+    fila_e = np.flatnonzero((slope_end != 0) & (ultimo != 0) & (np.sign(ultimo) != np.sign(slope_end)))
+    extra = prices[n - 1] - ultimo[fila_e] / slope_end[fila_e]
+
+    filas = np.concatenate([fila_c, fila_z, fila_e])
+    valores = np.round(np.concatenate([cruces, prices[col_z], extra]), 6)
+    orden = np.lexsort((valores, filas))
+    filas, valores = filas[orden], valores[orden]
+    unico = np.r_[True, (np.diff(filas) != 0) | (np.diff(valores) != 0)][:len(filas)]
+    filas, valores = filas[unico], valores[unico]
+    cortes = np.searchsorted(filas, np.arange(1, len(pnl)))
+    return np.split(valores, cortes)
+
+
+def analyze_batch(qty, strike, kind, premium, multiplier=1.0, grid=None, points=0):
+    """Payoff de muchas estrategias de igual cantidad de patas en una sola evaluación
+        (ej. todas las combinaciones de strikes de una cadena para un escáner):
+        arrays (n_estrategias, n_patas). Por defecto evalúa sólo en los quiebres.
+        max_loss es positivo; inf cuando ganancia o pérdida no tienen límite al subir el subyacente."""
+    qty = np.atleast_2d(np.asarray(qty, dtype=float))
+    strike = np.atleast_2d(np.asarray(strike, dtype=float))
+    kind = np.atleast_2d(np.asarray(kind))
+    premium = np.atleast_2d(np.asarray(premium, dtype=float))
+    prices = price_grid(strike[kind != 0], points) if grid is None else np.asarray(grid, dtype=float)
+    pnl = payoff_matrix(prices, qty, strike, kind, premium)
+    # Pendiente por encima del strike mayor: calls y subyacente
+    slope_end = np.where(kind >= 0, qty, 0.0).sum(axis=1)
+
+    max_profit = np.where(slope_end > 0, np.inf, pnl.max(axis=1))
+    max_loss = np.where(slope_end < 0, np.inf, np.maximum(-pnl.min(axis=1), 0.0))
+    return {
+        'net_premium': (qty * premium).sum(axis=1) * multiplier,
+        'max_profit': max_profit * multiplier,
+        'max_loss': max_loss * multiplier,
+        'breakevens': _breakevens(prices, pnl, slope_end),
+    }
+
+
+def analyze(legs, multiplier=1.0, grid=None, points=POINTS):
+    """Máxima ganancia, máxima pérdida (como número positivo) y breakevens al vencimiento
+        de una lista de patas, evaluada sobre una grilla densa de precios"""
+    resultado = analyze_batch(*leg_arrays(legs), multiplier=multiplier, grid=grid, points=points)
+    return {
+        'net_premium': float(resultado['net_premium'][0]),
+        'max_profit': float(resultado['max_profit'][0]),
+        'max_loss': float(resultado['max_loss'][0]),
+        'breakevens': [float(b) for b in resultado['breakevens'][0]],
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    condor = [
+        {'qty': 1, 'strike': 3600.0, 'is_call': False, 'price': 40.0},
+        {'qty': -1, 'strike': 3800.0, 'is_call': False, 'price': 80.0},
+        {'qty': -1, 'strike': 4600.0, 'is_call': True, 'price': 90.0},
+        {'qty': 1, 'strike': 4800.0, 'is_call': True, 'price': 45.0},
+    ]
+    print("Iron condor:", analyze(condor, multiplier=100))
+    straddle = [{'qty': 1, 'strike': 4200.0, 'is_call': True, 'price': 150.0},
+                {'qty': 1, 'strike': 4200.0, 'is_call': False, 'price': 130.0}]
+    print("Straddle:", analyze(straddle, multiplier=100))
+    ratio = [{'qty': 1, 'strike': 4200.0, 'is_call': True, 'price': 300.0},
+             {'qty': -2, 'strike': 4600.0, 'is_call': True, 'price': 90.0}]
+    print("Ratio call 2x1:", analyze(ratio, multiplier=100))
+
+    # Escáner: todos los bull call spreads de una cadena de 80 strikes
+    strikes = 3000 + 25 * np.arange(80)
+    calls = np.maximum(4000 - strikes, 0) + 200 * np.exp(-((strikes - 4000) / 600) ** 2) + 5
+    i, j = np.triu_indices(len(strikes), k=1)
+    qty = np.tile([1.0, -1.0], (len(i), 1))
+    inicio = time.perf_counter()
+    resultado = analyze_batch(qty, np.stack([strikes[i], strikes[j]], axis=1), np.ones((len(i), 2), dtype=int),
+                              np.stack([calls[i], calls[j]], axis=1), multiplier=100)
+    print(f"{len(i):,} spreads analizados en {(time.perf_counter() - inicio) * 1000:.0f} ms")
@@ -0,0 +1,253 @@
+"""
+Motor de riesgo de cartera para posiciones de opciones multi-pata
+Mantiene todas las patas abiertas en arrays de NumPy y calcula en una sola
+pasada vectorizada las griegas agregadas y la grilla de P&L ante shocks de
+precio del subyacente x volatilidad. Lo usa RiskManager antes de cada orden
+para dimensionar la posición según la pérdida del peor escenario.
+
+Una pata es un dict:
+    {'symbol': 'GFGC42000FEB', 'qty': 1, 'strike': 4200.0, 'expiry': 'FEB', 'is_call': True}
+qty es por contrato de la estrategia (+ comprada, - vendida); 'vol' es opcional.
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+from black_scholes import bs_price, bs_greeks
+from vol_surface import expiry_datetime, SECONDS_PER_YEAR
+
+SPOT_SHOCKS = np.linspace(-0.20, 0.20, 21)
+VOL_SHOCKS = np.array([-0.15, -0.10, -0.05, 0.0, 0.05, 0.10, 0.15])
+
+
+class RiskEngine:
+    """Cartera de patas de opciones sobre un mismo subyacente"""
+
+    def __init__(self, multiplier=100, rate=0.0, default_vol=0.50, surface=None, capacity=256,
+                 spot_shocks=SPOT_SHOCKS, vol_shocks=VOL_SHOCKS, pricer=None):
+        self.multiplier = multiplier
+        self.rate = rate
+        self.default_vol = default_vol
+        # VolSurface opcional para valuar cada pata con la IV de su strike
+        self.surface = surface
+        # AmericanPricer opcional (american.py): sin él se valúa como europea con Black-Scholes
+        self.pricer = pricer
+        self.spot_shocks = np.asarray(spot_shocks, dtype=float)
+        self.vol_shocks = np.asarray(vol_shocks, dtype=float)
+        self.spot = None
+
+        self.symbols = []
+        self.index = {}
+        self.n = 0
+        self.qty = np.zeros(capacity)
+        self.strike = np.zeros(capacity)
+        self.is_call = np.zeros(capacity, dtype=bool)
+        self.expiry = np.zeros(capacity, dtype='datetime64[s]')
+        self.vol = np.full(capacity, np.nan)  # NaN: tomar de la superficie o default_vol
+        self.codes = []
+        self.last_latency = 0.0
+        # La grilla de la cartera se recalcula sólo si cambian posiciones, spot o minuto
+        self._version = 0
+        self._grid_cache = None
+
+    # ---------- posiciones ----------
+    def _ensure(self, size):
+        if size <= len(self.qty):
+            return
+        new = max(size, 2 * len(self.qty))
+        for name, fill in (('qty', 0.0), ('strike', 0.0), ('is_call', False), ('vol', np.nan)):
+            old = getattr(self, name)
+            arr = np.full(new, fill, dtype=old.dtype)
+            arr[:len(old)] = old
+            setattr(self, name, arr)
+        expiry = np.zeros(new, dtype='datetime64[s]')
+        expiry[:len(self.expiry)] = self.expiry
+        self.expiry = expiry
+
+    def add_legs(self, legs, contracts=1, now=None):
+        """Sumar patas a la cartera (contracts multiplica la qty de cada pata)"""
+        now = now or datetime.now()
+        for leg in legs:
+            i = self.index.get(leg['symbol'])
+            if i is None:
+                i = self.n
+                self._ensure(i + 1)
+                self.index[leg['symbol']] = i
+                self.symbols.append(leg['symbol'])
+                self.codes.append(leg['expiry'] if isinstance(leg['expiry'], str) else None)
+                self.strike[i] = leg['strike']
+                self.is_call[i] = leg['is_call']
+                expiry = leg['expiry']
+                if isinstance(expiry, str):
+                    expiry = expiry_datetime(expiry, now)
+                self.expiry[i] = np.datetime64(expiry, 's')
+                self.n += 1
+            self.qty[i] += leg['qty'] * contracts
+            if leg.get('vol') is not None:
+                self.vol[i] = leg['vol']
+        self._version += 1
+
+    def set_position(self, symbol, qty):
+        i = self.index.get(symbol)
+        if i is not None:
+            self.qty[i] = qty
+            self._version += 1
+
+    def clear(self):
+        self.qty[:self.n] = 0.0
+        self._version += 1
+
+    # ---------- valuación ----------
+    def _arrays(self, legs=None, now=None):
+        """(qty, strike, t, vol, is_call) de la cartera o de una lista de patas"""
+        now = now or datetime.now()
+        if legs is None:
+            n = self.n
+            qty, strike, is_call = self.qty[:n], self.strike[:n], self.is_call[:n]
+            t = (self.expiry[:n] - np.datetime64(now, 's')).astype(float) / SECONDS_PER_YEAR
+            vol = self.vol[:n].copy()
+            codes = self.codes
+        else:
+            qty = np.array([leg['qty'] for leg in legs], dtype=float)
+            strike = np.array([leg['strike'] for leg in legs], dtype=float)
+            is_call = np.array([leg['is_call'] for leg in legs], dtype=bool)
+            expiries = [expiry_datetime(leg['expiry'], now) if isinstance(leg['expiry'], str) else leg['expiry']
+                        for leg in legs]
+            t = np.array([(e - now).total_seconds() for e in expiries]) / SECONDS_PER_YEAR
+            vol = np.array([np.nan if leg.get('vol') is None else leg['vol'] for leg in legs], dtype=float)
+            codes = [leg['expiry'] if isinstance(leg['expiry'], str) else None for leg in legs]
+
+        faltan = np.isnan(vol)
+        if faltan.any() and self.surface is not None:
+            for i in np.flatnonzero(faltan):
+                if codes[i] is not None:
+                    vol[i] = self.surface.iv(strike[i], codes[i], now)
+            faltan = np.isnan(vol)
+        vol[faltan] = self.default_vol
+        return qty, strike, np.maximum(t, 0.0), vol, is_call
+
+    def _price(self, spot, strike, t, vol, is_call):
+        if self.pricer is None:
+            return bs_price(spot, strike, t, vol, is_call, self.rate)
+        return self.pricer.price(spot, strike, t, vol, is_call, self.rate)
+
+    def greeks(self, spot=None, legs=None, now=None):
+        """Griegas agregadas en unidades de la cartera (delta en acciones, vega por punto de vol)"""
+        spot = self.spot if spot is None else spot
+        qty, strike, t, vol, is_call = self._arrays(legs, now)
+        if self.pricer is None:
+            g = bs_greeks(spot, strike, t, vol, is_call, self.rate)
+        else:
+            g = self.pricer.greeks(spot, strike, t, vol, is_call, self.rate)
+        escala = qty * self.multiplier
+        return {
+            'delta': float(escala @ g['delta']),
+            'gamma': float(escala @ g['gamma']),
+            'vega': float(escala @ g['vega']) / 100,
+            'theta': float(escala @ g['theta']) / 365,
+            'value': float(escala @ self._price(spot, strike, t, vol, is_call)),
+            'legs': int(np.count_nonzero(qty)),
+        }
+
+    def scenario_grid(self, spot=None, legs=None, now=None, horizon_days=0.0):
+        """P&L (n_spot x n_vol) de la cartera ante shocks relativos de spot y aditivos de vol,
+            valuando todas las patas en un único broadcast (escenario x pata)"""
+        spot = self.spot if spot is None else spot
+        qty, strike, t, vol, is_call = self._arrays(legs, now)
+        base = self._price(spot, strike, t, vol, is_call)
+        s = spot * (1.0 + self.spot_shocks)[:, None, None]
+        v = np.maximum(vol[None, None, :] + self.vol_shocks[None, :, None], 0.01)
+        t_h = np.maximum(t - horizon_days / 365.0, 0.0)
+        shocked = self._price(s, strike, t_h, v, is_call)
+        return (shocked - base) @ (qty * self.multiplier)
+
+    def portfolio_grid(self, spot=None, now=None):
+        """Grilla de P&L de la cartera actual, cacheada entre órdenes"""
+        spot = self.spot if spot is None else spot
+        now = now or datetime.now()
+        clave = (self._version, spot, now.replace(second=0, microsecond=0),
+                 getattr(self.surface, 'refits', None))
+        if self._grid_cache is None or self._grid_cache[0] != clave:
+            if self.n:
+                grilla = self.scenario_grid(spot, now=now)
+            else:
+                grilla = np.zeros((len(self.spot_shocks), len(self.vol_shocks)))
+            self._grid_cache = (clave, grilla)
+        return self._grid_cache[1]
+
+    def pre_trade(self, legs, contracts=1, spot=None, now=None):
+        """Riesgo de la cartera con y sin la operación candidata"""
+        inicio = time.perf_counter()
+        spot = self.spot if spot is None else spot
+        actual = self.portfolio_grid(spot, now)
+        candidata = self.scenario_grid(spot, legs=legs, now=now)
+        total = actual + contracts * candidata
+        resultado = {
+            'worst_loss_before': float(-actual.min()),
+            'worst_loss_after': float(-total.min()),
+            'greeks_trade': self.greeks(spot, legs=legs, now=now),
+        }
+        self.last_latency = time.perf_counter() - inicio
+        return resultado
+
+    def max_contracts(self, legs, max_loss, spot=None, now=None):
+        """Máxima cantidad de contratos de la estrategia tal que, sumada a la cartera,
+            ningún escenario de la grilla pierda más que max_loss.
+            El P&L es lineal en la cantidad, así que se resuelve en forma cerrada."""
+        inicio = time.perf_counter()
+        spot = self.spot if spot is None else spot
+        actual = self.portfolio_grid(spot, now)
+        candidata = self.scenario_grid(spot, legs=legs, now=now)
+        margen = actual + max_loss
+        pierde = candidata < 0
+        self.last_latency = time.perf_counter() - inicio
+        if (margen < 0).any() and not pierde.any():
+            return 0
+        if not pierde.any():
+            return None  # Sin pérdida en ningún escenario: el límite lo pone otro criterio
+        limite = np.min(np.broadcast_to(margen, candidata.shape)[pierde] / -candidata[pierde])
+        return max(int(np.floor(limite)), 0)
+
+
+if __name__ == "__main__":
+    # Benchmark: cartera con cientos de patas sobre varios vencimientos
+    rng = np.random.default_rng(0)
+    now = datetime(2024, 2, 1, 12, 0)
+    engine = RiskEngine(rate=0.30)
+    engine.spot = 4000.0
+    expiries = ['FEB', 'ABR', 'JUN', 'AGO', 'OCT', 'DIC']
+    legs = [{'symbol': f"L{i}", 'qty': int(rng.integers(-5, 6)), 'strike': float(4000 + 100 * rng.integers(-15, 16)),
+             'expiry': expiries[i % len(expiries)], 'is_call': bool(i % 2), 'vol': float(rng.uniform(0.3, 0.7))}
+            for i in range(500)]
+    engine.add_legs(legs, now=now)
+
+    condor = [
+        {'symbol': 'GFGV38000ABR', 'qty': -1, 'strike': 3800.0, 'expiry': 'ABR', 'is_call': False},
+        {'symbol': 'GFGV36000ABR', 'qty': 1, 'strike': 3600.0, 'expiry': 'ABR', 'is_call': False},
+        {'symbol': 'GFGC42000ABR', 'qty': -1, 'strike': 4200.0, 'expiry': 'ABR', 'is_call': True},
+        {'symbol': 'GFGC44000ABR', 'qty': 1, 'strike': 4400.0, 'expiry': 'ABR', 'is_call': True},
+    ]
+    for nombre, fn in (('greeks', lambda: engine.greeks(now=now)),
+                       ('scenario_grid', lambda: engine.scenario_grid(now=now)),
+                       ('max_contracts', lambda: engine.max_contracts(condor, 1_000_000, now=now))):
+        fn()
+        inicio = time.perf_counter()
+        for _ in range(100):
+            resultado = fn()
+        print(f"{nombre} ({engine.n} patas): {(time.perf_counter() - inicio) / 100 * 1000:.2f} ms")
+    print("Griegas:", {k: round(v, 1) for k, v in engine.greeks(now=now).items()})
+    print("Peor escenario:", round(float(engine.scenario_grid(now=now).min()), 0))
+    print("Contratos máximos del iron condor:", engine.max_contracts(condor, 1_000_000, now=now))
+
+    # Las opciones de GGAL son americanas: la misma cartera valuada con BAW (modo 'fast')
+    from american import AmericanPricer
+    americano = RiskEngine(rate=0.30, pricer=AmericanPricer('fast'))
+    americano.spot = 4000.0
+    americano.add_legs(legs, now=now)
+    inicio = time.perf_counter()
+    grilla = americano.scenario_grid(now=now)
+    print(f"scenario_grid americana: {(time.perf_counter() - inicio) * 1000:.1f} ms, "
+          f"peor escenario {float(grilla.min()):.0f}")
+    print("Contratos máximos del iron condor (americana):", americano.max_contracts(condor, 1_000_000, now=now))
@@ -0,0 +1,355 @@
+"""
+Superficie de volatilidad implícita para las opciones de GGAL
+Calcula la IV de cada cotización en lote (Black-Scholes vectorizado sobre el mid),
+ajusta una sonrisa por vencimiento y arma la estructura temporal interpolando la
+varianza total. En cada actualización sólo se reajustan los vencimientos cuyas
+puntas cambiaron; la latencia de cada reajuste queda registrada. Un spot nuevo
+(set_spot, desde el feed del subyacente) no reajusta nada: marca los vencimientos
+y se reajustan recién en la próxima consulta (iv, iv_grid, forward, to_frame).
+
+Uso desde el grabador (DB/script-db.py):
+    superficie = VolSurface(rate=Config.RISK_FREE_RATE)
+    registrar_consumidor(superficie.update)
+    superficie.set_spot((bid + ask) / 2)    # en cada tick del subyacente
+
+Uso desde una estrategia (OptionsStrategies la arma sola si recibe la cadena compartida):
+    vol = superficie.iv(4200.0, 'FE')
+    vol = strategies.implied_vol(4200.0, 'FEB')
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from black_scholes import implied_vol
+
+SECONDS_PER_YEAR = 365.0 * 86400.0
+
+# Códigos de vencimiento de BYMA (dos letras en el símbolo, tres en Config)
+MONTH_CODES = {
+    'EN': 1, 'FE': 2, 'MR': 3, 'AB': 4, 'MY': 5, 'JU': 6,
+    'JL': 7, 'AG': 8, 'SE': 9, 'OC': 10, 'NO': 11, 'DI': 12,
+    'ENE': 1, 'FEB': 2, 'MAR': 3, 'ABR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AGO': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DIC': 12,
+}
+
+EXPIRY_HOUR = 17  # Las opciones de GGAL vencen al cierre del tercer viernes
+
+
+def third_friday(year, month):
+    d = date(year, month, 15)
+    return d + timedelta(days=(4 - d.weekday()) % 7)
+
+
+def expiry_datetime(code, now):
+    """Fecha de vencimiento del código (FE, ABR, ...): el próximo tercer viernes de ese mes"""
+    month = MONTH_CODES[code.upper()]
+    for year in (now.year, now.year + 1):
+        expiry = datetime.combine(third_friday(year, month), datetime.min.time()) + timedelta(hours=EXPIRY_HOUR)
+        if expiry > now:
+            return expiry
+    return expiry
+
+
+class Smile:
+    """Sonrisa de un vencimiento: varianza total w(k) = a + b*k + c*k^2 sobre
+        k = ln(K/F). Fuera del rango de strikes cotizados se extiende plana."""
+
+    def __init__(self, expiry, t, forward, coefs, k_min, k_max, points, rmse):
+        self.expiry = expiry
+        self.t = t
+        self.forward = forward
+        self.coefs = coefs
+        self.k_min = k_min
+        self.k_max = k_max
+        self.points = points
+        self.rmse = rmse
+
+    def total_variance(self, k):
+        k = np.clip(k, self.k_min, self.k_max)
+        return np.maximum(np.polyval(self.coefs, k), 1e-8)
+
+    def vol(self, strike):
+        k = np.log(np.asarray(strike, dtype=float) / self.forward)
+        return np.sqrt(self.total_variance(k) / self.t)
+
+
+class VolSurface:
+    """Superficie de IV incremental alimentada por las cotizaciones del panel de opciones"""
+
+    def __init__(self, rate=0.0, min_points=3, max_spread=0.5, history=1000, pricer=None):
+        self.rate = rate
+        # AmericanPricer opcional: IV americana (GGAL) en lugar de la de Black-Scholes
+        self.pricer = pricer
+        self.min_points = min_points
+        # Se descartan puntas con spread mayor a max_spread * mid
+        self.max_spread = max_spread
+        self.quotes = {}      # vencimiento -> DataFrame (simbolo: strike, is_call, bid, ask)
+        self.smiles = {}      # vencimiento -> Smile
+        self.spot = None
+        self.refits = 0
+        self.latencies = deque(maxlen=history)  # (vencimiento, segundos)
+        self._dirty = set()
+        self._stale = set()   # vencimientos a reajustar por un spot nuevo, al consultarlos
+        self._order = []      # vencimientos ajustados ordenados por t
+        self._lock = threading.RLock()
+
+    # ---------- ingreso de cotizaciones ----------
+    def _normalize(self, quotes):
+        df = quotes if 'simbolo' in quotes else quotes.rename_axis('simbolo').reset_index()
+        # tipo_opcion (grabador) o tipo (LectorCadena de la memoria compartida)
+        tipo = df['tipo_opcion'] if 'tipo_opcion' in df else df['tipo']
+        is_call = tipo.astype(str).str.upper().str.startswith('C')
+        return pd.DataFrame({
+            'vencimiento': df['vencimiento'].to_numpy(),
+            'strike': pd.to_numeric(df['strike'], errors='coerce').to_numpy(float),
+            'is_call': is_call.to_numpy(),
+            'bid': pd.to_numeric(df['bid'], errors='coerce').to_numpy(float),
+            'ask': pd.to_numeric(df['ask'], errors='coerce').to_numpy(float),
+        }, index=pd.Index(df['simbolo'].to_numpy(), name='simbolo'))
+
+    def set_spot(self, spot):
+        """Registrar el spot sin reajustar: cambia el forward de todos los vencimientos,
+            que se reajustan en la próxima consulta"""
+        with self._lock:
+            if spot is not None and (self.spot is None or abs(spot / self.spot - 1.0) > 1e-4):
+                self.spot = spot
+                self._stale.update(self.quotes)
+
+    def update(self, quotes, spot=None, now=None):
+        """Incorporar cotizaciones (DataFrame con simbolo, vencimiento, tipo_opcion, strike,
+            bid, ask) y reajustar sólo los vencimientos con puntas nuevas; el spot se
+            registra como en set_spot. Devuelve la lista de vencimientos reajustados."""
+        with self._lock:
+            self.set_spot(spot)
+            return self._update(quotes, now or datetime.now())
+
+    def _update(self, quotes, now):
+        if quotes is not None and len(quotes):
+            nuevas = self._normalize(quotes).dropna(subset=['vencimiento', 'strike'])
+            nuevas = nuevas[~nuevas.index.duplicated(keep='last')]
+            for expiry, grupo in nuevas.groupby('vencimiento', sort=False):
+                actual = self.quotes.get(expiry)
+                if actual is None:
+                    self.quotes[expiry] = grupo
+                    self._dirty.add(expiry)
+                    continue
+                previas = actual.reindex(grupo.index)
+                cambio = ~(np.isclose(previas['bid'], grupo['bid'], equal_nan=True)
+                           & np.isclose(previas['ask'], grupo['ask'], equal_nan=True))
+                if cambio.any():
+                    cambiadas = grupo[np.asarray(cambio)]
+                    self.quotes[expiry] = pd.concat([actual.drop(cambiadas.index, errors='ignore'), cambiadas])
+                    self._dirty.add(expiry)
+
+        refit = sorted(self._dirty)
+        for expiry in refit:
+            self._refit(expiry, now)
+        self._dirty.clear()
+        self._stale.difference_update(refit)
+        if refit:
+            self._order = sorted(self.smiles.values(), key=lambda s: s.t)
+        return refit
+
+    def _refresh(self, now=None):
+        """Reajustar los vencimientos que quedaron viejos por un cambio de spot"""
+        if not self._stale:
+            return
+        with self._lock:
+            self._dirty.update(self._stale)
+            self._update(None, now or datetime.now())
+
+    # ---------- ajuste ----------
+    def _forward(self, q, t):
+        """Forward del vencimiento: spot capitalizado si se conoce, si no por paridad put-call
+            en los strikes donde call y put están más cerca (los más próximos al dinero)"""
+        if self.spot is not None:
+            return self.spot * np.exp(self.rate * t)
+        mid = (q['bid'] + q['ask']) / 2
+        calls = mid[q['is_call']].groupby(q.loc[q['is_call'], 'strike']).last()
+        puts = mid[~q['is_call']].groupby(q.loc[~q['is_call'], 'strike']).last()
+        par = (calls - puts).dropna()
+        if par.empty:
+            return None
+        cercanos = par.abs().nsmallest(3).index
+        return float(np.median(cercanos.to_numpy() + par[cercanos].to_numpy() * np.exp(self.rate * t)))
+
+    def _refit(self, expiry, now):
+        inicio = time.perf_counter()
+        try:
+            self._fit(expiry, now)
+        except KeyError:
+            # Código de vencimiento desconocido
+            self.smiles.pop(expiry, None)
+        self.refits += 1
+        self.latencies.append((expiry, time.perf_counter() - inicio))
+
+    def _fit(self, expiry, now):
+        q = self.quotes[expiry]
+        t = (expiry_datetime(expiry, now) - now).total_seconds() / SECONDS_PER_YEAR
+        q = q[(q['bid'] > 0) & (q['ask'] >= q['bid'])]
+        mid = (q['bid'] + q['ask']) / 2
+        q = q[(q['ask'] - q['bid']) <= self.max_spread * mid]
+        forward = self._forward(q, t) if len(q) else None
+        if t <= 0 or forward is None or forward <= 0:
+            self.smiles.pop(expiry, None)
+            return
+
+        # Sólo opciones fuera del dinero: calls arriba del forward, puts abajo
+        strike = q['strike'].to_numpy()
+        is_call = q['is_call'].to_numpy()
+        otm = np.where(is_call, strike >= forward, strike < forward)
+        strike, is_call = strike[otm], is_call[otm]
+        bid, ask = q['bid'].to_numpy()[otm], q['ask'].to_numpy()[otm]
+        mid = (bid + ask) / 2
+
+        df = np.exp(-self.rate * t)
+        if self.pricer is None:
+            iv = implied_vol(mid, forward * df, strike, t, is_call, self.rate)
+        else:
+            iv = self.pricer.implied_vol(mid, forward * df, strike, t, is_call, self.rate)
+        ok = np.isfinite(iv)
+        if ok.sum() < 1:
+            self.smiles.pop(expiry, None)
+            return
+        k = np.log(strike[ok] / forward)
+        w = iv[ok] ** 2 * t
+        # Más peso a las puntas angostas
+        peso = 1.0 / np.maximum((ask - bid)[ok] / mid[ok], 1e-3)
+
+        grado = 2 if ok.sum() >= self.min_points else 0
+        coefs = np.polyfit(k, w, grado, w=np.sqrt(peso)) if grado else np.array([np.average(w, weights=peso)])
+        if grado == 2 and coefs[0] < 0:
+            # Curvatura negativa: la sonrisa no es convexa, se ajusta una recta
+            coefs = np.polyfit(k, w, 1, w=np.sqrt(peso))
+        rmse = float(np.sqrt(np.mean((np.polyval(coefs, k) - w) ** 2)))
+        self.smiles[expiry] = Smile(expiry, t, forward, coefs, k.min(), k.max(), int(ok.sum()), rmse)
+
+    # ---------- consultas ----------
+    def _t_forward(self, expiry, now=None):
+        if isinstance(expiry, str):
+            smile = self.smiles.get(expiry)
+            if smile is not None:
+                return smile.t, smile.forward, smile
+            expiry = expiry_datetime(expiry, now or datetime.now())
+        if isinstance(expiry, date) and not isinstance(expiry, datetime):
+            expiry = datetime.combine(expiry, datetime.min.time()) + timedelta(hours=EXPIRY_HOUR)
+        t = (expiry - (now or datetime.now())).total_seconds() / SECONDS_PER_YEAR
+        return t, None, None
+
+    def iv(self, strike, expiry, now=None):
+        """Volatilidad implícita interpolada para un strike y vencimiento (código, date o datetime)"""
+        return float(self.iv_grid(np.array([strike], dtype=float), expiry, now)[0])
+
+    def iv_grid(self, strikes, expiry, now=None):
+        """Como iv() pero para un array de strikes del mismo vencimiento"""
+        strikes = np.asarray(strikes, dtype=float)
+        self._refresh(now)
+        if not self._order:
+            return np.full(strikes.shape, np.nan)
+        t, forward, smile = self._t_forward(expiry, now)
+        if smile is not None:
+            return smile.vol(strikes)
+        if t <= 0:
+            return np.full(strikes.shape, np.nan)
+
+        # Estructura temporal: interpolación lineal de la varianza total a igual k = ln(K/F)
+        order = self._order
+        ts = [s.t for s in order]
+        j = int(np.searchsorted(ts, t))
+        if j == 0:
+            s = order[0]
+            return np.sqrt(s.total_variance(np.log(strikes / s.forward)) / s.t)
+        if j == len(order):
+            s = order[-1]
+            return np.sqrt(s.total_variance(np.log(strikes / s.forward)) / s.t)
+        s1, s2 = order[j - 1], order[j]
+        peso = (t - s1.t) / (s2.t - s1.t)
+        forward = np.exp(np.log(s1.forward) + peso * (np.log(s2.forward) - np.log(s1.forward)))
+        k = np.log(strikes / forward)
+        w = s1.total_variance(k) + peso * (s2.total_variance(k) - s1.total_variance(k))
+        return np.sqrt(w / t)
+
+    def forward(self, expiry):
+        self._refresh()
+        smile = self.smiles.get(expiry)
+        return smile.forward if smile is not None else None
+
+    def latency_stats(self):
+        """Latencia de los reajustes recientes en milisegundos"""
+        if not self.latencies:
+            return {'refits': self.refits}
+        ms = np.array([s for _, s in self.latencies]) * 1000
+        return {'refits': self.refits, 'mean_ms': float(ms.mean()), 'p50_ms': float(np.percentile(ms, 50)),
+                'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max())}
+
+    def to_frame(self):
+        """Parámetros ajustados por vencimiento"""
+        self._refresh()
+        return pd.DataFrame([
+            {'vencimiento': s.expiry, 't': s.t, 'forward': s.forward, 'atm_vol': float(s.vol(s.forward)),
+             'puntos': s.points, 'rmse': s.rmse}
+            for s in self._order
+        ])
+
+
+if __name__ == "__main__":
+    from black_scholes import bs_price
+
+    # Cadena sintética con una sonrisa conocida; en cada tick cambian las puntas de un solo vencimiento
+    rng = np.random.default_rng(0)
+    now = datetime(2024, 2, 1, 12, 0)
+    spot, rate = 4000.0, 0.0
+    expiries = ['FE', 'AB', 'JU', 'AG', 'OC', 'DI']
+    strikes = 4000 * np.exp(np.linspace(-0.3, 0.3, 40))
+
+    def true_vol(k, t):
+        return 0.45 + 0.1 * np.sqrt(0.25 / t) * (k ** 2 / 0.1 - 0.3 * k)
+
+    def chain(expiry, bump=0.0):
+        t = (expiry_datetime(expiry, now) - now).total_seconds() / SECONDS_PER_YEAR
+        k = np.log(strikes / (spot * np.exp(rate * t)))
+        vol = true_vol(k, t) + bump
+        filas = []
+        for is_call in (True, False):
+            p = bs_price(spot, strikes, t, vol, is_call, rate)
+            half = np.maximum(p * 0.01, 0.5)
+            filas.append(pd.DataFrame({
+                'simbolo': [f"GFG{'C' if is_call else 'V'}{int(s * 10)}{expiry}" for s in strikes],
+                'vencimiento': expiry, 'tipo_opcion': 'Call' if is_call else 'Put', 'strike': strikes,
+                'bid': p - half, 'ask': p + half}))
+        return pd.concat(filas, ignore_index=True)
+
+    surface = VolSurface(rate=rate)
+    surface.update(pd.concat([chain(e) for e in expiries]), now=now)
+    print(surface.to_frame().to_string(index=False))
+
+    for i in range(500):
+        surface.update(chain(expiries[i % len(expiries)], bump=rng.normal(0, 0.002)), now=now)
+    print("Latencia de reajuste:", {k: round(v, 3) for k, v in surface.latency_stats().items()})
+
+    t_ab = (expiry_datetime('AB', now) - now).total_seconds() / SECONDS_PER_YEAR
+    k = np.log(strikes / spot)
+    error = np.abs(surface.iv_grid(strikes, 'AB', now) - true_vol(k, t_ab)).max()
+    print(f"Error máximo de IV en AB: {error:.4f}")
+
+    inicio = time.perf_counter()
+    for _ in range(10_000):
+        surface.iv(4100.0, 'AB')
+    print(f"iv(): {(time.perf_counter() - inicio) / 10_000 * 1e6:.1f} µs por consulta")
+    print(f"iv() entre vencimientos (15/03/2024): {surface.iv(4100.0, date(2024, 3, 15), now):.4f}")
+
+    # Ticks del subyacente: set_spot sólo registra, el reajuste lo paga la primera consulta
+    inicio = time.perf_counter()
+    for i in range(1000):
+        surface.set_spot(spot * (1 + 0.001 * ((i % 7) - 3)))
+    tick = (time.perf_counter() - inicio) / 1000
+    refits = surface.refits
+    inicio = time.perf_counter()
+    surface.iv(4100.0, 'AB', now)
+    print(f"set_spot: {tick * 1e6:.1f} µs por tick; primera iv() después: "
+          f"{(time.perf_counter() - inicio) * 1e3:.1f} ms ({surface.refits - refits} reajustes)")
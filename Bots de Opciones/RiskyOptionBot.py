@@ -2,6 +2,13 @@ from datetime import datetime
 from ib_insync import *
 from apscheduler.schedulers.background import BackgroundScheduler
 import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API MATRIZ'))
+from order_store import OrderStore
+import metrics
+from options_runner import OrderLatency
 
 class RiskyOptionsBot:
     """Risky Options Bot (Python, Interactive Brokers)
@@ -32,6 +39,12 @@ class RiskyOptionsBot:
         
         # Variable para controlar si estamos en una operación
         self.in_trade = False
+
+        # Estado de órdenes y fills (se reconstruye desde el log al reiniciar)
+        self.store = OrderStore('ordenes_risky.jsonl')
+        # Latencias vela -> señal -> orden enviada -> ack -> fill (con BOT_METRICS=1)
+        metrics.enable_from_env('metricas_risky')
+        self.latency = OrderLatency()
         
         # Obtener cadenas de opciones disponibles para SPY
         self.chains = self.ib.reqSecDefOptParams(
@@ -48,6 +61,8 @@ class RiskyOptionsBot:
         # Configurar eventos de actualización de datos en streaming
         self.data.updateEvent += self.on_bar_update
         self.ib.execDetailsEvent += self.exec_status
+        self.ib.orderStatusEvent += self.store.on_ib_status
+        self.ib.orderStatusEvent += self.latency.on_status
         
         # Ejecutar el bot en bucle infinito
         self.ib.run()
@@ -69,6 +84,7 @@ class RiskyOptionsBot:
         """Manejo de nueva vela de datos"""
         try:
             if has_new_bar:
+                self.latency.bar_arrived()
                 df = util.df(bars)  # Convertir datos en un DataFrame de Pandas
                 
                 if not self.in_trade:
@@ -87,8 +103,9 @@ class RiskyOptionsBot:
                                         strike, 'C', 'SMART', tradingClass=self.underlying.symbol
                                     )
                                     
+                                    trace = self.latency.signal(action="BUY")
                                     options_order = MarketOrder("BUY", 1, account=self.ib.wrapper.accounts[-1])
-                                    trade = self.ib.placeOrder(self.options_contract, options_order)
+                                    trade = self.latency.place(self.ib, self.options_contract, options_order, trace)
                                     self.lastEstimatedFillPrice = df.close.iloc[-1]
                                     self.in_trade = True
                                     return
@@ -100,7 +117,10 @@ class RiskyOptionsBot:
 
     def exec_status(self, trade: Trade, fill: Fill):
         """Manejo de ejecución de órdenes"""
-        print("Filled")
+        self.latency.on_exec(trade, fill)
+        order = self.store.on_ib_exec(trade, fill)
+        if order is not None:
+            print(f"Filled {fill.execution.shares} @ {fill.execution.price} ({order.cum_qty:g}/{order.qty:g}, {order.status})")
 
 # Instanciar la clase para iniciar el bot
 RiskyOptionsBot()
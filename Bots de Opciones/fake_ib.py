@@ -0,0 +1,176 @@
+"""Stand-in local de Interactive Brokers para probar el runner sin TWS/Gateway
+    Emite velas a demanda, simula la cadena de opciones, ejecuta las órdenes al
+    instante y registra las violaciones de pacing. Usa un reloj virtual para que
+    las esperas del pacing no frenen las pruebas"""
+
+import random
+from collections import deque
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+
+class FakeEvent:
+    """Evento mínimo compatible con la sintaxis `evento += handler` de ib_insync"""
+
+    def __init__(self):
+        self._handlers = []
+
+    def __iadd__(self, handler):
+        self._handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self._handlers.remove(handler)
+        return self
+
+    def emit(self, *args):
+        for handler in list(self._handlers):
+            handler(*args)
+
+
+class FakeBarList(list):
+    """Lista de velas con `updateEvent`, como BarDataList"""
+
+    def __init__(self, contract, bars):
+        super().__init__(bars)
+        self.contract = contract
+        self.updateEvent = FakeEvent()
+
+
+class FakeIB:
+    """Imitación de `ib_insync.IB` con los métodos que usa el runner"""
+
+    def __init__(self, expirations=None, strike_step=1.0, max_messages=50, message_period=1.0,
+                 max_historical=60, historical_period=600.0, seed=0):
+        self.now = 0.0  # Reloj virtual en segundos
+        self.wrapper = SimpleNamespace(accounts=['DU000000'])
+        self.execDetailsEvent = FakeEvent()
+        self.orderStatusEvent = FakeEvent()
+        self.expirations = expirations or ['20240119', '20240216', '20240315']
+        self.strike_step = strike_step
+        self.max_messages = max_messages
+        self.message_period = message_period
+        self.max_historical = max_historical
+        self.historical_period = historical_period
+        self.random = random.Random(seed)
+
+        self.bars = {}  # símbolo -> FakeBarList
+        self.orders = []
+        self.violations = []
+        self.request_counts = {}
+        self._messages = deque()
+        self._historical = deque()
+        self._next_con_id = 1000
+        self._next_order_id = 1
+
+    # ---- reloj virtual ----
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds=0):
+        self.now += seconds
+
+    # ---- pacing ----
+    def _message(self, name, historical=False):
+        self.request_counts[name] = self.request_counts.get(name, 0) + 1
+        while self._messages and self.now - self._messages[0] >= self.message_period:
+            self._messages.popleft()
+        while self._historical and self.now - self._historical[0] >= self.historical_period:
+            self._historical.popleft()
+
+        self._messages.append(self.now)
+        if len(self._messages) > self.max_messages:
+            self.violations.append((self.now, name, 'max messages per second'))
+        if historical:
+            self._historical.append(self.now)
+            if len(self._historical) > self.max_historical:
+                self.violations.append((self.now, name, 'historical data pacing'))
+
+    # ---- API de IB ----
+    def connect(self, *args, **kwargs):
+        return self
+
+    def disconnect(self):
+        pass
+
+    def run(self):
+        pass
+
+    def qualifyContracts(self, *contracts):
+        self._message('qualifyContracts')
+        for contract in contracts:
+            if not contract.conId:
+                contract.conId = self._next_con_id
+                self._next_con_id += 1
+        return list(contracts)
+
+    def reqHistoricalData(self, contract, endDateTime='', durationStr='', barSizeSetting='',
+                          whatToShow='', useRTH=True, keepUpToDate=False, **kwargs):
+        self._message('reqHistoricalData', historical=True)
+        start = datetime(2024, 1, 2, 9, 30)
+        price = 100.0
+        history = []
+        for i in range(20):
+            price += self.random.uniform(-0.5, 0.5)
+            history.append(self._bar(start + timedelta(minutes=5 * i), price))
+        bars = FakeBarList(contract, history)
+        self.bars[contract.symbol] = bars
+        return bars
+
+    def reqSecDefOptParams(self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId):
+        self._message('reqSecDefOptParams')
+        last = self.bars[underlyingSymbol][-1].close if underlyingSymbol in self.bars else 100.0
+        center = round(last / self.strike_step) * self.strike_step
+        strikes = [center + self.strike_step * k for k in range(-20, 21)]
+        return [SimpleNamespace(exchange='SMART', underlyingConId=underlyingConId,
+                                tradingClass=underlyingSymbol, multiplier='100',
+                                expirations=list(self.expirations), strikes=strikes)]
+
+    def placeOrder(self, contract, order):
+        self._message('placeOrder')
+        order.orderId = self._next_order_id
+        self._next_order_id += 1
+        trade = SimpleNamespace(contract=contract, order=order,
+                                orderStatus=SimpleNamespace(status='Filled'))
+        self.orders.append(trade)
+        price = round(self.random.uniform(0.5, 5.0), 2)
+        side = 'BOT' if order.action == 'BUY' else 'SLD'
+        fill = SimpleNamespace(contract=contract, time=self.now,
+                               execution=SimpleNamespace(execId=f"{order.orderId:08x}.01", side=side,
+                                                         shares=order.totalQuantity, price=price,
+                                                         cumQty=order.totalQuantity, avgPrice=price))
+        self.execDetailsEvent.emit(trade, fill)
+        self.orderStatusEvent.emit(trade)
+        return trade
+
+    # ---- emisión de velas ----
+    def _bar(self, date, close):
+        return SimpleNamespace(date=date, open=close, high=close, low=close, close=close, volume=100)
+
+    def emit_bar(self, symbol, close):
+        """Agregar una vela nueva al subyacente y disparar `updateEvent`"""
+        bars = self.bars[symbol]
+        bars.append(self._bar(bars[-1].date + timedelta(minutes=5), close))
+        bars.updateEvent.emit(bars, True)
+
+    def play(self, n_bars, drift=0.0, volatility=0.5, interval=300.0):
+        """Emitir n_bars velas de paseo aleatorio por subyacente, avanzando el reloj virtual"""
+        for _ in range(n_bars):
+            self.sleep(interval)
+            for symbol, bars in self.bars.items():
+                self.emit_bar(symbol, bars[-1].close + drift + self.random.gauss(0, volatility))
+
+
+if __name__ == "__main__":
+    from options_runner import MultiSymbolRunner, PacingScheduler
+
+    ib = FakeIB()
+    symbols = [f"SYM{i:02d}" for i in range(80)]
+    runner = MultiSymbolRunner(ib, symbols, pacing=PacingScheduler(clock=ib.clock, sleep=ib.sleep))
+    runner.start()
+    ib.play(50, drift=0.05)
+
+    print(f"Órdenes enviadas: {len(ib.orders)}")
+    print(f"Solicitudes: {ib.request_counts}")
+    print(f"Espera por pacing: {runner.pacing.waited:.1f}s virtuales")
+    print(f"Violaciones de pacing: {len(ib.violations)}")
@@ -0,0 +1,344 @@
+"""Runner multi-símbolo y multi-estrategia para el Risky Options Bot
+    Comparte una única conexión de IB entre N subyacentes, mantiene un estado
+    por (símbolo, estrategia), cachea cadenas y contratos de opciones y
+    respeta los límites de pacing de IB con un planificador de solicitudes"""
+
+import os
+import sys
+import time
+from bisect import bisect_right
+from collections import deque
+
+from ib_insync import IB, Stock, Option, MarketOrder
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API MATRIZ'))
+from order_store import OrderStore
+import metrics
+
+
+# ==========================
+# PACING DE SOLICITUDES
+# ==========================
+class PacingScheduler:
+    """Planificador de solicitudes según los límites de pacing de IB
+        - Máximo 50 mensajes por segundo en la conexión
+        - Máximo 60 solicitudes de datos históricos cada 10 minutos
+        - Sin solicitudes históricas idénticas dentro de 15 segundos"""
+
+    def __init__(self, max_messages=50, message_period=1.0,
+                 max_historical=60, historical_period=600.0, identical_gap=15.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.max_messages = max_messages
+        self.message_period = message_period
+        self.max_historical = max_historical
+        self.historical_period = historical_period
+        self.identical_gap = identical_gap
+        self.clock = clock
+        self.sleep = sleep
+
+        self._messages = deque()
+        self._historical = deque()
+        self._last_identical = {}
+        self.waited = 0.0  # Tiempo total de espera acumulado por el pacing
+
+    def _wait_time(self, historical, key):
+        """Segundos a esperar antes de poder emitir la próxima solicitud"""
+        now = self.clock()
+        while self._messages and now - self._messages[0] >= self.message_period:
+            self._messages.popleft()
+        while self._historical and now - self._historical[0] >= self.historical_period:
+            self._historical.popleft()
+
+        wait = 0.0
+        if len(self._messages) >= self.max_messages:
+            wait = max(wait, self._messages[0] + self.message_period - now)
+        if historical:
+            if len(self._historical) >= self.max_historical:
+                wait = max(wait, self._historical[0] + self.historical_period - now)
+            last = self._last_identical.get(key)
+            if key is not None and last is not None:
+                wait = max(wait, last + self.identical_gap - now)
+        return wait
+
+    def acquire(self, historical=False, key=None):
+        """Bloquear hasta que la solicitud respete los límites y registrarla"""
+        wait = self._wait_time(historical, key)
+        while wait > 0:
+            self.waited += wait
+            self.sleep(wait)
+            wait = self._wait_time(historical, key)
+
+        now = self.clock()
+        self._messages.append(now)
+        if historical:
+            self._historical.append(now)
+            if key is not None:
+                self._last_identical[key] = now
+
+
+# ==========================
+# CACHÉ DE CADENAS Y CONTRATOS
+# ==========================
+class ChainCache:
+    """Caché compartida de cadenas de opciones y contratos calificados"""
+
+    def __init__(self, ib, pacing, ttl=3600.0, clock=time.monotonic):
+        self.ib = ib
+        self.pacing = pacing
+        self.ttl = ttl
+        self.clock = clock
+        self._chains = {}     # conId -> (instante, cadenas)
+        self._contracts = {}  # (símbolo, vencimiento, strike, derecho) -> Option
+
+    def chains(self, underlying):
+        """Cadenas de opciones del subyacente, refrescadas como máximo una vez por TTL"""
+        cached = self._chains.get(underlying.conId)
+        if cached is not None and self.clock() - cached[0] < self.ttl:
+            return cached[1]
+
+        self.pacing.acquire()
+        chains = self.ib.reqSecDefOptParams(
+            underlying.symbol, '', underlying.secType, underlying.conId
+        )
+        # Pre-ordenar strikes y vencimientos una sola vez por refresco
+        prepared = [
+            (chain, sorted(chain.strikes), sorted(chain.expirations))
+            for chain in chains
+        ]
+        self._chains[underlying.conId] = (self.clock(), prepared)
+        return prepared
+
+    def option(self, symbol, expiration, strike, right, trading_class=None):
+        """Contrato de opción calificado, pidiendo a IB sólo la primera vez"""
+        key = (symbol, expiration, strike, right)
+        contract = self._contracts.get(key)
+        if contract is None:
+            contract = Option(symbol, expiration, strike, right, 'SMART',
+                              tradingClass=trading_class or symbol)
+            self.pacing.acquire()
+            self.ib.qualifyContracts(contract)
+            self._contracts[key] = contract
+        return contract
+
+    def invalidate(self, underlying=None):
+        """Forzar el refresco de las cadenas (de un subyacente o de todos)"""
+        if underlying is None:
+            self._chains.clear()
+        else:
+            self._chains.pop(underlying.conId, None)
+
+
+# ==========================
+# LATENCIA DE ÓRDENES
+# ==========================
+class OrderLatency:
+    """Latencias de cada orden medidas desde la llegada de la vela que la originó:
+        signal (decisión), order_sent (placeOrder devuelto), ack (primer estado de
+        TWS) y fill (primera ejecución), en el histograma {name}_seconds"""
+
+    # Estados locales de ib_insync que no son confirmación del broker
+    LOCAL_STATUS = ('PendingSubmit', 'PendingCancel')
+    DONE_STATUS = ('Filled', 'Cancelled', 'ApiCancelled', 'Inactive')
+
+    def __init__(self, name='ib_order'):
+        self.name = name
+        self.arrival = None
+        self._unacked = {}   # id(order) -> traza
+        self._unfilled = {}
+
+    def bar_arrived(self):
+        self.arrival = metrics.now()
+
+    def signal(self, **labels):
+        """Traza de la orden que se va a enviar, con la etapa signal ya registrada"""
+        trace = metrics.trace(self.name, start=self.arrival, **labels)
+        trace.mark('signal')
+        return trace
+
+    def place(self, ib, contract, order, trace):
+        """placeOrder registrando la orden antes, porque los eventos pueden llegar dentro de la llamada"""
+        if metrics.ENABLED:
+            self._unacked[id(order)] = self._unfilled[id(order)] = trace
+        trade = ib.placeOrder(contract, order)
+        trace.mark('order_sent')
+        return trade
+
+    def on_status(self, trade):
+        status = trade.orderStatus.status
+        if status in self.LOCAL_STATUS:
+            return
+        key = id(trade.order)
+        trace = self._unacked.pop(key, None)
+        if trace is not None:
+            trace.mark('ack')
+        if status in self.DONE_STATUS:
+            self._unfilled.pop(key, None)
+
+    def on_exec(self, trade, fill):
+        trace = self._unfilled.pop(id(trade.order), None)
+        if trace is not None:
+            trace.mark('fill')
+
+
+# ==========================
+# ESTADO Y ESTRATEGIAS
+# ==========================
+class SymbolState:
+    """Estado de una estrategia sobre un subyacente"""
+
+    def __init__(self, symbol, underlying, bars):
+        self.symbol = symbol
+        self.underlying = underlying
+        self.bars = bars
+        self.in_trade = False
+        self.options_contract = None
+        self.last_estimated_fill_price = None
+        self.trades = []
+
+
+class ThreeHigherCloses:
+    """Señal original del Risky Options Bot: 3 cierres consecutivos al alza en
+        velas de 5 minutos compran un Call $5 por encima del último cierre y se
+        vende en una vela posterior si el precio supera el de entrada"""
+
+    name = 'three_higher_closes'
+
+    def __init__(self, strike_offset=5, expiration_index=1, quantity=1):
+        self.strike_offset = strike_offset
+        self.expiration_index = expiration_index
+        self.quantity = quantity
+
+    def on_bar(self, runner, state, bars):
+        if len(bars) < 3:
+            return
+        close = bars[-1].close
+
+        if not state.in_trade:
+            if close > bars[-2].close > bars[-3].close:
+                contract = runner.select_call(state, close + self.strike_offset,
+                                              self.expiration_index)
+                if contract is None:
+                    return
+                print(f"[{state.symbol}] Found 3 consecutive higher closes, entering trade.")
+                state.options_contract = contract
+                runner.place_order(state, contract, "BUY", self.quantity)
+                state.last_estimated_fill_price = close
+                state.in_trade = True
+        elif close > state.last_estimated_fill_price:
+            runner.place_order(state, state.options_contract, "SELL", self.quantity)
+            state.in_trade = False
+            state.options_contract = None
+
+
+# ==========================
+# RUNNER
+# ==========================
+class MultiSymbolRunner:
+    """Ejecuta las mismas estrategias sobre N subyacentes en una única conexión de IB"""
+
+    def __init__(self, ib, symbols, strategies=None, account=None, pacing=None,
+                 bar_size='5 mins', duration='2 D', chain_ttl=3600.0, store=None):
+        self.ib = ib
+        self.symbols = list(symbols)
+        self.strategies = strategies or [ThreeHigherCloses()]
+        self.account = account
+        self.bar_size = bar_size
+        self.duration = duration
+        # Las esperas del pacing usan ib.sleep para no frenar el event loop de IB
+        self.pacing = pacing or PacingScheduler(sleep=ib.sleep)
+        self.chains = ChainCache(ib, self.pacing, ttl=chain_ttl)
+        # Estado de órdenes y fills alimentado por execDetailsEvent/orderStatusEvent
+        self.store = store or OrderStore()
+        self.latency = OrderLatency()
+
+        self.underlyings = {}  # símbolo -> contrato calificado
+        self.states = {}       # (símbolo, estrategia) -> SymbolState
+        self._bars_owner = {}  # id(bars) -> símbolo
+
+    def start(self):
+        """Calificar subyacentes y suscribir las velas en streaming"""
+        print(f"Subscribing {len(self.symbols)} underlyings ...")
+        for symbol in self.symbols:
+            try:
+                underlying = Stock(symbol, 'SMART', 'USD')
+                self.pacing.acquire()
+                self.ib.qualifyContracts(underlying)
+
+                self.pacing.acquire(historical=True, key=(symbol, self.bar_size))
+                bars = self.ib.reqHistoricalData(
+                    underlying, endDateTime='', durationStr=self.duration,
+                    barSizeSetting=self.bar_size, whatToShow='TRADES',
+                    useRTH=True, keepUpToDate=True
+                )
+                self.underlyings[symbol] = underlying
+                self._bars_owner[id(bars)] = symbol
+                for strategy in self.strategies:
+                    self.states[(symbol, strategy.name)] = SymbolState(symbol, underlying, bars)
+                bars.updateEvent += self.on_bar_update
+            except Exception as e:
+                print(f"[{symbol}] {e}")
+
+        self.ib.execDetailsEvent += self.exec_status
+        self.ib.orderStatusEvent += self.store.on_ib_status
+        self.ib.orderStatusEvent += self.latency.on_status
+        print("Running Live")
+
+    def run(self):
+        """Bloquear en el event loop de IB"""
+        self.ib.run()
+
+    def on_bar_update(self, bars, has_new_bar):
+        """Despachar la nueva vela a todas las estrategias del subyacente"""
+        if not has_new_bar:
+            return
+        self.latency.bar_arrived()
+        symbol = self._bars_owner.get(id(bars))
+        if symbol is None:
+            return
+        for strategy in self.strategies:
+            try:
+                strategy.on_bar(self, self.states[(symbol, strategy.name)], bars)
+            except Exception as e:
+                print(f"[{symbol}/{strategy.name}] {e}")
+
+    def select_call(self, state, min_strike, expiration_index=1):
+        """Primer Call con strike mayor a min_strike, usando la cadena cacheada"""
+        for chain, strikes, expirations in self.chains.chains(state.underlying):
+            if chain.exchange != 'SMART' or len(expirations) <= expiration_index:
+                continue
+            i = bisect_right(strikes, min_strike)
+            if i < len(strikes):
+                return self.chains.option(state.symbol, expirations[expiration_index],
+                                          strikes[i], 'C', chain.tradingClass)
+        return None
+
+    def place_order(self, state, contract, action, quantity):
+        account = self.account or self.ib.wrapper.accounts[-1]
+        trace = self.latency.signal(action=action)
+        self.pacing.acquire()
+        trade = self.latency.place(self.ib, contract, MarketOrder(action, quantity, account=account), trace)
+        state.trades.append(trade)
+        return trade
+
+    def exec_status(self, trade, fill):
+        """Manejo de ejecución de órdenes"""
+        self.latency.on_exec(trade, fill)
+        order = self.store.on_ib_exec(trade, fill)
+        if order is None:
+            return  # execId repetido (IB reenvía las ejecuciones al reconectar)
+        print(f"Filled {fill.contract.symbol} {fill.execution.side} {fill.execution.shares} "
+              f"@ {fill.execution.price} ({order.cum_qty:g}/{order.qty:g}, {order.status})")
+
+
+if __name__ == "__main__":
+    # Uso: python options_runner.py SPY QQQ IWM ...
+    symbols = sys.argv[1:] or ['SPY']
+    metrics.enable_from_env('metricas_runner')
+    store = OrderStore('ordenes_ib.jsonl')
+
+    ib = IB()
+    ib.connect('127.0.0.1', 7497, clientId=1)
+
+    runner = MultiSymbolRunner(ib, symbols, store=store)
+    runner.start()
+    runner.run()
@@ -0,0 +1,167 @@
+"""Calendario de sesiones de BYMA y planificador por eventos para el grabador de opciones
+En lugar de consultar el reloj cada segundo, el planificador calcula la próxima
+transición (apertura, cierre o una tarea con demora) y duerme hasta ese instante.
+"""
+
+import os
+import threading
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+
+# Argentina no tiene horario de verano: UTC-3 fijo todo el año
+ZONA_ARGENTINA = timezone(timedelta(hours=-3))
+
+HORA_APERTURA = dt_time(11, 0)
+HORA_CIERRE = dt_time(17, 0)
+
+# Feriados nacionales y días no laborables en los que BYMA no opera.
+# Se pueden agregar más fechas en feriados_byma.txt (una fecha YYYY-MM-DD por línea).
+FERIADOS = {
+    # 2024
+    date(2024, 1, 1), date(2024, 2, 12), date(2024, 2, 13), date(2024, 3, 28), date(2024, 3, 29),
+    date(2024, 4, 1), date(2024, 4, 2), date(2024, 5, 1), date(2024, 6, 17), date(2024, 6, 20),
+    date(2024, 6, 21), date(2024, 7, 9), date(2024, 10, 11), date(2024, 11, 18), date(2024, 12, 25),
+    # 2025
+    date(2025, 1, 1), date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 24), date(2025, 4, 2),
+    date(2025, 4, 17), date(2025, 4, 18), date(2025, 5, 1), date(2025, 5, 2), date(2025, 6, 16),
+    date(2025, 6, 20), date(2025, 7, 9), date(2025, 8, 15), date(2025, 10, 10), date(2025, 11, 21),
+    date(2025, 11, 24), date(2025, 12, 8), date(2025, 12, 25),
+    # 2026
+    date(2026, 1, 1), date(2026, 2, 16), date(2026, 2, 17), date(2026, 3, 23), date(2026, 3, 24),
+    date(2026, 4, 2), date(2026, 4, 3), date(2026, 5, 1), date(2026, 5, 25), date(2026, 6, 15),
+    date(2026, 7, 9), date(2026, 7, 10), date(2026, 8, 17), date(2026, 10, 12), date(2026, 11, 23),
+    date(2026, 12, 7), date(2026, 12, 8), date(2026, 12, 25),
+}
+
+ARCHIVO_FERIADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feriados_byma.txt')
+
+
+def ahora_argentina():
+    return datetime.now(ZONA_ARGENTINA)
+
+
+class CalendarioBYMA:
+    """Días hábiles y horario de sesión de BYMA"""
+
+    def __init__(self, apertura=HORA_APERTURA, cierre=HORA_CIERRE, feriados=None, archivo_feriados=ARCHIVO_FERIADOS):
+        self.apertura = apertura
+        self.cierre = cierre
+        self.feriados = set(FERIADOS if feriados is None else feriados)
+        if archivo_feriados and os.path.exists(archivo_feriados):
+            with open(archivo_feriados) as f:
+                for linea in f:
+                    linea = linea.split('#')[0].strip()
+                    if linea:
+                        self.feriados.add(date.fromisoformat(linea))
+
+    def es_dia_habil(self, dia):
+        return dia.weekday() < 5 and dia not in self.feriados
+
+    def _localizar(self, momento):
+        if momento.tzinfo is None:
+            return momento.replace(tzinfo=ZONA_ARGENTINA)
+        return momento.astimezone(ZONA_ARGENTINA)
+
+    def en_sesion(self, momento=None):
+        momento = self._localizar(momento or ahora_argentina())
+        return self.es_dia_habil(momento.date()) and self.apertura <= momento.time() <= self.cierre
+
+    def sesion(self, dia):
+        """(apertura, cierre) del día como datetimes con zona horaria"""
+        return (datetime.combine(dia, self.apertura, ZONA_ARGENTINA),
+                datetime.combine(dia, self.cierre, ZONA_ARGENTINA))
+
+    def proximas_sesiones(self, desde, dias=370):
+        """Sesiones (apertura, cierre) de los días hábiles desde la fecha indicada"""
+        dia = self._localizar(desde).date()
+        for _ in range(dias):
+            if self.es_dia_habil(dia):
+                yield self.sesion(dia)
+            dia += timedelta(days=1)
+
+
+class Tarea:
+    """Tarea atada a un evento de sesión ('apertura' o 'cierre') con una demora opcional"""
+
+    def __init__(self, nombre, evento, funcion, demora=timedelta(0), recuperar=False):
+        self.nombre = nombre
+        self.evento = evento
+        self.funcion = funcion
+        self.demora = demora
+        # Si el proceso arranca con la sesión en curso, ejecutar igual las tareas de apertura
+        self.recuperar = recuperar
+        self.ultimo_disparo = None
+
+    def proximo_disparo(self, calendario, desde):
+        for apertura, cierre in calendario.proximas_sesiones(desde):
+            momento = (apertura if self.evento == 'apertura' else cierre) + self.demora
+            if momento > desde and momento != self.ultimo_disparo:
+                return momento
+        return None
+
+
+class PlanificadorSesiones:
+    """Ejecuta tareas en la apertura y el cierre de cada sesión de BYMA
+        Duerme con Event.wait hasta la próxima transición, así fuera del horario de
+        trading no hay despertares salvo la revisión de seguridad cada `max_espera`"""
+
+    def __init__(self, calendario=None, max_espera=timedelta(hours=6)):
+        self.calendario = calendario or CalendarioBYMA()
+        self.max_espera = max_espera
+        self.tareas = []
+        self.despertares = 0
+        self._detener = threading.Event()
+
+    def al_abrir(self, funcion, demora=timedelta(0), nombre=None, recuperar=True):
+        self.tareas.append(Tarea(nombre or funcion.__name__, 'apertura', funcion, demora, recuperar))
+
+    def al_cerrar(self, funcion, demora=timedelta(0), nombre=None):
+        self.tareas.append(Tarea(nombre or funcion.__name__, 'cierre', funcion, demora))
+
+    def proxima(self, desde=None):
+        """(momento, tareas) de la próxima transición"""
+        desde = desde or ahora_argentina()
+        agenda = {}
+        for tarea in self.tareas:
+            momento = tarea.proximo_disparo(self.calendario, desde)
+            if momento is not None:
+                agenda.setdefault(momento, []).append(tarea)
+        if not agenda:
+            return None, []
+        momento = min(agenda)
+        return momento, agenda[momento]
+
+    def _disparar(self, tarea, momento):
+        tarea.ultimo_disparo = momento
+        print(f"{ahora_argentina().strftime('%Y-%m-%d %H:%M:%S')} - Ejecutando tarea '{tarea.nombre}'")
+        try:
+            tarea.funcion()
+        except Exception as e:
+            print(f"Error en la tarea '{tarea.nombre}': {e}")
+
+    def ejecutar(self):
+        """Bucle principal: bloquea hasta que se llame a detener()"""
+        if self.calendario.en_sesion():
+            for tarea in self.tareas:
+                if tarea.recuperar:
+                    self._disparar(tarea, None)
+
+        while not self._detener.is_set():
+            momento, tareas = self.proxima()
+            if momento is None:
+                print("No hay próximas sesiones en el calendario")
+                return
+            print(f"Próxima transición: {momento.strftime('%Y-%m-%d %H:%M')} ({', '.join(t.nombre for t in tareas)})")
+
+            espera = (momento - ahora_argentina()).total_seconds()
+            while espera > 0 and not self._detener.is_set():
+                self._detener.wait(min(espera, self.max_espera.total_seconds()))
+                self.despertares += 1
+                espera = (momento - ahora_argentina()).total_seconds()
+            if self._detener.is_set():
+                break
+
+            for tarea in tareas:
+                self._disparar(tarea, momento)
+
+    def detener(self):
+        self._detener.set()
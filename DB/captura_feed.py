@@ -0,0 +1,300 @@
+"""Captura y reproducción del feed crudo de opciones
+CapturaFeed agrega cada lote `cotizaciones` que recibe el callback de HomeBroker
+a un log binario de solo-agregado, con el instante de llegada en reloj monótono.
+ReproductorFeed vuelve a entregar esos lotes a en_opciones (o a cualquier
+consumidor) respetando los intervalos originales, N veces más rápido o a máxima
+velocidad, para perfilar el pipeline de ingesta con una carga real y repetible.
+
+Formato: encabezado de 16 bytes (MAGIA, inicio en ns epoch) y un registro por
+lote: instante (ns monótonos desde el inicio), largo y el DataFrame en pickle
+comprimido con zlib. En el callback sólo se serializa el lote (una copia fiel
+aunque el productor lo reutilice); la compresión y la escritura van en un hilo
+de fondo. Un registro truncado al final (proceso cortado) se ignora al leer.
+Los logs se leen con pickle: reproducir sólo capturas propias.
+
+Uso en el grabador (DB/script-db.py, CAPTURA_FEED=directorio):
+    captura = CapturaFeed('capturas')
+    captura.grabar(cotizaciones)        # en en_opciones; un archivo por sesión
+
+Reproducción:
+    python captura_feed.py capturas/feed_opciones_20240215_110000.bin 10   # 10x
+    python captura_feed.py capturas/feed_opciones_20240215_110000.bin max
+    python captura_feed.py paridad      # box plantado a través de en_opciones -> alerta del scanner
+    stats = ReproductorFeed(ruta).reproducir(consumidor, velocidad=None)
+"""
+
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+MAGIA = b'FEEDCAP1'
+ENCABEZADO = struct.Struct('<8sq')      # magia, inicio (ns desde epoch)
+REGISTRO = struct.Struct('<qI')         # instante (ns monótonos desde el inicio), largo del lote
+NIVEL_ZLIB = 1                          # la mayoría de los campos se repite entre lotes; nivel 1 alcanza
+
+
+class CapturaFeed:
+    """Log binario de los lotes crudos del feed; abre un archivo nuevo en el primer lote
+        después de cada cerrar() (uno por sesión)"""
+
+    def __init__(self, directorio='.', prefijo='feed_opciones'):
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.ruta = None
+        self.lotes = 0
+        self.bytes = 0
+        self._inicio = None
+        self._cola = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def grabar(self, cotizaciones):
+        """Agregar un lote (llamar desde el callback del feed)"""
+        instante = time.monotonic_ns()
+        if self._cola is None:
+            self._abrir(instante)
+        self._cola.put((instante - self._inicio, pickle.dumps(cotizaciones, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def _abrir(self, instante):
+        with self._lock:
+            if self._cola is not None:
+                return
+            self.ruta = os.path.join(self.directorio, f"{self.prefijo}_{datetime.now():%Y%m%d_%H%M%S}.bin")
+            archivo = open(self.ruta, 'wb')
+            archivo.write(ENCABEZADO.pack(MAGIA, time.time_ns()))
+            self._inicio = instante
+            self._cola = queue.SimpleQueue()
+            self._hilo = threading.Thread(target=self._escribir, args=(archivo, self._cola),
+                                          name='captura-feed', daemon=True)
+            self._hilo.start()
+            print(f"Capturando el feed en {self.ruta}")
+
+    def _escribir(self, archivo, cola):
+        try:
+            while True:
+                item = cola.get()
+                if item is None:
+                    break
+                instante, lote = item
+                datos = zlib.compress(lote, NIVEL_ZLIB)
+                archivo.write(REGISTRO.pack(instante, len(datos)))
+                archivo.write(datos)
+                self.lotes += 1
+                self.bytes += REGISTRO.size + len(datos)
+                if cola.empty():
+                    archivo.flush()
+        except Exception as e:
+            print(f"Error en la captura del feed: {e}")
+        finally:
+            archivo.close()
+
+    def cerrar(self):
+        """Vaciar la cola y cerrar el archivo de la sesión"""
+        with self._lock:
+            cola, hilo = self._cola, self._hilo
+            self._cola = self._hilo = None
+        if cola is None:
+            return
+        cola.put(None)
+        hilo.join()
+        print(f"Captura cerrada: {self.ruta} ({self.lotes} lotes, {self.bytes / 1e6:.1f} MB)")
+
+
+class ReproductorFeed:
+    """Lectura de un log de CapturaFeed y reproducción contra un consumidor"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            magia, inicio_ns = ENCABEZADO.unpack(f.read(ENCABEZADO.size))
+        if magia != MAGIA:
+            raise ValueError(f"{ruta} no es una captura del feed")
+        self.inicio = datetime.fromtimestamp(inicio_ns / 1e9)
+
+    def registros(self):
+        """(instante_ns, bytes comprimidos) de cada lote, sin deserializar"""
+        with open(self.ruta, 'rb') as f:
+            f.seek(ENCABEZADO.size)
+            while True:
+                cabecera = f.read(REGISTRO.size)
+                if len(cabecera) < REGISTRO.size:
+                    return
+                instante, largo = REGISTRO.unpack(cabecera)
+                datos = f.read(largo)
+                if len(datos) < largo:
+                    return  # Registro truncado al final
+                yield instante, datos
+
+    def __iter__(self):
+        for instante, datos in self.registros():
+            yield instante, pickle.loads(zlib.decompress(datos))
+
+    def cargar(self):
+        """Todos los lotes en memoria: la reproducción no paga la deserialización"""
+        return list(self)
+
+    def reproducir(self, consumidor, velocidad=1.0, lotes=None):
+        """Entregar cada lote a consumidor(cotizaciones) a velocidad x el ritmo original
+            (velocidad=None: sin esperas). Devuelve estadísticas de la corrida:
+            atraso = entrega real - entrega programada (el consumidor no da abasto si crece)"""
+        lotes = self.cargar() if lotes is None else lotes
+        if not lotes:
+            return {'lotes': 0}
+        base = lotes[0][0]
+        duraciones = np.empty(len(lotes))
+        atrasos = np.zeros(len(lotes))
+        filas = 0
+        inicio = time.perf_counter()
+        for i, (instante, cotizaciones) in enumerate(lotes):
+            if velocidad:
+                programado = inicio + (instante - base) / 1e9 / velocidad
+                espera = programado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                atrasos[i] = time.perf_counter() - programado
+            antes = time.perf_counter()
+            try:
+                consumidor(cotizaciones)
+            except Exception as e:
+                print(f"Error en el consumidor durante la reproducción: {e}")
+            duraciones[i] = time.perf_counter() - antes
+            filas += len(cotizaciones)
+        total = time.perf_counter() - inicio
+        return {
+            'lotes': len(lotes),
+            'filas': filas,
+            'segundos': total,
+            'segundos_capturados': (lotes[-1][0] - base) / 1e9,
+            'lotes_por_seg': len(lotes) / total,
+            'filas_por_seg': filas / total,
+            'consumidor_p50_ms': float(np.percentile(duraciones, 50)) * 1e3,
+            'consumidor_p99_ms': float(np.percentile(duraciones, 99)) * 1e3,
+            'consumidor_max_ms': float(duraciones.max()) * 1e3,
+            'atraso_p99_ms': float(np.percentile(atrasos, 99)) * 1e3,
+            'atraso_max_ms': float(atrasos.max()) * 1e3,
+        }
+
+
+def imprimir_estadisticas(titulo, stats):
+    print(titulo)
+    for clave, valor in stats.items():
+        print(f"  {clave:<20} {valor:,.3f}" if isinstance(valor, float) else f"  {clave:<20} {valor:,}")
+
+
+def cargar_grabador(archivo_db='reproduccion_opciones_ggal.db', cadena='/dev/shm/cadena_ggal_reproduccion.shm'):
+    """Importar script-db.py contra una base y una cadena compartida propias (no las de producción)"""
+    import importlib.util
+
+    os.environ.pop('CAPTURA_FEED', None)
+    os.environ['ARCHIVO_DB'] = archivo_db
+    os.environ['CADENA_SHM'] = cadena
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'script-db.py')
+    spec = importlib.util.spec_from_file_location('script_db', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    import pandas as pd
+
+    if sys.argv[1:2] == ['paridad']:
+        # Box plantado en un panel con el formato de HomeBroker (GFGC/GFGV, strike x10), grabado y
+        # reproducido por en_opciones: el parser, procesar_opciones y el scanner tienen que alertarlo
+        with tempfile.TemporaryDirectory() as directorio:
+            grabador = cargar_grabador(os.path.join(directorio, 'paridad.db'), os.path.join(directorio, 'cadena.shm'))
+            from vol_surface import expiry_datetime, SECONDS_PER_YEAR
+            ahora = datetime.now()
+            codigo, spot = 'DI', 4000.0
+            descuento = np.exp(-grabador.scanner.rate * (expiry_datetime(codigo, ahora) - ahora).total_seconds()
+                               / SECONDS_PER_YEAR)
+            filas = {}
+            for strike in np.arange(3600.0, 4401.0, 200.0):
+                call = max(spot - strike * descuento, 0) + 150
+                for tipo, medio in (('C', call), ('V', call - spot + strike * descuento)):
+                    filas[f"GFG{tipo}{int(strike * 10)}{codigo}"] = {
+                        'bid_size': 10, 'bid': medio - 2, 'ask': medio + 2, 'ask_size': 10, 'last': medio,
+                        'change': 0.0, 'open': medio, 'high': medio, 'low': medio, 'previous_close': medio,
+                        'turnover': 0.0, 'volume': 0, 'operations': 0, 'datetime': pd.Timestamp(ahora)}
+            panel = pd.DataFrame.from_dict(filas, orient='index').rename_axis('symbol')
+            plantado = panel.loc[['GFGV42000DI']].copy()
+            plantado[['bid', 'ask']] += 300
+
+            captura = CapturaFeed(directorio)
+            captura.grabar(panel)
+            captura.grabar(plantado)
+            captura.cerrar()
+            ReproductorFeed(captura.ruta).reproducir(lambda c: grabador.en_opciones(None, c), None)
+
+            parseado = grabador.datos_opciones.loc['GFGV42000DI'].iloc[0]
+            assert (parseado['vencimiento'], parseado['strike'], parseado['tipo_opcion']) == ('DI', 4200.0, 'Put')
+            boxes = [a for a in grabador.scanner.alerts if a['kind'] == 'box']
+            assert boxes, "el box plantado no generó alerta"
+            print(f"Box plantado detectado: ganancia {boxes[-1]['edge']:.1f} por acción, "
+                  f"patas {[pata['symbol'] for pata in boxes[-1]['legs']]}")
+            grabador.motor.dispose()
+        sys.exit(0)
+
+    if len(sys.argv) > 1:
+        # Reproducir una captura contra en_opciones del grabador, con las latencias por etapa
+        velocidad = None if len(sys.argv) > 2 and sys.argv[2] == 'max' else float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+        reproductor = ReproductorFeed(sys.argv[1])
+        lotes = reproductor.cargar()
+        print(f"{len(lotes)} lotes capturados el {reproductor.inicio:%Y-%m-%d %H:%M:%S}")
+        grabador = cargar_grabador()
+        grabador.metrics.enable()
+        stats = reproductor.reproducir(lambda c: grabador.en_opciones(None, c), velocidad, lotes)
+        imprimir_estadisticas(f"Reproducción a {'máxima velocidad' if velocidad is None else f'{velocidad:g}x'}", stats)
+        print(grabador.metrics.summary())
+        sys.exit(0)
+
+    # Benchmark con lotes sintéticos del tamaño del panel de opciones (~200 símbolos)
+    rng = np.random.default_rng(0)
+    simbolos = [f"GFG{'C' if i % 2 == 0 else 'V'}{40000 + 500 * (i // 2)}{['FE', 'AB'][i // 100]}" for i in range(200)]
+
+    def lote(i):
+        n = len(simbolos)
+        return pd.DataFrame({
+            'bid_size': rng.integers(1, 100, n), 'bid': rng.random(n) * 100, 'ask': rng.random(n) * 100 + 100,
+            'ask_size': rng.integers(1, 100, n), 'last': rng.random(n) * 200, 'change': rng.normal(0, 2, n),
+            'open': 100.0, 'high': 150.0, 'low': 50.0, 'previous_close': 100.0, 'turnover': rng.random(n) * 1e6,
+            'volume': rng.integers(0, 10_000, n), 'operations': rng.integers(0, 100, n),
+            'datetime': pd.Timestamp('2024-02-15 11:00') + pd.Timedelta(seconds=i),
+        }, index=pd.Index(simbolos, name='symbol'))
+
+    originales = [lote(i) for i in range(1000)]
+    with tempfile.TemporaryDirectory() as directorio:
+        captura = CapturaFeed(directorio)
+        costos = []
+        for cotizaciones in originales:
+            antes = time.perf_counter()
+            captura.grabar(cotizaciones)
+            costos.append(time.perf_counter() - antes)
+            time.sleep(0.005)  # ~200 lotes/s, por encima del ritmo de producción
+        captura.cerrar()
+        print(f"grabar() en el callback: p50 {np.percentile(costos, 50) * 1e6:.0f} µs, "
+              f"p99 {np.percentile(costos, 99) * 1e6:.0f} µs; {captura.bytes / captura.lotes / 1024:.1f} KB por lote")
+
+        reproductor = ReproductorFeed(captura.ruta)
+        lotes = reproductor.cargar()
+        assert all(a.equals(b) for a, b in zip(originales, (c for _, c in lotes)))
+
+        def consumidor(cotizaciones):
+            # Parte vectorizable de procesar_opciones como carga de referencia
+            datos = cotizaciones[cotizaciones.index.str.startswith('GFG')].copy()
+            datos['fecha_hora'] = pd.to_datetime(datos['datetime'])
+
+        for velocidad in (1.0, 10.0, None):
+            stats = reproductor.reproducir(consumidor, velocidad, lotes)
+            imprimir_estadisticas(f"Reproducción a {'máxima velocidad' if velocidad is None else f'{velocidad:g}x'}", stats)
@@ -0,0 +1,301 @@
+"""Carga histórica de operaciones desde la API de Primary
+Reparte la descarga de /rest/data/getTrades en lotes (símbolo x ventana de
+días) entre un pool acotado de corrutinas que comparten una sesión HTTP y un
+token bucket con el límite de consultas por segundo. Cada lote se guarda en
+opciones_ggal.db en una sola transacción junto con su checkpoint, así que una
+carga cortada se retoma salteando los lotes completos, y repetirla no duplica
+operaciones: la tabla tiene una clave única por (símbolo, fecha_hora, precio,
+tamaño, ocurrencia) y se inserta con INSERT OR IGNORE.
+
+La API devuelve todas las operaciones de la ventana pedida; si una respuesta
+llega al límite de página (limite_pagina), la ventana se parte en dos y se
+vuelve a pedir cada mitad. Un día solo que llega al límite no se puede partir
+más (getTrades pide días enteros): cuenta como fallido y queda sin checkpoint.
+
+Uso:
+    python carga_historica.py usuario password 365        # opciones GGAL y futuros DLR, último año
+    carga = CargaHistorica(trabajadores=16, tasa=20)
+    carga.cargar('usuario', 'password', simbolos, date(2023, 2, 1), date(2024, 2, 1))
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API MATRIZ'))
+from async_client import AsyncPrimaryClient
+from dispatcher import TokenBucket
+
+ARCHIVO_DB = 'opciones_ggal.db'
+
+SQL_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS operaciones_historicas (
+    id INTEGER PRIMARY KEY,
+    simbolo TEXT NOT NULL,
+    fecha_hora TEXT NOT NULL,
+    precio REAL NOT NULL,
+    tamano REAL NOT NULL,
+    ocurrencia INTEGER NOT NULL,  -- n-ésima operación idéntica en el mismo día
+    UNIQUE (simbolo, fecha_hora, precio, tamano, ocurrencia)
+);
+CREATE TABLE IF NOT EXISTS carga_historica (
+    simbolo TEXT NOT NULL,
+    desde TEXT NOT NULL,
+    hasta TEXT NOT NULL,
+    operaciones INTEGER,
+    completado TEXT,
+    PRIMARY KEY (simbolo, desde, hasta)
+);
+"""
+
+SQL_INSERTAR = """
+INSERT OR IGNORE INTO operaciones_historicas (simbolo, fecha_hora, precio, tamano, ocurrencia)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+SQL_CHECKPOINT = """
+INSERT OR REPLACE INTO carga_historica (simbolo, desde, hasta, operaciones, completado) VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def simbolos_historicos(instruments, subyacentes=('GGAL', 'DLR')):
+    """Opciones y futuros del maestro de instrumentos cuyos subyacentes están en la lista"""
+    return sorted(inst.symbol for inst in instruments.by_symbol.values()
+                  if inst.underlying.split(' ')[0] in subyacentes)
+
+
+class CargaHistorica:
+    """Descarga concurrente, con límite de tasa y checkpoints, de operaciones históricas"""
+
+    def __init__(self, archivo_db=ARCHIVO_DB, trabajadores=8, tasa=20.0, rafaga=20, dias_por_lote=30,
+                 limite_pagina=None, reintentos=3, intervalo_progreso=5.0):
+        self.archivo_db = archivo_db
+        self.trabajadores = trabajadores
+        self.bucket = TokenBucket(tasa, rafaga)
+        self.dias_por_lote = dias_por_lote
+        self.limite_pagina = limite_pagina
+        self.reintentos = reintentos
+        self.intervalo_progreso = intervalo_progreso
+        self.conexion = sqlite3.connect(archivo_db)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA busy_timeout=5000")  # el grabador puede estar escribiendo
+        self.conexion.executescript(SQL_ESQUEMA)
+        self._reiniciar_estadisticas()
+
+    def _reiniciar_estadisticas(self):
+        self.total = self.hechos = self.fallidos = self.partidos = self.truncados = 0
+        self.operaciones = self.insertadas = self.consultas = self.reintentados = 0
+
+    # ---------- lotes ----------
+    def completados(self):
+        """Rangos de días ya guardados por símbolo: {símbolo: [(desde, hasta), ...]} ordenados"""
+        rangos = {}
+        for simbolo, desde, hasta in self.conexion.execute(
+                "SELECT simbolo, desde, hasta FROM carga_historica ORDER BY simbolo, desde"):
+            rangos.setdefault(simbolo, []).append((date.fromisoformat(desde), date.fromisoformat(hasta)))
+        return rangos
+
+    def lotes(self, simbolos, desde, hasta):
+        """Lotes (símbolo, desde, hasta) de hasta dias_por_lote días con los días que ningún
+            checkpoint cubre (las ventanas partidas en corridas anteriores cuentan por sus mitades)"""
+        hechos = self.completados()
+        lotes = []
+        for simbolo in simbolos:
+            inicio = desde
+            for d, h in hechos.get(simbolo, []) + [(hasta + timedelta(days=1), hasta + timedelta(days=1))]:
+                # Hueco [inicio, d) antes del próximo rango completo, en ventanas de dias_por_lote
+                while inicio < min(d, hasta + timedelta(days=1)):
+                    fin = min(inicio + timedelta(days=self.dias_por_lote - 1), d - timedelta(days=1), hasta)
+                    lotes.append((simbolo, inicio.isoformat(), fin.isoformat()))
+                    inicio = fin + timedelta(days=1)
+                inicio = max(inicio, h + timedelta(days=1))
+        return lotes
+
+    # ---------- descarga ----------
+    async def _permiso(self):
+        while True:
+            espera = self.bucket.try_acquire()
+            if espera <= 0:
+                return
+            await asyncio.sleep(espera)
+
+    async def _descargar(self, client, simbolo, desde, hasta):
+        params = {"marketId": "ROFX", "symbol": simbolo, "dateFrom": desde, "dateTo": hasta}
+        for intento in range(self.reintentos + 1):
+            if intento:
+                self.reintentados += 1
+                await asyncio.sleep(0.5 * 2 ** (intento - 1))
+            await self._permiso()
+            self.consultas += 1
+            try:
+                data = await client.auth.request("GET", "/rest/data/getTrades", params)
+            except Exception as e:
+                print(f"Error al descargar {simbolo} {desde}..{hasta}: {e}")
+                continue
+            if data is not None and data.get('status', 'OK') == 'OK':
+                return data.get('trades', [])
+        return None
+
+    def _guardar(self, simbolo, desde, hasta, trades):
+        """Operaciones del lote y su checkpoint en la misma transacción"""
+        filas = []
+        if trades:
+            df = pd.DataFrame(trades)
+            fechas = pd.to_datetime(df['datetime']).dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+            ocurrencias = Counter()
+            for fecha_hora, precio, tamano in zip(fechas, df['price'].astype(float), df['size'].astype(float)):
+                clave = (fecha_hora, precio, tamano)
+                filas.append((simbolo, fecha_hora, precio, tamano, ocurrencias[clave]))
+                ocurrencias[clave] += 1
+        with self.conexion:
+            antes = self.conexion.total_changes
+            self.conexion.executemany(SQL_INSERTAR, filas)
+            self.insertadas += self.conexion.total_changes - antes
+            self.conexion.execute(SQL_CHECKPOINT, (simbolo, desde, hasta, len(filas), datetime.now().isoformat()))
+
+    async def _trabajador(self, client, cola):
+        while True:
+            lote = await cola.get()
+            try:
+                simbolo, desde, hasta = lote
+                trades = await self._descargar(client, simbolo, desde, hasta)
+                if trades is None:
+                    self.fallidos += 1  # Sin checkpoint: se reintenta en la próxima corrida
+                    continue
+                d, h = date.fromisoformat(desde), date.fromisoformat(hasta)
+                if self.limite_pagina and len(trades) >= self.limite_pagina:
+                    if h <= d:
+                        # Un solo día truncado: guardarlo como completo perdería operaciones
+                        self.fallidos += 1
+                        self.truncados += 1
+                        print(f"{simbolo} {desde}: {len(trades)} operaciones, llega al límite de página; sin checkpoint")
+                        continue
+                    # Respuesta posiblemente truncada: partir la ventana por días enteros
+                    medio = d + (h - d) // 2
+                    cola.put_nowait((simbolo, desde, medio.isoformat()))
+                    cola.put_nowait((simbolo, (medio + timedelta(days=1)).isoformat(), hasta))
+                    self.total += 1  # Un lote se reemplaza por dos
+                    self.partidos += 1
+                    continue
+                self._guardar(simbolo, desde, hasta, trades)
+                self.operaciones += len(trades)
+                self.hechos += 1
+            except Exception as e:
+                self.fallidos += 1
+                print(f"Error en el lote {lote}: {e}")
+            finally:
+                cola.task_done()
+
+    def progreso(self, inicio):
+        transcurrido = max(time.perf_counter() - inicio, 1e-9)
+        pendientes = self.total - self.hechos - self.fallidos
+        ritmo = (self.hechos + self.fallidos) / transcurrido
+        eta = f"{pendientes / ritmo:,.0f}s" if ritmo else '-'
+        return (f"{self.hechos}/{self.total} lotes ({self.fallidos} fallidos), {self.operaciones:,} operaciones, "
+                f"{self.operaciones / transcurrido:,.0f} op/s, {self.consultas / transcurrido:.1f} consultas/s, ETA {eta}")
+
+    async def _informar(self, inicio):
+        while True:
+            await asyncio.sleep(self.intervalo_progreso)
+            print(self.progreso(inicio))
+
+    async def ejecutar(self, client, simbolos, desde, hasta):
+        """Descargar con un cliente AsyncPrimaryClient abierto; devuelve las estadísticas"""
+        self._reiniciar_estadisticas()
+        lotes = self.lotes(simbolos, desde, hasta)
+        self.total = len(lotes)
+        inicio = time.perf_counter()
+        cola = asyncio.Queue()
+        for lote in lotes:
+            cola.put_nowait(lote)
+        trabajadores = [asyncio.create_task(self._trabajador(client, cola)) for _ in range(self.trabajadores)]
+        informe = asyncio.create_task(self._informar(inicio))
+        await cola.join()
+        for tarea in trabajadores + [informe]:
+            tarea.cancel()
+        await asyncio.gather(*trabajadores, informe, return_exceptions=True)
+        print(self.progreso(inicio))
+        return {'lotes': self.total, 'completos': self.hechos, 'fallidos': self.fallidos, 'partidos': self.partidos,
+                'truncados': self.truncados,
+                'operaciones': self.operaciones, 'insertadas': self.insertadas, 'consultas': self.consultas,
+                'reintentos': self.reintentados, 'segundos': time.perf_counter() - inicio}
+
+    def cargar(self, usuario, password, simbolos, desde, hasta, base_url=None):
+        """Versión bloqueante: abre la sesión HTTP (un conector por trabajador) y ejecuta"""
+        async def correr():
+            async with AsyncPrimaryClient(usuario, password, base_url=base_url,
+                                          max_connections=self.trabajadores, timeout=60.0) as client:
+                return await self.ejecutar(client, simbolos, desde, hasta)
+        return asyncio.run(correr())
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        from main2 import AuthManager
+        from instruments import InstrumentMaster
+
+        usuario, password = sys.argv[1], sys.argv[2]
+        dias = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+        instruments = InstrumentMaster().refresh(AuthManager(usuario, password))
+        simbolos = simbolos_historicos(instruments)
+        hasta = date.today()
+        print(f"Cargando {len(simbolos)} símbolos desde {hasta - timedelta(days=dias)}")
+        carga = CargaHistorica(trabajadores=16)
+        print(carga.cargar(usuario, password, simbolos, hasta - timedelta(days=dias), hasta))
+        carga.cerrar()
+        sys.exit(0)
+
+    # Benchmark contra el simulador con 30 ms por respuesta: 60 símbolos con un año de operaciones,
+    # secuencial (1 trabajador) contra 16 trabajadores; ventanas de 120 días que superan el límite de
+    # página y se parten. Después, una corrida que retoma sin repetir y otra sin checkpoints que no duplica
+    import random
+    import tempfile
+
+    from exchange_sim import ExchangeSimulator
+
+    sim = ExchangeSimulator(latency=0.030).start()
+    rng = random.Random(0)
+    simbolos = [f"GFGC{4000 + 100 * i}0FE" for i in range(60)]
+    desde, hasta = date(2023, 2, 1), date(2024, 1, 31)
+    origen = datetime.combine(desde, datetime.min.time()).timestamp()
+    for simbolo in simbolos:
+        sim.trades[simbolo] = [(int((origen + rng.uniform(0, 365 * 86400)) * 1000), round(rng.uniform(50, 300), 1),
+                                rng.randint(1, 20)) for _ in range(2000)]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for trabajadores in (1, 16):
+            carga = CargaHistorica(os.path.join(directorio, f"historico_{trabajadores}.db"), trabajadores=trabajadores,
+                                   tasa=1000, rafaga=100, dias_por_lote=120, limite_pagina=500)
+            stats = carga.cargar('demo', 'demo', simbolos, desde, hasta, base_url=sim.url)
+            print(f"{trabajadores:>2} trabajadores: {stats['segundos']:.1f}s, {stats['consultas']} consultas, "
+                  f"{stats['operaciones'] / stats['segundos']:,.0f} op/s, {stats['partidos']} ventanas partidas")
+            stats = carga.cargar('demo', 'demo', simbolos, desde, hasta, base_url=sim.url)
+            print(f"   corrida retomada: {stats['lotes']} lotes pendientes")
+            with carga.conexion:
+                carga.conexion.execute("DELETE FROM carga_historica")
+            stats = carga.cargar('demo', 'demo', simbolos, desde, hasta, base_url=sim.url)
+            guardadas = carga.conexion.execute("SELECT COUNT(*) FROM operaciones_historicas").fetchone()[0]
+            print(f"   sin checkpoints: {stats['operaciones']:,} descargadas, {stats['insertadas']} insertadas; "
+                  f"{guardadas:,} operaciones guardadas (esperadas {2000 * len(simbolos):,})")
+            carga.cerrar()
+
+        # Un día con más operaciones que el límite de página: no se puede partir, no queda checkpoint
+        dia = datetime.combine(date(2023, 6, 1), datetime.min.time()).timestamp()
+        sim.trades['GFGC50000FE'] = [(int((dia + 36000 + i) * 1000), 100.0, 1) for i in range(600)]
+        carga = CargaHistorica(os.path.join(directorio, "historico_truncado.db"), tasa=1000, rafaga=100,
+                               dias_por_lote=120, limite_pagina=500)
+        stats = carga.cargar('demo', 'demo', ['GFGC50000FE'], desde, hasta, base_url=sim.url)
+        pendientes = carga.lotes(['GFGC50000FE'], desde, hasta)
+        print(f"Día sobre el límite de página: {stats['truncados']} truncado, {stats['fallidos']} fallido, "
+              f"pendiente para la próxima corrida: {pendientes}")
+        carga.cerrar()
+    sim.stop()
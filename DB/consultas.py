@@ -0,0 +1,210 @@
+"""API de consultas de sólo lectura sobre opciones_ggal.db
+Pensada para análisis y dashboards que leen mientras el grabador escribe:
+conexiones de sólo lectura por hilo, sentencias parametrizadas (SQLite las
+mantiene preparadas en la caché de cada conexión) y una caché LRU en memoria
+que se invalida cuando llega un registro nuevo.
+
+Uso:
+    from consultas import chain_snapshot, symbol_series, daily_bars, intraday_bars
+    cadena = chain_snapshot('2024-02-15 14:32:05', expiry='FE')
+    velas = intraday_bars('GGAL', '2024-02-15 11:00', '2024-02-15 17:00', interval=300)
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date
+from typing import Optional, Union
+
+import pandas as pd
+
+ARCHIVO_DB = 'opciones_ggal.db'
+
+Momento = Union[str, datetime, date]
+
+COLUMNAS = ("id, simbolo, vencimiento, tipo_opcion, strike, tamano_bid, bid, ask, tamano_ask, "
+            "ultimo, cambio, apertura, maximo, minimo, cierre_previo, monto_operado, volumen, "
+            "operaciones, fecha_hora")
+
+# Último registro de cada símbolo con fecha_hora <= ts dentro del mismo día.
+# SQLite devuelve el id de la fila que alcanza el MAX(fecha_hora) del grupo.
+SQL_CHAIN_SNAPSHOT = f"""
+SELECT {COLUMNAS} FROM opciones_ggal
+WHERE id IN (
+    SELECT id FROM (
+        SELECT MAX(fecha_hora) AS fh, id FROM opciones_ggal
+        WHERE fecha_hora >= ? AND fecha_hora <= ? AND (? IS NULL OR vencimiento = ?)
+        GROUP BY simbolo
+    )
+)
+ORDER BY vencimiento, tipo_opcion, strike
+"""
+
+SQL_SYMBOL_SERIES = f"""
+SELECT {COLUMNAS} FROM opciones_ggal
+WHERE simbolo = ? AND fecha_hora >= ? AND fecha_hora < ?
+ORDER BY fecha_hora, id
+"""
+
+SQL_DAILY_BARS = """
+SELECT simbolo, fecha, apertura, MAX(ultimo) AS maximo, MIN(ultimo) AS minimo, cierre,
+       MAX(volumen) AS volumen, COUNT(*) AS registros
+FROM (
+    SELECT simbolo, date(fecha_hora) AS fecha, ultimo, volumen,
+           FIRST_VALUE(ultimo) OVER (PARTITION BY simbolo, date(fecha_hora) ORDER BY fecha_hora, id) AS apertura,
+           FIRST_VALUE(ultimo) OVER (PARTITION BY simbolo, date(fecha_hora) ORDER BY fecha_hora DESC, id DESC) AS cierre
+    FROM opciones_ggal
+    WHERE fecha_hora >= ? AND fecha_hora < ? AND (? IS NULL OR simbolo = ?) AND ultimo > 0
+)
+GROUP BY simbolo, fecha
+ORDER BY simbolo, fecha
+"""
+
+# Velas intradiarias que arma el grabador (barras_ggal); no leen la tabla de ticks
+SQL_INTRADAY_BARS = """
+SELECT simbolo, inicio AS fecha_hora, apertura, maximo, minimo, cierre, volumen, ticks
+FROM barras_ggal
+WHERE simbolo = ? AND intervalo = ? AND inicio >= ? AND inicio < ?
+ORDER BY inicio
+"""
+
+SQL_ULTIMO_INGRESO = "SELECT id, fecha_hora FROM opciones_ggal ORDER BY id DESC LIMIT 1"
+SQL_ULTIMA_BARRA = "SELECT id, inicio FROM barras_ggal ORDER BY id DESC LIMIT 1"
+
+
+def _texto(momento):
+    """Fecha/hora en el formato en que SQLAlchemy la guarda en SQLite"""
+    if momento is None:
+        return None
+    if isinstance(momento, str):
+        momento = pd.Timestamp(momento).to_pydatetime()
+    elif isinstance(momento, date) and not isinstance(momento, datetime):
+        momento = datetime.combine(momento, datetime.min.time())
+    return momento.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class ConsultasOpciones:
+    """Consultas tipadas con caché LRU
+        Cada entrada guarda la versión (último id ingresado) y la fecha del último dato
+        con las que se calculó. Si el rango ya terminaba antes de ese dato, la entrada
+        no cambia más y se sirve aunque entren registros nuevos; si cubría el presente,
+        se recalcula cuando cambia la versión (aunque el rango ya haya quedado atrás)."""
+
+    def __init__(self, archivo_db: str = ARCHIVO_DB, max_entradas: int = 256,
+                 intervalo_version: float = 1.0):
+        self.archivo_db = archivo_db
+        self.max_entradas = max_entradas
+        # Consultar la versión como máximo una vez por intervalo, aunque el dashboard pida más seguido
+        self.intervalo_version = intervalo_version
+        self.aciertos = 0
+        self.fallos = 0
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._versiones = {}  # sql de versión -> (id, fecha, momento de lectura)
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.archivo_db}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA query_only = 1")
+            self._local.conn = conn
+        return conn
+
+    def version(self, sql_version=SQL_ULTIMO_INGRESO):
+        """(último id ingresado, su fecha_hora), refrescado cada intervalo_version segundos.
+            Las velas tienen su propia versión (SQL_ULTIMA_BARRA)"""
+        ahora = time.monotonic()
+        version = self._versiones.get(sql_version)
+        if version is None or ahora - version[2] >= self.intervalo_version:
+            fila = self._conexion().execute(sql_version).fetchone()
+            version = (*(fila if fila else (0, None)), ahora)
+            self._versiones[sql_version] = version
+        return version[0], version[1]
+
+    def _consultar(self, clave, fin, sql, parametros, sql_version=SQL_ULTIMO_INGRESO):
+        version, ultima_fecha = self.version(sql_version)
+
+        with self._lock:
+            entrada = self._cache.get(clave)
+            if entrada is not None:
+                # Cerrado cuando se calculó: el rango terminaba antes del último dato de entonces
+                cerrado = fin is not None and entrada[1] is not None and fin < entrada[1]
+                if cerrado or entrada[0] == version:
+                    self._cache.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[2].copy()
+
+        self.fallos += 1
+        df = pd.read_sql_query(sql, self._conexion(), params=parametros)
+        if 'fecha_hora' in df:
+            df['fecha_hora'] = pd.to_datetime(df['fecha_hora'])
+
+        with self._lock:
+            self._cache[clave] = (version, ultima_fecha, df)
+            self._cache.move_to_end(clave)
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+        return df.copy()
+
+    def chain_snapshot(self, ts: Momento, expiry: Optional[str] = None) -> pd.DataFrame:
+        """Cadena completa tal como estaba en ts: último registro de cada símbolo ese día
+            expiry filtra por código de vencimiento (FE, AB, JU, AG, OC, DI)"""
+        fin = _texto(ts)
+        inicio = fin[:10] + ' 00:00:00.000000'
+        return self._consultar(('chain', fin, expiry), fin, SQL_CHAIN_SNAPSHOT,
+                               (inicio, fin, expiry, expiry))
+
+    def symbol_series(self, symbol: str, start: Momento, end: Momento) -> pd.DataFrame:
+        """Serie de registros de un símbolo en [start, end)"""
+        inicio, fin = _texto(start), _texto(end)
+        return self._consultar(('series', symbol, inicio, fin), fin, SQL_SYMBOL_SERIES,
+                               (symbol, inicio, fin))
+
+    def daily_bars(self, start: Momento, end: Momento, symbol: Optional[str] = None) -> pd.DataFrame:
+        """Velas diarias OHLC (sobre el último operado) por símbolo en [start, end)"""
+        inicio, fin = _texto(start), _texto(end)
+        return self._consultar(('daily', symbol, inicio, fin), fin, SQL_DAILY_BARS,
+                               (inicio, fin, symbol, symbol))
+
+    def intraday_bars(self, symbol: str, start: Momento, end: Momento, interval: int = 60) -> pd.DataFrame:
+        """Velas intradiarias OHLCV (interval = 60 o 300 segundos) de un símbolo o del
+            subyacente (GGAL) en [start, end); fecha_hora es la apertura de cada vela"""
+        inicio, fin = _texto(start), _texto(end)
+        return self._consultar(('intraday', symbol, interval, inicio, fin), fin, SQL_INTRADAY_BARS,
+                               (symbol, interval, inicio, fin), SQL_ULTIMA_BARRA)
+
+    def invalidar(self):
+        with self._lock:
+            self._cache.clear()
+        self._versiones.clear()
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {'entradas': len(self._cache), 'aciertos': self.aciertos, 'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / total if total else 0.0}
+
+
+# Instancia por defecto para usar las funciones del módulo directamente
+_consultas = None
+
+def _default():
+    global _consultas
+    if _consultas is None:
+        _consultas = ConsultasOpciones()
+    return _consultas
+
+def chain_snapshot(ts: Momento, expiry: Optional[str] = None) -> pd.DataFrame:
+    return _default().chain_snapshot(ts, expiry)
+
+def symbol_series(symbol: str, start: Momento, end: Momento) -> pd.DataFrame:
+    return _default().symbol_series(symbol, start, end)
+
+def daily_bars(start: Momento, end: Momento, symbol: Optional[str] = None) -> pd.DataFrame:
+    return _default().daily_bars(start, end, symbol)
+
+def intraday_bars(symbol: str, start: Momento, end: Momento, interval: int = 60) -> pd.DataFrame:
+    return _default().intraday_bars(symbol, start, end, interval)
@@ -0,0 +1,262 @@
+"""Índice as-of para reconstruir la cadena de opciones GGAL en cualquier instante
+Los registros se ordenan por (símbolo, fecha_hora) en arrays de NumPy con una
+clave compuesta símbolo*SPAN + tiempo, así "¿cómo estaba toda la cadena a las
+14:32:05?" se responde con un solo searchsorted vectorizado sobre todos los
+símbolos. Los datos nuevos entran a un bloque delta chico que se consulta junto
+con el bloque base y se fusiona cuando crece (checkpoint + deltas).
+
+Uso:
+    indice = IndiceAsOf.desde_db('opciones_ggal.db', '2024-02-15', '2024-02-16')
+    cadena = indice.cadena_en('2024-02-15 14:32:05', vencimiento='FE')
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+CAMPOS = ('bid', 'ask', 'ultimo', 'tamano_bid', 'tamano_ask', 'volumen')
+
+SQL_REGISTROS = """
+SELECT id, simbolo, vencimiento, tipo_opcion, strike, bid, ask, ultimo,
+       tamano_bid, tamano_ask, volumen, fecha_hora
+FROM opciones_ggal
+WHERE fecha_hora >= ? AND fecha_hora < ? AND id > ?
+ORDER BY id
+"""
+
+# Microsegundos: un año entero por símbolo entra holgado en la clave de 64 bits. Los
+# registros tienen que caer en [base, base + SPAN - 1): fuera de ese rango la clave
+# pisaría la del símbolo vecino, así que agregar() los rechaza
+SPAN = np.int64(366 * 86_400 * 1_000_000)
+
+
+def _fuera_de_rango(tiempos, base):
+    return (tiempos < base) | (tiempos - base >= SPAN - 1)
+
+
+def _a_micros(valores):
+    return pd.to_datetime(valores).to_numpy('datetime64[us]').astype(np.int64)
+
+
+class _Bloque:
+    """Registros ordenados por (código de símbolo, tiempo, id)"""
+
+    def __init__(self, codigos, tiempos, campos, base):
+        orden = np.lexsort((np.arange(len(tiempos)), tiempos, codigos))
+        self.codigos = codigos[orden]
+        self.tiempos = tiempos[orden]
+        self.campos = {k: v[orden] for k, v in campos.items()}
+        self.claves = self.codigos * SPAN + (self.tiempos - base)
+
+    def __len__(self):
+        return len(self.tiempos)
+
+    def buscar(self, codigos, tiempos, base):
+        """Posición del último registro <= tiempo para cada (código, tiempo); -1 si no hay"""
+        if len(self) == 0:
+            return np.full(len(codigos), -1)
+        # -1 y SPAN - 1 quedan entre las claves de dos símbolos: antes de la base no hay dato,
+        # después del rango vale el último registro del símbolo
+        claves = codigos * SPAN + np.clip(tiempos - base, -1, SPAN - 1)
+        pos = np.searchsorted(self.claves, claves, side='right') - 1
+        valido = (pos >= 0) & (self.codigos[np.maximum(pos, 0)] == codigos)
+        return np.where(valido, pos, -1)
+
+
+class IndiceAsOf:
+    """Índice as-of sobre los registros del grabador"""
+
+    def __init__(self, base_tiempo, max_delta=50_000):
+        self.base = np.int64(base_tiempo)
+        self.max_delta = max_delta
+        self.simbolos = []
+        self.codigos = {}
+        self.meta = {'vencimiento': [], 'tipo_opcion': [], 'strike': []}
+        self.ultimo_id = 0
+        self._base = _Bloque(np.empty(0, np.int64), np.empty(0, np.int64),
+                             {k: np.empty(0) for k in CAMPOS}, self.base)
+        self._delta = self._base
+
+    # ---------- carga ----------
+    @classmethod
+    def desde_db(cls, archivo_db, inicio, fin, max_delta=50_000):
+        if _a_micros([pd.Timestamp(fin)])[0] - _a_micros([pd.Timestamp(inicio)])[0] > SPAN - 1:
+            raise ValueError(f"El índice cubre hasta 366 días; partir {inicio}..{fin} en varios índices")
+        indice = cls(_a_micros([pd.Timestamp(inicio)])[0], max_delta)
+        indice.archivo_db = archivo_db
+        indice.rango = (pd.Timestamp(inicio).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                        pd.Timestamp(fin).strftime('%Y-%m-%d %H:%M:%S.%f'))
+        indice.actualizar()
+        indice.fusionar()
+        return indice
+
+    def actualizar(self):
+        """Leer de la base sólo los registros con id mayor al último indexado"""
+        conn = sqlite3.connect(f"file:{self.archivo_db}?mode=ro", uri=True)
+        try:
+            df = pd.read_sql_query(SQL_REGISTROS, conn, params=(*self.rango, int(self.ultimo_id)))
+        finally:
+            conn.close()
+        if not df.empty:
+            self.agregar(df)
+        return len(df)
+
+    def _codificar(self, df):
+        nuevos = [s for s in pd.unique(df['simbolo']) if s not in self.codigos]
+        if nuevos:
+            meta = df.drop_duplicates('simbolo').set_index('simbolo')
+            for simbolo in nuevos:
+                self.codigos[simbolo] = len(self.simbolos)
+                self.simbolos.append(simbolo)
+                for campo in self.meta:
+                    self.meta[campo].append(meta.at[simbolo, campo] if campo in meta else None)
+        return df['simbolo'].map(self.codigos).to_numpy(np.int64)
+
+    def agregar(self, df):
+        """Agregar registros nuevos (DataFrame con las columnas de opciones_ggal) al bloque delta"""
+        codigos = self._codificar(df)
+        tiempos = _a_micros(df['fecha_hora'])
+        fuera = _fuera_de_rango(tiempos, self.base)
+        if fuera.any():
+            raise ValueError(f"{int(fuera.sum())} registros fuera de los 366 días del índice desde "
+                             f"{pd.to_datetime(self.base, unit='us')}; partir la carga en varios índices")
+        campos = {k: pd.to_numeric(df[k], errors='coerce').to_numpy(np.float64) if k in df else np.full(len(df), np.nan)
+                  for k in CAMPOS}
+        if 'id' in df and len(df):
+            self.ultimo_id = max(self.ultimo_id, int(df['id'].max()))
+
+        d = self._delta
+        self._delta = _Bloque(np.concatenate([d.codigos, codigos]),
+                              np.concatenate([d.tiempos, tiempos]),
+                              {k: np.concatenate([d.campos[k], campos[k]]) for k in CAMPOS},
+                              self.base)
+        if len(self._delta) > self.max_delta:
+            self.fusionar()
+
+    def fusionar(self):
+        """Checkpoint: fusionar el delta en el bloque base"""
+        if self._delta is self._base or len(self._delta) == 0:
+            return
+        b, d = self._base, self._delta
+        self._base = _Bloque(np.concatenate([b.codigos, d.codigos]),
+                             np.concatenate([b.tiempos, d.tiempos]),
+                             {k: np.concatenate([b.campos[k], d.campos[k]]) for k in CAMPOS},
+                             self.base)
+        self._delta = _Bloque(np.empty(0, np.int64), np.empty(0, np.int64),
+                              {k: np.empty(0) for k in CAMPOS}, self.base)
+
+    # ---------- consultas ----------
+    def valores_en(self, codigos, tiempos):
+        """As-of vectorizado para pares (código de símbolo, tiempo en µs)
+            Devuelve (tiempos encontrados, dict de campos); NaN/-1 donde no hay dato previo"""
+        codigos = np.asarray(codigos, np.int64)
+        tiempos = np.asarray(tiempos, np.int64)
+        pos_b = self._base.buscar(codigos, tiempos, self.base)
+        pos_d = self._delta.buscar(codigos, tiempos, self.base) if self._delta is not self._base else np.full(len(codigos), -1)
+
+        t_b = np.where(pos_b >= 0, self._base.tiempos[np.maximum(pos_b, 0)] if len(self._base) else -1, -1)
+        t_d = np.where(pos_d >= 0, self._delta.tiempos[np.maximum(pos_d, 0)] if len(self._delta) else -1, -1)
+        usar_delta = (pos_d >= 0) & (t_d >= t_b)
+
+        encontrados = np.where(usar_delta, t_d, t_b)
+        campos = {}
+        for k in CAMPOS:
+            vb = np.where(pos_b >= 0, self._base.campos[k][np.maximum(pos_b, 0)] if len(self._base) else np.nan, np.nan)
+            vd = np.where(pos_d >= 0, self._delta.campos[k][np.maximum(pos_d, 0)] if len(self._delta) else np.nan, np.nan)
+            campos[k] = np.where(usar_delta, vd, vb)
+        return encontrados, campos
+
+    def cadena_en(self, ts, vencimiento=None, max_antiguedad=None):
+        """Estado de toda la cadena en ts: último registro de cada símbolo con fecha_hora <= ts
+            max_antiguedad (timedelta) descarta símbolos sin datos recientes"""
+        t = _a_micros([pd.Timestamp(ts)])[0]
+        codigos = np.arange(len(self.simbolos), dtype=np.int64)
+        if vencimiento is not None:
+            codigos = codigos[np.asarray(self.meta['vencimiento'], dtype=object) == vencimiento]
+        encontrados, campos = self.valores_en(codigos, np.full(len(codigos), t))
+
+        hay = encontrados >= 0
+        if max_antiguedad is not None:
+            hay &= (t - encontrados) <= int(pd.Timedelta(max_antiguedad) / pd.Timedelta(microseconds=1))
+        sel = codigos[hay]
+        df = pd.DataFrame({
+            'simbolo': np.asarray(self.simbolos, dtype=object)[sel],
+            'vencimiento': np.asarray(self.meta['vencimiento'], dtype=object)[sel],
+            'tipo_opcion': np.asarray(self.meta['tipo_opcion'], dtype=object)[sel],
+            'strike': np.asarray(self.meta['strike'], dtype=np.float64)[sel],
+            **{k: v[hay] for k, v in campos.items()},
+            'fecha_hora': pd.to_datetime(encontrados[hay], unit='us'),
+        })
+        return df
+
+    def __len__(self):
+        return len(self._base) + (len(self._delta) if self._delta is not self._base else 0)
+
+
+def asof_join(izquierda, derecha, columnas, on='fecha_hora', tolerancia=None, sufijo='_subyacente'):
+    """As-of join vectorizado: a cada fila de izquierda (ej. ticks de opciones) le asigna
+        el último valor de derecha (ej. ticks de GGAL) con tiempo <= al suyo.
+        derecha debe tener una sola serie (un símbolo); no hace falta ordenar izquierda."""
+    t_izq = _a_micros(izquierda[on])
+    derecha = derecha.sort_values(on, kind='stable')
+    t_der = _a_micros(derecha[on])
+    pos = np.searchsorted(t_der, t_izq, side='right') - 1
+    valido = pos >= 0
+    if tolerancia is not None:
+        tol = int(pd.Timedelta(tolerancia) / pd.Timedelta(microseconds=1))
+        valido &= (t_izq - t_der[np.maximum(pos, 0)]) <= tol
+
+    resultado = izquierda.copy()
+    for columna in columnas:
+        valores = derecha[columna].to_numpy(np.float64)
+        resultado[columna + sufijo] = np.where(valido, valores[np.maximum(pos, 0)], np.nan)
+    resultado[on + sufijo] = pd.to_datetime(np.where(valido, t_der[np.maximum(pos, 0)], np.iinfo(np.int64).min), unit='us')
+    resultado.loc[~valido, on + sufijo] = pd.NaT
+    return resultado
+
+
+if __name__ == "__main__":
+    # Benchmark con una cinta sintética: 80 símbolos, un registro cada 5 segundos por símbolo durante una semana
+    rng = np.random.default_rng(0)
+    simbolos = [f"GFG{'C' if i % 2 == 0 else 'V'}{40000 + 500 * (i // 2)}{['FE', 'AB'][i // 40]}" for i in range(80)]
+    dias = pd.bdate_range('2024-02-01', periods=5)
+    instantes = np.concatenate([pd.date_range(d + pd.Timedelta(hours=11), d + pd.Timedelta(hours=17), freq='5s').to_numpy()
+                                for d in dias])
+    n = len(instantes) * len(simbolos)
+    print(f"Generando {n:,} registros sintéticos...")
+    df = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'simbolo': np.tile(simbolos, len(instantes)),
+        'vencimiento': np.tile([s[-2:] for s in simbolos], len(instantes)),
+        'tipo_opcion': np.tile(['Call' if s[3] == 'C' else 'Put' for s in simbolos], len(instantes)),
+        'strike': np.tile([float(s[4:-2]) / 10 for s in simbolos], len(instantes)),
+        'fecha_hora': np.repeat(instantes, len(simbolos)) + rng.integers(0, 5_000, n).astype('timedelta64[ms]'),
+        'bid': rng.random(n) * 100, 'ask': rng.random(n) * 100 + 100, 'ultimo': rng.random(n) * 200,
+        'tamano_bid': rng.integers(1, 100, n), 'tamano_ask': rng.integers(1, 100, n), 'volumen': rng.integers(0, 10_000, n),
+    })
+
+    inicio = time.perf_counter()
+    indice = IndiceAsOf(_a_micros([dias[0]])[0])
+    indice.agregar(df)
+    indice.fusionar()
+    print(f"Índice construido en {time.perf_counter() - inicio:.2f}s ({len(indice):,} registros)")
+
+    consultas = pd.to_datetime(rng.choice(instantes, 1000))
+    inicio = time.perf_counter()
+    for ts in consultas:
+        indice.cadena_en(ts)
+    print(f"cadena_en: {(time.perf_counter() - inicio) / len(consultas) * 1000:.3f} ms por consulta")
+
+    inicio = time.perf_counter()
+    for ts in consultas:
+        indice.valores_en(np.arange(len(simbolos)), np.full(len(simbolos), _a_micros([ts])[0]))
+    print(f"valores_en (sin armar DataFrame): {(time.perf_counter() - inicio) / len(consultas) * 1000:.3f} ms por consulta")
+
+    subyacente = pd.DataFrame({'fecha_hora': pd.to_datetime(instantes) + pd.Timedelta(milliseconds=500),
+                               'ultimo': 4000 + rng.normal(0, 1, len(instantes)).cumsum()})
+    muestra = df.sample(500_000, random_state=0)
+    inicio = time.perf_counter()
+    asof_join(muestra, subyacente, ['ultimo'])
+    print(f"asof_join de {len(muestra):,} ticks contra el subyacente: {time.perf_counter() - inicio:.2f}s")
@@ -0,0 +1,354 @@
+"""Cadena de opciones GGAL en memoria compartida
+El grabador publica la última cotización de cada símbolo en una región mmap de
+layout fijo (un encabezado y una tabla de registros de NumPy) y los bots del
+mismo host la leen como una vista sin copia, sin red ni base de datos.
+
+La consistencia se garantiza con un seqlock: el grabador incrementa la
+secuencia (impar = escribiendo), actualiza las filas y la vuelve a incrementar
+(par = estable). El lector toma la secuencia, lee y la vuelve a comparar; si
+cambió o era impar, reintenta. Los símbolos se agregan en orden de aparición y
+nunca cambian de fila, así un lector puede cachear la fila de cada símbolo.
+
+Uso en el grabador (DB/script-db.py):
+    publicador = PublicadorCadena()
+    registrar_consumidor(publicador.publicar)
+
+Uso en un bot:
+    lector = LectorCadena()
+    cadena = lector.instantanea()                  # copia consistente de todas las filas
+    mid = lector.leer(lambda v: (v['bid'][i] + v['ask'][i]) / 2)  # lectura sin copia
+"""
+
+import mmap
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+MAGIA = b'GGALSHM1'
+VERSION_LAYOUT = 1
+# /dev/shm vive en RAM; en otros sistemas el archivo temporal queda en la caché de páginas
+DIRECTORIO = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+RUTA = os.path.join(DIRECTORIO, 'cadena_ggal.shm')
+
+ENCABEZADO = np.dtype([
+    ('magia', 'S8'),
+    ('version_layout', '<u4'),
+    ('capacidad', '<u4'),
+    ('secuencia', '<u8'),      # seqlock: impar mientras el grabador escribe
+    ('cantidad', '<u8'),       # filas en uso
+    ('publicado_ns', '<i8'),   # time.monotonic_ns() de la última publicación (reloj del host)
+    ('lotes', '<u8'),
+    ('relleno', 'V16'),
+])
+
+REGISTRO = np.dtype([
+    ('simbolo', 'S16'),
+    ('vencimiento', 'S2'),
+    ('tipo', 'S1'),            # C o P
+    ('strike', '<f8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('tamano_bid', '<f8'),
+    ('tamano_ask', '<f8'),
+    ('ultimo', '<f8'),
+    ('volumen', '<f8'),
+    ('fecha_hora', '<M8[us]'),  # hora de la cotización según el feed
+    ('actualizado_ns', '<i8'),  # time.monotonic_ns() al publicar la fila
+], align=True)
+
+# Columna del registro -> columnas aceptadas en el DataFrame (grabador o tabla opciones_ggal)
+COLUMNAS = {
+    'bid': ('bid',),
+    'ask': ('ask',),
+    'tamano_bid': ('tamano_bid', 'bid_size'),
+    'tamano_ask': ('tamano_ask', 'ask_size'),
+    'ultimo': ('ultimo', 'last'),
+    'volumen': ('volumen', 'volume'),
+    'strike': ('strike',),
+}
+
+
+def _tamano(capacidad):
+    return ENCABEZADO.itemsize + capacidad * REGISTRO.itemsize
+
+
+def _vistas(buffer, capacidad):
+    encabezado = np.frombuffer(buffer, ENCABEZADO, 1, 0)
+    filas = np.frombuffer(buffer, REGISTRO, capacidad, ENCABEZADO.itemsize)
+    return encabezado, filas
+
+
+class PublicadorCadena:
+    """Escritor único de la región compartida (el grabador)"""
+
+    def __init__(self, ruta=RUTA, capacidad=4096):
+        self.ruta = ruta
+        existente = self._capacidad_existente(ruta)
+        # Reusar el archivo si el layout coincide: los lectores ya abiertos siguen mapeando el mismo
+        self.capacidad = existente or capacidad
+        self._archivo = open(ruta, 'r+b' if existente else 'w+b')
+        if not existente:
+            self._archivo.truncate(_tamano(self.capacidad))
+        self._mmap = mmap.mmap(self._archivo.fileno(), _tamano(self.capacidad))
+        self._encabezado, self.filas = _vistas(self._mmap, self.capacidad)
+        self._secuencia = self._encabezado['secuencia']
+        if not existente:
+            self._encabezado['magia'] = MAGIA
+            self._encabezado['version_layout'] = VERSION_LAYOUT
+            self._encabezado['capacidad'] = self.capacidad
+        elif self._secuencia[0] % 2:
+            # El grabador anterior murió escribiendo: dejar la secuencia estable
+            self._secuencia[0] += 1
+        cantidad = int(self._encabezado['cantidad'][0])
+        self.indice = {s.decode(): i for i, s in enumerate(self.filas['simbolo'][:cantidad])}
+
+    @staticmethod
+    def _capacidad_existente(ruta):
+        if not os.path.exists(ruta) or os.path.getsize(ruta) < ENCABEZADO.itemsize:
+            return None
+        with open(ruta, 'rb') as f:
+            encabezado = np.frombuffer(f.read(ENCABEZADO.itemsize), ENCABEZADO)[0]
+        capacidad = int(encabezado['capacidad'])
+        if (encabezado['magia'] != MAGIA or encabezado['version_layout'] != VERSION_LAYOUT
+                or os.path.getsize(ruta) != _tamano(capacidad)):
+            return None
+        return capacidad
+
+    def _filas_de(self, simbolos):
+        """Fila de cada símbolo, asignando filas nuevas a los que no estaban"""
+        filas = np.empty(len(simbolos), np.int64)
+        for i, simbolo in enumerate(simbolos):
+            fila = self.indice.get(simbolo)
+            if fila is None:
+                fila = len(self.indice)
+                if fila >= self.capacidad:
+                    filas[i] = -1
+                    continue
+                self.indice[simbolo] = fila
+            filas[i] = fila
+        return filas
+
+    def publicar(self, cotizaciones):
+        """Publicar un lote (DataFrame indexado por símbolo, como el de procesar_opciones)"""
+        df = cotizaciones if 'simbolo' not in cotizaciones else cotizaciones.set_index('simbolo')
+        df = df[~df.index.duplicated(keep='last')]
+        if df.empty:
+            return 0
+        anteriores = len(self.indice)
+        filas = self._filas_de([str(s) for s in df.index])
+        validas = filas >= 0
+        if not validas.all():
+            print(f"Memoria compartida llena ({self.capacidad} símbolos): se descartan {int((~validas).sum())}")
+            df, filas = df[validas], filas[validas]
+
+        columnas = {}
+        for campo, nombres in COLUMNAS.items():
+            nombre = next((n for n in nombres if n in df), None)
+            columnas[campo] = (pd.to_numeric(df[nombre], errors='coerce').to_numpy(np.float64)
+                               if nombre else np.full(len(df), np.nan))
+        fechas = (pd.to_datetime(df['fecha_hora']) if 'fecha_hora' in df
+                  else pd.to_datetime(df['datetime']) if 'datetime' in df
+                  else pd.Series(pd.NaT, index=df.index))
+        fechas = fechas.to_numpy('datetime64[us]')
+        ahora = time.monotonic_ns()
+
+        self._secuencia[0] += 1  # impar: escribiendo
+        try:
+            nuevas = filas >= anteriores
+            if nuevas.any():
+                n = df[nuevas]
+                self.filas['simbolo'][filas[nuevas]] = n.index.astype(str)
+                self.filas['vencimiento'][filas[nuevas]] = (n['vencimiento'].fillna('').astype(str)
+                                                            if 'vencimiento' in n else '')
+                if 'tipo_opcion' in n:
+                    self.filas['tipo'][filas[nuevas]] = n['tipo_opcion'].fillna('').astype(str).str[:1].str.upper()
+                self._encabezado['cantidad'] = len(self.indice)
+            for campo, valores in columnas.items():
+                self.filas[campo][filas] = valores
+            self.filas['fecha_hora'][filas] = fechas
+            self.filas['actualizado_ns'][filas] = ahora
+            self._encabezado['publicado_ns'] = ahora
+            self._encabezado['lotes'] += 1
+        finally:
+            self._secuencia[0] += 1  # par: estable
+        return len(filas)
+
+    def cerrar(self, borrar=False):
+        del self._encabezado, self.filas, self._secuencia
+        self._mmap.close()
+        self._archivo.close()
+        if borrar:
+            os.remove(self.ruta)
+
+
+class LectorCadena:
+    """Lector de la región compartida; puede haber cualquier cantidad por host"""
+
+    def __init__(self, ruta=RUTA, timeout=0.1):
+        self.ruta = ruta
+        self.timeout = timeout
+        with open(ruta, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        encabezado = np.frombuffer(self._mmap, ENCABEZADO, 1, 0)[0]
+        if encabezado['magia'] != MAGIA or encabezado['version_layout'] != VERSION_LAYOUT:
+            self._mmap.close()
+            raise ValueError(f"{ruta} no es una cadena en memoria compartida (layout {VERSION_LAYOUT})")
+        self.capacidad = int(encabezado['capacidad'])
+        self._encabezado, self.filas = _vistas(self._mmap, self.capacidad)
+        self._secuencia = self._encabezado['secuencia']
+        self.indice = {}  # símbolo -> fila (las filas no cambian de símbolo)
+        self.reintentos = 0  # lecturas repetidas por choque con el grabador
+
+    @property
+    def version(self):
+        """Secuencia actual: cambia con cada publicación"""
+        return int(self._secuencia[0])
+
+    def leer(self, funcion):
+        """Aplicar funcion(vista de las filas en uso) dentro del seqlock y devolver su resultado.
+            La vista no se copia; lo que funcion devuelva no debe seguir apuntando a ella"""
+        limite = None
+        while True:
+            antes = self._secuencia[0]
+            if not antes % 2:
+                resultado = funcion(self.filas[:self._encabezado['cantidad'][0]])
+                if self._secuencia[0] == antes:
+                    return resultado
+            # El grabador está escribiendo: ceder el procesador y reintentar
+            self.reintentos += 1
+            if limite is None:
+                limite = time.monotonic() + self.timeout
+            elif time.monotonic() > limite:
+                raise TimeoutError(f"Sin lectura consistente de {self.ruta} en {self.timeout}s")
+            time.sleep(0)
+
+    def instantanea(self):
+        """Copia consistente de todas las filas en uso (array estructurado)"""
+        return self.leer(np.copy)
+
+    def esperar(self, version, timeout=1.0):
+        """Esperar (sondeando) una publicación posterior a version; devuelve la nueva versión o None"""
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            actual = self._secuencia[0]
+            if actual != version and not actual % 2:
+                return int(actual)
+            time.sleep(0)
+        return None
+
+    def fila(self, simbolo):
+        """Fila del símbolo o None si el grabador todavía no lo publicó"""
+        fila = self.indice.get(simbolo)
+        if fila is None:
+            cantidad = int(self._encabezado['cantidad'][0])
+            if len(self.indice) < cantidad:
+                self.indice = {s.decode(): i for i, s in enumerate(self.filas['simbolo'][:cantidad]) if s}
+                fila = self.indice.get(simbolo)
+        return fila
+
+    def cotizacion(self, simbolo):
+        """Registro consistente de un símbolo (np.void) o None"""
+        fila = self.fila(simbolo)
+        if fila is None:
+            return None
+        return self.leer(lambda filas: filas[fila].copy())
+
+    def edad(self):
+        """Segundos desde la última publicación del grabador"""
+        publicado = int(self._encabezado['publicado_ns'][0])
+        return (time.monotonic_ns() - publicado) / 1e9 if publicado else float('inf')
+
+    def a_dataframe(self):
+        cadena = self.instantanea()
+        df = pd.DataFrame({campo: cadena[campo] for campo in REGISTRO.names if campo != 'simbolo'},
+                          index=pd.Index(cadena['simbolo'].astype(str), name='simbolo'))
+        for campo in ('vencimiento', 'tipo'):
+            df[campo] = df[campo].str.decode('ascii')
+        return df
+
+    def cerrar(self):
+        del self._encabezado, self.filas, self._secuencia
+        self._mmap.close()
+
+
+def _grabador_sintetico(ruta, simbolos, lotes, tamano_lote, listo):
+    """Proceso escritor del benchmark: publica lotes de cotizaciones como el grabador"""
+    publicador = PublicadorCadena(ruta, capacidad=len(simbolos))
+    rng = np.random.default_rng(0)
+    base = pd.DataFrame({
+        'vencimiento': [s[-2:] for s in simbolos], 'tipo_opcion': 'Call', 'strike': 4000.0,
+        'bid': 100.0, 'ask': 101.0, 'bid_size': 10, 'ask_size': 10, 'last': 100.5, 'volume': 0,
+        'fecha_hora': pd.Timestamp.now(),
+    }, index=pd.Index(simbolos))
+    publicador.publicar(base)
+    listo.set()
+    for _ in range(lotes):
+        lote = base.iloc[rng.choice(len(base), tamano_lote, replace=False)].copy()
+        lote['bid'] += rng.normal(0, 1, tamano_lote)
+        lote['ask'] = lote['bid'] + 1.0
+        publicador.publicar(lote)
+        time.sleep(0.0005)
+    publicador.cerrar()
+
+
+if __name__ == "__main__":
+    # Benchmark: lectura local de la cadena frente a un request REST por símbolo,
+    # y latencia publicación -> visible en otro proceso
+    import multiprocessing
+    import sys
+
+    ruta = os.path.join(DIRECTORIO, 'cadena_ggal_bench.shm')
+    simbolos = [f"GFG{t}{k * 10}{c}" for t in 'CV' for k in range(3000, 6001, 25) for c in ('FE', 'AB', 'JU')]
+    listo = multiprocessing.Event()
+    escritor = multiprocessing.Process(target=_grabador_sintetico, args=(ruta, simbolos, 20_000, 50, listo))
+    escritor.start()
+    listo.wait()
+    lector = LectorCadena(ruta)
+    fila = lector.fila(simbolos[100])
+
+    n = 20_000
+    inicio = time.perf_counter()
+    for _ in range(n):
+        lector.instantanea()
+    print(f"instantanea() de {len(simbolos)} símbolos: {(time.perf_counter() - inicio) / n * 1e6:.1f} µs")
+    inicio = time.perf_counter()
+    for _ in range(n):
+        lector.leer(lambda v: (v['bid'][fila] + v['ask'][fila]) / 2)
+    print(f"mid de un símbolo sin copia:   {(time.perf_counter() - inicio) / n * 1e6:.1f} µs")
+    inicio = time.perf_counter()
+    for _ in range(n):
+        lector.cotizacion(simbolos[100])
+    print(f"cotizacion(simbolo):           {(time.perf_counter() - inicio) / n * 1e6:.1f} µs")
+    print(f"Reintentos por choque con el grabador: {lector.reintentos}")
+
+    # Publicación -> visible: el escritor estampa monotonic_ns (reloj común a los procesos del host)
+    demoras = []
+    version = lector.version
+    while escritor.is_alive() and len(demoras) < 2000:
+        version = lector.esperar(version, timeout=0.5)
+        if version is None:
+            break
+        demoras.append((time.monotonic_ns() - int(lector._encabezado['publicado_ns'][0])) / 1e3)
+    escritor.join()
+    if demoras:
+        print(f"publicación -> visible: p50 {np.percentile(demoras, 50):.0f} µs, p99 {np.percentile(demoras, 99):.0f} µs")
+    print(lector.a_dataframe().head(3))
+    lector.cerrar()
+    os.remove(ruta)
+
+    # Referencia: el mismo precio pedido por REST al mercado simulado local
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API MATRIZ'))
+    from main2 import Config, AuthManager, MarketData
+    from exchange_sim import ExchangeSimulator
+
+    sim = ExchangeSimulator(rate=1e9, burst=1e9).start()
+    Config.API_BASE_URL = sim.url
+    md = MarketData(AuthManager("demo", "demo"))
+    inicio = time.perf_counter()
+    for _ in range(200):
+        md.get_real_time_data("GFGC40000FE")
+    print(f"REST marketdata/get (local):   {(time.perf_counter() - inicio) / 200 * 1e6:.0f} µs")
+    sim.stop()
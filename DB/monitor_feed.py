@@ -0,0 +1,141 @@
+"""Monitor de latidos del feed de HomeBroker
+Detecta cuando dejan de llegar cotizaciones (o el stream avisa que se cayó la
+conexión), reconecta con backoff exponencial, registra el hueco y mide cuánto
+tardó en recuperarse.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+
+
+class MonitorFeed:
+    """Vigila la llegada de cotizaciones durante la sesión
+        - latido() se llama desde el callback del feed en cada llegada
+        - notificar_caida() fuerza la reconexión inmediata (ej. on_error con connection_lost)
+        - reconectar() debe devolver True si la conexión se restableció
+        - registrar_hueco(hueco) guarda el hueco detectado (dict)
+        - backfill(inicio, fin), opcional, recupera lo perdido y devuelve la cantidad de registros"""
+
+    def __init__(self, reconectar, registrar_hueco, backfill=None, umbral=60.0, intervalo=5.0,
+                 backoff_inicial=1.0, backoff_max=120.0):
+        self.reconectar = reconectar
+        self.registrar_hueco = registrar_hueco
+        self.backfill = backfill
+        self.umbral = umbral
+        self.intervalo = intervalo
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+
+        self.ultimo_tick = None        # time.monotonic() de la última llegada
+        self.ultimo_tick_fecha = None  # datetime de la última llegada
+        self.huecos = 0
+        self._hubo_tick = threading.Event()
+        self._caida = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def latido(self):
+        """Registrar una llegada de cotizaciones (llamar desde el callback del feed)"""
+        self.ultimo_tick = time.monotonic()
+        self.ultimo_tick_fecha = datetime.now()
+        self._hubo_tick.set()
+
+    def notificar_caida(self):
+        self._caida.set()
+
+    def inactividad(self):
+        """Segundos desde la última llegada"""
+        if self.ultimo_tick is None:
+            return 0.0
+        return time.monotonic() - self.ultimo_tick
+
+    def iniciar(self):
+        """Arrancar la vigilancia (al abrir la sesión)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._caida.clear()
+        # Dar margen al primer tick de la sesión antes de considerarlo inactivo
+        self.ultimo_tick = time.monotonic()
+        self.ultimo_tick_fecha = datetime.now()
+        self._hilo = threading.Thread(target=self._vigilar, name='monitor-feed', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detener la vigilancia (antes de desconectar al cierre)
+            Despierta la espera del primer tick tras reconectar y espera al hilo sin timeout:
+            si estaba dentro de reconectar() se termina antes de volver, así la desconexión
+            posterior no deja una conexión abierta por el monitor"""
+        self._detener.set()
+        self._hubo_tick.set()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join()
+        self._hilo = None
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo):
+            if self._caida.is_set() or self.inactividad() > self.umbral:
+                try:
+                    self._recuperar()
+                except Exception as e:
+                    print(f"Error en el monitor del feed: {e}")
+
+    def _recuperar(self):
+        motivo = 'caida' if self._caida.is_set() else 'inactividad'
+        inicio = self.ultimo_tick_fecha or datetime.now()
+        detectado = time.monotonic()
+        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Feed sin datos desde {inicio.strftime('%H:%M:%S')} ({motivo}), reconectando...")
+
+        intentos = 0
+        espera = self.backoff_inicial
+        recuperado = False
+        while not self._detener.is_set():
+            intentos += 1
+            self._hubo_tick.clear()
+            try:
+                ok = self.reconectar()
+            except Exception as e:
+                print(f"Error al reconectar: {e}")
+                ok = False
+            # La reconexión sólo cuenta si vuelven a llegar cotizaciones (detener() también despierta)
+            if ok and self._hubo_tick.wait(self.umbral) and not self._detener.is_set():
+                recuperado = True
+                break
+            if self._detener.is_set():
+                break
+            espera_real = espera * (1 + random.uniform(0, 0.25))
+            print(f"Reintento {intentos} fallido, próximo en {espera_real:.1f}s")
+            if self._detener.wait(espera_real):
+                break
+            espera = min(espera * 2, self.backoff_max)
+
+        recuperacion = time.monotonic() - detectado
+        fin = self.ultimo_tick_fecha if recuperado else datetime.now()
+        self._caida.clear()
+
+        recuperados = 0
+        if recuperado and self.backfill is not None:
+            try:
+                recuperados = self.backfill(inicio, fin) or 0
+            except Exception as e:
+                print(f"Error en el backfill del hueco: {e}")
+
+        self.huecos += 1
+        hueco = {
+            'inicio': inicio,
+            'fin': fin,
+            'motivo': motivo,
+            'duracion_seg': (fin - inicio).total_seconds(),
+            'recuperacion_seg': recuperacion if recuperado else None,
+            'reintentos': intentos,
+            'registros_recuperados': recuperados,
+        }
+        self.registrar_hueco(hueco)
+
+        if recuperado:
+            print(f"Feed recuperado en {recuperacion:.1f}s tras {intentos} intento(s); "
+                  f"hueco de {hueco['duracion_seg']:.0f}s, {recuperados} registros recuperados")
+        else:
+            print(f"Vigilancia detenida con el feed caído; hueco de {hueco['duracion_seg']:.0f}s registrado")
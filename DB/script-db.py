@@ -1,14 +1,25 @@
 import pandas as pd
 import sqlite3
-from datetime import datetime, time as dt_time
-import time
-import schedule
+from datetime import datetime, timedelta
 from pyhomebroker import HomeBroker
 import re
 import os
-from sqlalchemy import create_engine, Column, String, Float, Integer, DateTime
+import sys
+import threading
+from sqlalchemy import create_engine, Column, String, Float, Integer, DateTime, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from calendario_byma import CalendarioBYMA, PlanificadorSesiones
+from monitor_feed import MonitorFeed
+from memoria_compartida import PublicadorCadena
+from captura_feed import CapturaFeed
+from barras import AgregadorBarras
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API MATRIZ'))
+import metrics
+from main2 import Config
+from parity_scanner import ParityScanner
+from vol_surface import VolSurface
 
 # Configuración de la base de datos
 Base = declarative_base()
@@ -37,11 +48,47 @@ class DatosOpcion(Base):
     fecha_hora = Column(DateTime, index=True)
     timestamp = Column(DateTime, default=datetime.now)
 
+class HuecoFeed(Base):
+    __tablename__ = 'huecos_feed'
+    
+    id = Column(Integer, primary_key=True)
+    inicio = Column(DateTime, index=True)  # Última cotización recibida antes del corte
+    fin = Column(DateTime)  # Primera cotización después de reconectar
+    motivo = Column(String)  # inactividad o caida
+    duracion_seg = Column(Float)
+    recuperacion_seg = Column(Float)  # Desde la detección hasta la primera cotización nueva
+    reintentos = Column(Integer)
+    registros_recuperados = Column(Integer)
+    timestamp = Column(DateTime, default=datetime.now)
+
+class BarraOpcion(Base):
+    __tablename__ = 'barras_ggal'
+    
+    id = Column(Integer, primary_key=True)
+    simbolo = Column(String)  # Opciones GGAL y el subyacente (GGAL)
+    intervalo = Column(Integer)  # Segundos: 60 o 300
+    inicio = Column(DateTime)  # Apertura de la vela
+    apertura = Column(Float)
+    maximo = Column(Float)
+    minimo = Column(Float)
+    cierre = Column(Float)
+    volumen = Column(Float)
+    ticks = Column(Integer)
+    
+    __table_args__ = (Index('ix_barras_ggal_simbolo_intervalo_inicio', 'simbolo', 'intervalo', 'inicio'),)
+
 # Crear motor de base de datos
-archivo_db = 'opciones_ggal.db'
+archivo_db = os.environ.get('ARCHIVO_DB', 'opciones_ggal.db')  # captura_feed.py reproduce contra otra base
 motor = create_engine(f'sqlite:///{archivo_db}')
 Base.metadata.create_all(motor)
 
+# Índice compuesto para las consultas por símbolo y rango de tiempo (también en bases existentes)
+Index('ix_opciones_ggal_simbolo_fecha_hora', DatosOpcion.simbolo, DatosOpcion.fecha_hora).create(motor, checkfirst=True)
+
+# WAL: los lectores (consultas.py, dashboards) no bloquean al grabador ni viceversa
+with motor.connect() as conexion:
+    conexion.execute(text("PRAGMA journal_mode=WAL"))
+
 # Crear sesión
 Sesion = sessionmaker(bind=motor)
 
@@ -55,6 +102,59 @@ Sesion = sessionmaker(bind=motor)
 datos_opciones = pd.DataFrame()
 esta_conectado = False
 
+# El callback de HomeBroker y el backfill del monitor procesan en hilos distintos; el estado
+# compartido (datos_opciones, velas, scanner, publicador de un solo escritor) va bajo este lock
+bloqueo_opciones = threading.Lock()
+
+# Calendario de sesiones de BYMA (feriados y horario de trading)
+calendario = CalendarioBYMA()
+
+# Funciones que reciben cada lote de cotizaciones procesadas (DataFrame indexado por símbolo)
+consumidores = []
+
+def registrar_consumidor(funcion):
+    consumidores.append(funcion)
+
+# Última cotización de cada opción en memoria compartida para los bots del mismo host (LectorCadena)
+publicador = PublicadorCadena(os.environ['CADENA_SHM']) if os.environ.get('CADENA_SHM') else PublicadorCadena()
+registrar_consumidor(publicador.publicar)
+
+# Velas de 1 y 5 minutos por opción y del subyacente, cerradas a medida que avanza el feed
+def guardar_barras(velas):
+    sesion = Sesion()
+    
+    try:
+        sesion.bulk_insert_mappings(BarraOpcion, velas.to_dict('records'))
+        sesion.commit()
+    except Exception as e:
+        sesion.rollback()
+        print(f"Error al guardar velas: {e}")
+    finally:
+        sesion.close()
+
+barras = AgregadorBarras(guardar_barras, intervalos=(60, 300))
+registrar_consumidor(barras.actualizar)
+
+# Paridad put-call y box spreads sobre cada lote (sólo recalcula los strikes tocados)
+def alertar_arbitraje(alerta):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Alerta {alerta['kind']} {alerta['expiry']}: "
+          f"ganancia {alerta['edge']:.2f} por acción, patas {[pata['symbol'] for pata in alerta['legs']]}")
+
+scanner = ParityScanner(rate=Config.RISK_FREE_RATE, min_edge=5.0)
+scanner.subscribe(alertar_arbitraje)
+registrar_consumidor(scanner.update)
+
+# Superficie de IV: reajusta sólo los vencimientos cuyas puntas cambiaron (el spot llega por en_acciones)
+superficie = VolSurface(rate=Config.RISK_FREE_RATE)
+registrar_consumidor(superficie.update)
+
+# Subyacente de las opciones: panel de acciones líderes, plazo 24hs
+subyacente = 'GGAL'
+plazo_subyacente = '24hs'
+
+# Captura de los lotes crudos del feed para reproducirlos al perfilar (CAPTURA_FEED=directorio)
+captura = CapturaFeed(os.environ['CAPTURA_FEED']) if os.environ.get('CAPTURA_FEED') else None
+
 # Extraer vencimiento, strike y tipo de opción del símbolo
 def analizar_simbolo_opcion(simbolo):
     if not simbolo.startswith('GFG'):
@@ -62,45 +162,99 @@ def analizar_simbolo_opcion(simbolo):
     
     tipo_opcion = 'Call' if 'C' in simbolo[3:4] else 'Put'
     
-    # Extraer vencimiento y strike
-    patron = r'GFG[CP](\d+)([A-Z]{2})'
+    # Extraer vencimiento y strike (C para calls, V para puts)
+    patron = r'GFG[CV](\d+)([A-Z]{2})'
     coincidencia = re.match(patron, simbolo)
     if coincidencia:
-        strike = float(coincidencia.group(1)) / 100  # Asumiendo que el strike está en centavos
+        # Misma escala que main2: 40283 -> 4028.30
+        strike = float(coincidencia.group(1)) / Config.SYMBOL_MAP['GGAL']['strike_divisor']
         vencimiento = coincidencia.group(2)
         return vencimiento, strike, tipo_opcion
     return None, None, None
 
 # Función de callback para datos de opciones
 def en_opciones(online, cotizaciones):
+    llegada = metrics.now()
+    if captura is not None:
+        captura.grabar(cotizaciones)
+    monitor.latido()
+    procesar_opciones(cotizaciones, llegada)
+
+# Función de callback para el panel de acciones: sólo se usa el subyacente (velas y scanner)
+def en_acciones(online, cotizaciones):
+    # El panel viene indexado por (símbolo, plazo)
+    simbolos = cotizaciones.index.get_level_values(0)
+    datos = cotizaciones[simbolos == subyacente]
+    if datos.empty:
+        return
+    datos = datos.set_axis(datos.index.get_level_values(0))
+    datos = datos.assign(fecha_hora=pd.to_datetime(datos['datetime']))
+    try:
+        barras.actualizar(datos)
+    except Exception as e:
+        print(f"Error al actualizar velas del subyacente: {e}")
+    try:
+        bid, ask = float(datos['bid'].iloc[-1]), float(datos['ask'].iloc[-1])
+        with bloqueo_opciones:
+            scanner.update_spot(bid, ask)
+        if bid > 0 and ask > 0:
+            # Sólo registra el spot (con su propio lock): el reajuste se hace al consultar la superficie
+            superficie.set_spot((bid + ask) / 2)
+    except Exception as e:
+        print(f"Error al actualizar el subyacente del scanner y la superficie: {e}")
+
+def procesar_opciones(cotizaciones, llegada=None, en_vivo=True):
+    # en_vivo=False (backfill): sólo se guarda, sin pasar por los consumidores en vivo
     global datos_opciones
+    # Latencias desde la llegada del lote: parsed, persisted y published (con BOT_METRICS=1)
+    traza = metrics.trace('feed_opciones', start=llegada)
     
     # Filtrar solo opciones de GGAL (prefijo GFG)
     opciones_ggal = cotizaciones[cotizaciones.index.str.startswith('GFG')]
     
-    if not opciones_ggal.empty:
-        # Crear una copia para evitar SettingWithCopyWarning
-        estos_datos = opciones_ggal.copy()
-        estos_datos['cambio'] = estos_datos["change"] / 100
-        estos_datos['fecha_hora'] = pd.to_datetime(estos_datos['datetime'])
-        
-        # Agregar columnas de vencimiento y tipo de opción
-        for idx, fila in estos_datos.iterrows():
-            vencimiento, strike, tipo_opcion = analizar_simbolo_opcion(idx)
-            estos_datos.at[idx, 'vencimiento'] = vencimiento
-            estos_datos.at[idx, 'strike'] = strike
-            estos_datos.at[idx, 'tipo_opcion'] = tipo_opcion
-        
+    if opciones_ggal.empty:
+        return 0
+    
+    # Crear una copia para evitar SettingWithCopyWarning
+    estos_datos = opciones_ggal.copy()
+    estos_datos['cambio'] = estos_datos["change"] / 100
+    estos_datos['fecha_hora'] = pd.to_datetime(estos_datos['datetime'])
+    
+    # Agregar columnas de vencimiento y tipo de opción
+    for idx, fila in estos_datos.iterrows():
+        vencimiento, strike, tipo_opcion = analizar_simbolo_opcion(idx)
+        estos_datos.at[idx, 'vencimiento'] = vencimiento
+        estos_datos.at[idx, 'strike'] = strike
+        estos_datos.at[idx, 'tipo_opcion'] = tipo_opcion
+    traza.mark('parsed')
+    
+    with bloqueo_opciones:
         # Actualizar el DataFrame global
         datos_opciones = pd.concat([datos_opciones, estos_datos])
         
         # Guardar en la base de datos
         guardar_en_base_datos(estos_datos)
+        traza.mark('persisted')
         
-        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Guardados {len(estos_datos)} registros de opciones GGAL")
+        if not en_vivo:
+            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Backfill: {len(estos_datos)} registros de opciones GGAL")
+            return len(estos_datos)
+        
+        # Notificar a los consumidores en vivo (superficie de volatilidad, etc.)
+        for consumidor in consumidores:
+            try:
+                consumidor(estos_datos)
+            except Exception as e:
+                print(f"Error en el consumidor {getattr(consumidor, '__name__', consumidor)}: {e}")
+        traza.mark('published')
+    
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Guardados {len(estos_datos)} registros de opciones GGAL")
+    return len(estos_datos)
 
-def en_error(online, error):
+def en_error(online, error, connection_lost=False):
     print(f"Mensaje de error recibido: {error}")
+    if connection_lost:
+        monitor.notificar_caida()
     
 def guardar_en_base_datos(datos):
     sesion = Sesion()
@@ -145,10 +299,11 @@ def conectar_homebroker():
     
     try:
         print("Conectando a HomeBroker...")
-        hb = HomeBroker(int(broker), on_options=en_opciones, on_error=en_error)
+        hb = HomeBroker(int(broker), on_options=en_opciones, on_securities=en_acciones, on_error=en_error)
         hb.auth.login(dni=dni, user=usuario, password=contrasena, raise_exception=True)
         hb.online.connect()
         hb.online.subscribe_options()
+        hb.online.subscribe_securities('bluechips', plazo_subyacente)
         esta_conectado = True
         print("Conexión exitosa a HomeBroker")
     except Exception as e:
@@ -170,21 +325,41 @@ def desconectar_homebroker():
         print(f"Error al desconectar de HomeBroker: {e}")
 
 def es_horario_trading():
-    ahora = datetime.now()
-    hora_actual = ahora.time()
-    # Horario de trading: 11:00 AM a 5:00 PM
-    return (
-        dt_time(11, 0) <= hora_actual <= dt_time(17, 0) and 
-        ahora.weekday() < 5  # Lunes a Viernes
-    )
-
-def verificar_y_conectar():
-    if es_horario_trading():
-        if not esta_conectado:
-            conectar_homebroker()
-    else:
-        if esta_conectado:
-            desconectar_homebroker()
+    # Horario de trading: 11:00 AM a 5:00 PM en días hábiles de BYMA
+    return calendario.en_sesion()
+
+def reconectar_homebroker():
+    global esta_conectado
+    
+    try:
+        hb.online.disconnect()
+    except Exception:
+        pass
+    esta_conectado = False
+    conectar_homebroker()
+    return esta_conectado
+
+def registrar_hueco(hueco):
+    sesion = Sesion()
+    
+    try:
+        sesion.add(HuecoFeed(**hueco))
+        sesion.commit()
+    except Exception as e:
+        sesion.rollback()
+        print(f"Error al registrar hueco del feed: {e}")
+    finally:
+        sesion.close()
+
+def recuperar_hueco(inicio, fin):
+    # Backfill: snapshot actual del panel de opciones para cubrir el último estado perdido.
+    # El snapshot de HomeBroker no trae puntas (bid/ask), sólo último, volumen y OHLC: se guarda
+    # pero no llega a los consumidores en vivo (memoria compartida, scanner, velas)
+    snapshot = hb.online.get_market_snapshot()['options']
+    return procesar_opciones(snapshot, en_vivo=False)
+
+# Monitor de latidos: reconecta si el feed deja de enviar cotizaciones por más de 60 segundos
+monitor = MonitorFeed(reconectar_homebroker, registrar_hueco, backfill=recuperar_hueco, umbral=60.0)
 
 def generar_informe_diario():
     ahora = datetime.now()
@@ -232,6 +407,15 @@ def generar_informe_diario():
             informe += f"  {fila['simbolo']} ({fila['tipo_opcion']} - {fila['vencimiento']}): {fila['cantidad_registros']} registros, "
             informe += f"Rango: {fila['precio_min']} - {fila['precio_max']}, Cierre: {fila['precio_cierre']}\n"
         
+        ajustes = superficie.to_frame()
+        if not ajustes.empty:
+            informe += "\nSuperficie de volatilidad al cierre:\n" + ajustes.to_string(index=False) + "\n"
+        
+        if metrics.ENABLED:
+            # Percentiles de latencia de la sesión; se reinician para la próxima
+            informe += "\n" + metrics.summary() + "\n"
+            metrics.reset()
+        
         print(informe)
         
         # Guardar informe en archivo
@@ -244,13 +428,36 @@ def generar_informe_diario():
     except Exception as e:
         print(f"Error al generar informe diario: {e}")
 
-# Programar tareas
-schedule.every(2).seconds.do(verificar_y_conectar)
-schedule.every().day.at("17:05").do(generar_informe_diario)
+def compactar_base_datos():
+    # Mantenimiento fuera de sesión: actualizar estadísticas y recuperar espacio libre
+    try:
+        conn = sqlite3.connect(archivo_db)
+        conn.execute("PRAGMA optimize")
+        paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+        libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if paginas and libres / paginas > 0.1:
+            conn.execute("VACUUM")
+            print(f"Base de datos compactada ({libres} páginas libres recuperadas)")
+        conn.close()
+    except Exception as e:
+        print(f"Error al compactar la base de datos: {e}")
+
+# Programar tareas según las sesiones de BYMA
+planificador = PlanificadorSesiones(calendario)
+planificador.al_abrir(conectar_homebroker)
+planificador.al_abrir(monitor.iniciar, nombre='iniciar_monitor')
+planificador.al_cerrar(monitor.detener, nombre='detener_monitor')
+planificador.al_cerrar(desconectar_homebroker)
+planificador.al_cerrar(barras.vaciar, nombre='cerrar_velas')
+if captura is not None:
+    planificador.al_cerrar(captura.cerrar, nombre='cerrar_captura')
+planificador.al_cerrar(generar_informe_diario, demora=timedelta(minutes=5))
+planificador.al_cerrar(compactar_base_datos, demora=timedelta(minutes=15))
 
 if __name__ == "__main__":
     print("Iniciando Sistema de Registro de Base de Datos para Opciones GGAL")
     print(f"Archivo de base de datos: {os.path.abspath(archivo_db)}")
+    metrics.enable_from_env()
     
     # Verificar base de datos
     if os.path.exists(archivo_db):
@@ -263,12 +470,15 @@ if __name__ == "__main__":
     else:
         print("Se creó una nueva base de datos")
     
-    # Bucle principal
+    # Bucle principal: duerme hasta la próxima apertura/cierre de BYMA
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        planificador.ejecutar()
     except KeyboardInterrupt:
+        planificador.detener()
+        monitor.detener()
         print("Deteniendo el Sistema de Registro de Base de Datos para Opciones GGAL")
         if esta_conectado:
-            desconectar_homebroker()
\ No newline at end of file
+            desconectar_homebroker()
+        barras.vaciar()
+        if captura is not None:
+            captura.cerrar()
\ No newline at end of file
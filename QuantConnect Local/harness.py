@@ -0,0 +1,322 @@
+"""Harness local de backtest diario para portar las estrategias de QuantConnect
+    Los datos de mercado se guardan como arrays .npy que se abren con memmap en
+    modo sólo lectura, así varios procesos comparten las mismas páginas en memoria.
+    Las opciones se valúan con Black-Scholes sobre una cadena sintética (no hay
+    histórico de opciones local), usando el VIX o la volatilidad histórica como IV."""
+
+import math
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+BAR_DTYPE = np.dtype([('date', 'datetime64[D]'), ('open', 'f8'), ('high', 'f8'),
+                      ('low', 'f8'), ('close', 'f8')])
+
+TRADING_DAYS = 252
+
+
+# ==========================
+# DATOS DE MERCADO
+# ==========================
+def csv_to_npy(csv_path, npy_path):
+    """Convertir un CSV diario (Date, Open, High, Low, Close, ...) al formato del harness"""
+    df = pd.read_csv(csv_path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = pd.to_datetime(df['date']).to_numpy('datetime64[D]')
+    for field in ('open', 'high', 'low', 'close'):
+        bars[field] = df[field].to_numpy(np.float64)
+    bars.sort(order='date')
+    np.save(npy_path, bars)
+    return npy_path
+
+
+def synthetic_bars(start, end, price, drift=0.08, vol=0.18, seed=0):
+    """Serie diaria sintética (paseo log-normal) para probar el harness sin datos"""
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64(start), np.datetime64(end), dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    rets = rng.normal(drift / TRADING_DAYS, vol / math.sqrt(TRADING_DAYS), len(days))
+    close = price * np.exp(np.cumsum(rets))
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, vol / math.sqrt(TRADING_DAYS) / 2, len(days)))
+    bars = np.empty(len(days), dtype=BAR_DTYPE)
+    bars['date'] = days
+    bars['open'] = open_
+    bars['close'] = close
+    bars['high'] = np.maximum(open_, close) * (1 + spread)
+    bars['low'] = np.minimum(open_, close) * (1 - spread)
+    return bars
+
+
+def synthetic_vix(underlying, base=18.0, seed=1):
+    """VIX sintético con reversión a la media, inversamente correlacionado al subyacente"""
+    rng = np.random.default_rng(seed)
+    rets = np.diff(np.log(underlying['close']), prepend=np.log(underlying['close'][0]))
+    level = np.empty(len(underlying))
+    v = base
+    for i, r in enumerate(rets):
+        v = max(9.0, v + 0.1 * (base - v) - 300 * r + rng.normal(0, 0.8))
+        level[i] = v
+    bars = np.empty(len(underlying), dtype=BAR_DTYPE)
+    bars['date'] = underlying['date']
+    bars['open'] = level
+    bars['close'] = level
+    bars['high'] = level * 1.04
+    bars['low'] = level * 0.96
+    return bars
+
+
+def write_synthetic_dataset(data_dir, start='2017-01-01', end='2021-01-01'):
+    """Generar SPY, MSFT y VIX sintéticos en data_dir"""
+    os.makedirs(data_dir, exist_ok=True)
+    spy = synthetic_bars(start, end, 250.0, seed=0)
+    msft = synthetic_bars(start, end, 65.0, drift=0.25, vol=0.25, seed=2)
+    np.save(os.path.join(data_dir, 'SPY.npy'), spy)
+    np.save(os.path.join(data_dir, 'MSFT.npy'), msft)
+    np.save(os.path.join(data_dir, 'VIX.npy'), synthetic_vix(spy))
+    return data_dir
+
+
+def load_bars(data_dir, symbol):
+    """Abrir la serie de un símbolo como memmap de sólo lectura"""
+    return np.load(os.path.join(data_dir, f"{symbol}.npy"), mmap_mode='r')
+
+
+def _vix_index(vix, underlying):
+    """Posición del último VIX conocido en cada fecha del subyacente"""
+    return np.clip(np.searchsorted(vix['date'], underlying['date'], side='right') - 1, 0, len(vix) - 1)
+
+
+def _aligned_is_fresh(data_dir, symbol):
+    """VIX_{symbol}.npy existe y es posterior a VIX.npy y a {symbol}.npy"""
+    path = os.path.join(data_dir, f"VIX_{symbol}.npy")
+    if not os.path.exists(path):
+        return False
+    sources = (os.path.join(data_dir, 'VIX.npy'), os.path.join(data_dir, f"{symbol}.npy"))
+    return os.path.getmtime(path) >= max(os.path.getmtime(source) for source in sources)
+
+
+def align_vix(data_dir, symbol):
+    """Guardar VIX_{symbol}.npy con el VIX ya alineado a las fechas del subyacente
+        Se llama una vez en el proceso padre antes de abrir un pool: los workers lo
+        abren con memmap en lugar de armar cada uno su propia copia. Se regenera si
+        VIX.npy o {symbol}.npy son más nuevos. Devuelve la ruta o None si no hay VIX."""
+    if not os.path.exists(os.path.join(data_dir, 'VIX.npy')):
+        return None
+    path = os.path.join(data_dir, f"VIX_{symbol}.npy")
+    if not _aligned_is_fresh(data_dir, symbol):
+        vix, underlying = load_bars(data_dir, 'VIX'), load_bars(data_dir, symbol)
+        np.save(path, vix[_vix_index(vix, underlying)])
+    return path
+
+
+def historical_volatility(bars, window=21):
+    """Volatilidad histórica anualizada de cierre a cierre (NaN durante el calentamiento)"""
+    logret = np.diff(np.log(bars['close']), prepend=np.nan)
+    hv = pd.Series(logret).rolling(window).std().to_numpy() * math.sqrt(TRADING_DAYS)
+    return hv
+
+
+# ==========================
+# VALUACIÓN DE OPCIONES
+# ==========================
+def _norm_cdf(x):
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def bs_price(spot, strike, t, vol, right, rate=0.0):
+    """Precio Black-Scholes europeo; t en años, right 'C' o 'P'"""
+    if t <= 0 or vol <= 0:
+        return max(spot - strike, 0.0) if right == 'C' else max(strike - spot, 0.0)
+    sqrt_t = math.sqrt(t)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    if right == 'C':
+        return spot * _norm_cdf(d1) - strike * math.exp(-rate * t) * _norm_cdf(d2)
+    return strike * math.exp(-rate * t) * _norm_cdf(-d2) - spot * _norm_cdf(-d1)
+
+
+def third_friday(year, month):
+    d = date(year, month, 15)
+    return d + timedelta(days=(4 - d.weekday()) % 7)
+
+
+class SyntheticChain:
+    """Cadena de opciones sintética: vencimientos semanales (viernes) y mensuales
+        (tercer viernes), strikes cada strike_step alrededor del spot"""
+
+    def __init__(self, strike_step=1.0, width=0.25, weekly=True):
+        self.strike_step = strike_step
+        self.width = width
+        self.weekly = weekly
+
+    def expiries(self, today, max_days=70):
+        today = pd.Timestamp(today).date()
+        out = []
+        if self.weekly:
+            d = today + timedelta(days=(4 - today.weekday()) % 7 or 7)
+            while (d - today).days <= max_days:
+                out.append(d)
+                d += timedelta(days=7)
+        else:
+            y, m = today.year, today.month
+            while True:
+                d = third_friday(y, m)
+                if (d - today).days > max_days:
+                    break
+                if d > today:
+                    out.append(d)
+                m += 1
+                if m > 12:
+                    y, m = y + 1, 1
+        return out
+
+    def strikes(self, spot):
+        lo = math.floor(spot * (1 - self.width) / self.strike_step)
+        hi = math.ceil(spot * (1 + self.width) / self.strike_step)
+        return [k * self.strike_step for k in range(lo, hi + 1)]
+
+    def contracts(self, today, spot, right, max_days=70):
+        """Lista de (vencimiento, strike, right) disponibles en la fecha"""
+        strikes = self.strikes(spot)
+        return [(expiry, strike, right) for expiry in self.expiries(today, max_days) for strike in strikes]
+
+
+# ==========================
+# BACKTEST
+# ==========================
+class Portfolio:
+    """Cartera con acciones del subyacente y posiciones en opciones valuadas a modelo"""
+
+    def __init__(self, cash, half_spread=0.02, fee_per_contract=0.65, multiplier=100):
+        self.cash = float(cash)
+        self.shares = 0
+        self.options = {}  # (vencimiento, strike, right) -> cantidad
+        self.half_spread = half_spread
+        self.fee_per_contract = fee_per_contract
+        self.multiplier = multiplier
+        self.traded_notional = 0.0
+        self.trades = 0
+
+    def option_value(self, contract, today, spot, vol):
+        expiry, strike, right = contract
+        t = max((expiry - today).days, 0) / 365.0
+        return bs_price(spot, strike, t, vol, right)
+
+    def equity(self, today, spot, vol):
+        value = self.cash + self.shares * spot
+        for contract, qty in self.options.items():
+            value += qty * self.option_value(contract, today, spot, vol) * self.multiplier
+        return value
+
+    def set_shares(self, target, spot):
+        delta = target - self.shares
+        if delta:
+            self.cash -= delta * spot
+            self.shares = target
+            self.traded_notional += abs(delta) * spot
+            self.trades += 1
+
+    def trade_option(self, contract, qty, today, spot, vol):
+        """Operar qty contratos (positivo compra, negativo venta) cruzando el spread"""
+        if qty == 0:
+            return
+        mid = self.option_value(contract, today, spot, vol)
+        price = mid * (1 + self.half_spread) if qty > 0 else mid * (1 - self.half_spread)
+        self.cash -= qty * price * self.multiplier + abs(qty) * self.fee_per_contract
+        self.traded_notional += abs(qty) * price * self.multiplier
+        self.trades += 1
+        held = self.options.get(contract, 0) + qty
+        if held:
+            self.options[contract] = held
+        else:
+            self.options.pop(contract, None)
+
+    def liquidate_option(self, contract, today, spot, vol):
+        qty = self.options.get(contract, 0)
+        self.trade_option(contract, -qty, today, spot, vol)
+
+
+class Context:
+    """Datos del día disponibles para la estrategia (sin mirar al futuro)"""
+
+    def __init__(self, data, i):
+        self.data = data
+        self.i = i
+
+    @property
+    def today(self):
+        return self.data['dates'][self.i]
+
+    def bars(self, name):
+        """Velas hasta hoy inclusive"""
+        return self.data[name][:self.i + 1]
+
+    def value(self, name):
+        return self.data[name][self.i]
+
+
+def run_backtest(strategy, data, start=None, end=None, cash=100_000.0, **portfolio_kwargs):
+    """Correr la estrategia día por día y devolver la curva de equity y métricas
+        data: dict con 'dates' (lista de date), 'underlying' (velas), 'vol' (IV anual por día)
+        y las series adicionales que use la estrategia"""
+    portfolio = Portfolio(cash, **portfolio_kwargs)
+    dates = data['dates']
+    first = 0 if start is None else int(np.searchsorted(data['underlying']['date'], np.datetime64(start)))
+    last = len(dates) if end is None else int(np.searchsorted(data['underlying']['date'], np.datetime64(end)))
+
+    equity = np.empty(last - first)
+    strategy.initialize(data, first)
+    for n, i in enumerate(range(first, last)):
+        ctx = Context(data, i)
+        strategy.on_day(ctx, portfolio)
+        equity[n] = portfolio.equity(ctx.today, ctx.value('underlying')['close'], ctx.value('vol'))
+
+    return portfolio, equity, metrics(equity, portfolio)
+
+
+def metrics(equity, portfolio):
+    """Sharpe anualizado, máximo drawdown, turnover anual y retorno total"""
+    if len(equity) < 2:
+        return {'sharpe': np.nan, 'max_drawdown': np.nan, 'turnover': np.nan,
+                'total_return': np.nan, 'cagr': np.nan, 'trades': portfolio.trades}
+    rets = np.diff(equity) / equity[:-1]
+    std = rets.std(ddof=1)
+    sharpe = rets.mean() / std * math.sqrt(TRADING_DAYS) if std > 0 else np.nan
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    years = len(equity) / TRADING_DAYS
+    total = equity[-1] / equity[0] - 1
+    return {
+        'sharpe': float(sharpe),
+        'max_drawdown': float(drawdown.min()),
+        'turnover': float(portfolio.traded_notional / equity.mean() / years),
+        'total_return': float(total),
+        'cagr': float((equity[-1] / equity[0]) ** (1 / years) - 1) if equity[-1] > 0 else -1.0,
+        'trades': portfolio.trades,
+    }
+
+
+def prepare_data(data_dir, symbol, vol_source='VIX', hv_window=21):
+    """Armar el dict de datos de un subyacente abriendo los .npy con memmap
+        vol_source='VIX' usa VIX/100 como IV; 'HV' usa la volatilidad histórica"""
+    underlying = load_bars(data_dir, symbol)
+    data = {
+        'underlying': underlying,
+        'dates': [d.item() for d in underlying['date']],
+    }
+    if os.path.exists(os.path.join(data_dir, 'VIX.npy')) and _aligned_is_fresh(data_dir, symbol):
+        # Alineado por align_vix: memmap compartido entre procesos
+        data['vix'] = load_bars(data_dir, f"VIX_{symbol}")
+    elif os.path.exists(os.path.join(data_dir, 'VIX.npy')):
+        vix = load_bars(data_dir, 'VIX')
+        # Alinear el VIX a las fechas del subyacente (último valor conocido); copia en memoria
+        data['vix'] = vix[_vix_index(vix, underlying)]
+    hv = historical_volatility(underlying, hv_window)
+    if vol_source == 'VIX' and 'vix' in data:
+        data['vol'] = data['vix']['close'] / 100.0
+    else:
+        data['vol'] = np.where(np.isnan(hv), np.nanmean(hv), hv)
+    return data
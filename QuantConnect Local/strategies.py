@@ -0,0 +1,160 @@
+"""Port local de las reglas de OptionChainProviderPutProtection y BreakoutCallBuy
+    Misma lógica que los algoritmos de QuantConnect, pero sobre velas diarias y la
+    cadena sintética del harness, con todos los parámetros ajustables"""
+
+import os
+import sys
+
+import numpy as np
+
+from harness import SyntheticChain
+
+# El indicador del VIX rank vive junto al algoritmo de QuantConnect para compartir el mismo código
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'QuantConnect Opciones Bots 1'))
+from vix_rank import RollingRank
+
+
+class PutProtection:
+    """Port de OptionChainProviderPutProtection (QuantConnect Opciones Bots 1)
+        Mantiene SPY y compra puts OTM cuando el VIX rank supera IVlvl"""
+
+    name = 'put_protection'
+    symbol = 'SPY'
+    vol_source = 'VIX'
+    defaults = {
+        'DaysBeforeExp': 2,    # Días antes del vencimiento para salir de la posición
+        'DTE': 25,             # Días objetivo hasta el vencimiento
+        'OTM': 0.01,           # Porcentaje fuera del dinero para el put
+        'lookbackIV': 150,     # Ventana del VIX rank (días)
+        'IVlvl': 0.5,          # Nivel del VIX rank para entrar
+        'percentage': 0.9,     # Porcentaje del portafolio en el subyacente
+        'options_alloc': 90,   # Acciones cubiertas por cada opción
+    }
+
+    def __init__(self, **params):
+        self.params = {**self.defaults, **params}
+        for key, value in self.params.items():
+            setattr(self, key, value)
+        self.chain = SyntheticChain(strike_step=1.0, weekly=True)
+
+    def initialize(self, data, first):
+        self.contract = None
+        self.rank = 0.0
+        # Calentar la ventana una sola vez con las velas previas al inicio del backtest
+        self.vix_window = RollingRank(self.lookbackIV)
+        warm = data['vix'][max(first - self.lookbackIV, 0):first]
+        self.vix_window.warm_up(zip(warm['high'], warm['low'], warm['close']))
+
+    def options_filter(self, ctx, spot):
+        """Put OTM más cercano al umbral, desempatando por cercanía al DTE objetivo"""
+        today = ctx.today
+        best, best_key = None, None
+        for contract in self.chain.contracts(today, spot, 'P', max_days=self.DTE + 8):
+            expiry, strike, _ = contract
+            days = (expiry - today).days
+            if spot - strike > self.OTM * spot and self.DTE - 8 < days < self.DTE + 8:
+                key = (spot - strike, abs(days - self.DTE))
+                if best_key is None or key < best_key:
+                    best, best_key = contract, key
+        return best
+
+    def on_day(self, ctx, portfolio):
+        # Rank del VIX de hoy contra la ventana de días previos, luego sumar la vela de hoy
+        vix = ctx.value('vix')
+        ready = self.vix_window.is_ready
+        self.rank = self.vix_window.rank(vix['close'])
+        self.vix_window.update(vix['high'], vix['low'], vix['close'])
+        if not ready:  # Calentamiento del VIX rank
+            return
+        spot = ctx.value('underlying')['close']
+        vol = ctx.value('vol')
+        today = ctx.today
+
+        if portfolio.shares == 0:
+            equity = portfolio.equity(today, spot, vol)
+            portfolio.set_shares(int(equity * self.percentage / spot), spot)
+
+        if self.rank > self.IVlvl and self.contract is None:
+            contract = self.options_filter(ctx, spot)
+            if contract is not None:
+                qty = round(portfolio.shares / self.options_alloc)
+                if qty > 0:
+                    portfolio.trade_option(contract, qty, today, spot, vol)
+                    self.contract = contract
+
+        if self.contract is not None and (self.contract[0] - today).days <= self.DaysBeforeExp:
+            portfolio.liquidate_option(self.contract, today, spot, vol)
+            self.contract = None
+
+
+class BreakoutCallBuy:
+    """Port de BreakoutCallBuy (QuantConnect Opciones Bots 2)
+        Compra un Call ATM del vencimiento más lejano cuando MSFT rompe el máximo de N días"""
+
+    name = 'breakout_call'
+    symbol = 'MSFT'
+    vol_source = 'HV'
+    defaults = {
+        'window': 21,          # Días del máximo para detectar el breakout
+        'allocation': 0.05,    # Porcentaje del portafolio por operación
+        'min_dte': 20,         # Filtro de vencimientos (días)
+        'max_dte': 40,
+        'strike_range': 3,     # Strikes a cada lado del ATM
+        'exit_days': 4,        # Días antes del vencimiento para liquidar
+    }
+
+    def __init__(self, **params):
+        self.params = {**self.defaults, **params}
+        for key, value in self.params.items():
+            setattr(self, key, value)
+        self.chain = SyntheticChain(strike_step=2.5, weekly=False)
+
+    def initialize(self, data, first):
+        self.contract = None
+
+    def buy_call(self, ctx, portfolio, spot, vol):
+        today = ctx.today
+        strikes = self.chain.strikes(spot)
+        atm = int(np.argmin([abs(k - spot) for k in strikes]))
+        strikes = strikes[max(atm - self.strike_range, 0):atm + self.strike_range + 1]
+        expiries = [e for e in self.chain.expiries(today, self.max_dte)
+                    if self.min_dte <= (e - today).days <= self.max_dte]
+        if not expiries or not strikes:
+            return
+
+        # Vencimiento más lejano y strike más cercano al subyacente
+        expiry = max(expiries)
+        strike = min(strikes, key=lambda k: abs(k - spot))
+        contract = (expiry, strike, 'C')
+
+        ask = portfolio.option_value(contract, today, spot, vol) * (1 + portfolio.half_spread)
+        if ask <= 0:
+            return
+        quantity = int(self.allocation * portfolio.equity(today, spot, vol) / ask / portfolio.multiplier)
+        if quantity > 0:
+            portfolio.trade_option(contract, quantity, today, spot, vol)
+            self.contract = contract
+
+    def on_day(self, ctx, portfolio):
+        if ctx.i < self.window:  # Esperar a que el máximo esté listo
+            return
+        bar = ctx.value('underlying')
+        spot = bar['close']
+        vol = ctx.value('vol')
+        today = ctx.today
+
+        if self.contract is not None:
+            if (self.contract[0] - today).days < self.exit_days:
+                portfolio.liquidate_option(self.contract, today, spot, vol)
+                self.contract = None
+            return
+
+        high = ctx.data['underlying']['high'][ctx.i - self.window:ctx.i].max()
+        if spot >= high:
+            self.buy_call(ctx, portfolio, spot, vol)
+
+
+STRATEGIES = {
+    PutProtection.name: PutProtection,
+    BreakoutCallBuy.name: BreakoutCallBuy,
+}
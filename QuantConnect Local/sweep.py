@@ -0,0 +1,155 @@
+"""Barridos de parámetros en paralelo para las estrategias portadas
+    Reparte una grilla o una búsqueda aleatoria en un pool de procesos. Cada worker
+    abre los datos de mercado con memmap de sólo lectura (las páginas se comparten
+    entre procesos; el VIX se alinea una sola vez en el padre con align_vix) y los resultados se juntan en una sola tabla con Sharpe,
+    drawdown y turnover.
+
+    Ejemplos:
+        python sweep.py --strategy put_protection --grid DTE=15,25,35 IVlvl=0.3,0.5,0.7
+        python sweep.py --strategy breakout_call --random 200 --workers 8
+"""
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from harness import align_vix, prepare_data, run_backtest, write_synthetic_dataset
+from strategies import STRATEGIES
+
+# Espacios de búsqueda por defecto: listas se muestrean/enumeran, tuplas (min, max) son rangos
+DEFAULT_SPACES = {
+    'put_protection': {
+        'DTE': [15, 20, 25, 30, 35, 45],
+        'OTM': [0.0, 0.01, 0.02, 0.05],
+        'lookbackIV': [60, 100, 150, 200],
+        'IVlvl': [0.3, 0.4, 0.5, 0.6, 0.7],
+        'options_alloc': [60, 90, 120],
+        'DaysBeforeExp': [1, 2, 5],
+    },
+    'breakout_call': {
+        'window': [10, 15, 21, 30, 55],
+        'allocation': [0.02, 0.05, 0.1],
+        'min_dte': [10, 20],
+        'max_dte': [40, 60],
+        'exit_days': [2, 4, 7],
+    },
+}
+
+_worker_data = {}
+_worker_dir = None
+
+
+def _init_worker(data_dir):
+    """Inicializador del pool: recordar el directorio; los memmap se abren bajo demanda"""
+    global _worker_dir
+    _worker_dir = data_dir
+    _worker_data.clear()
+
+
+def _data_for(strategy_cls):
+    key = (strategy_cls.symbol, strategy_cls.vol_source)
+    if key not in _worker_data:
+        _worker_data[key] = prepare_data(_worker_dir, strategy_cls.symbol, strategy_cls.vol_source)
+    return _worker_data[key]
+
+
+def _run_one(job):
+    strategy_name, params, start, end = job
+    strategy_cls = STRATEGIES[strategy_name]
+    started = time.perf_counter()
+    try:
+        _, _, result = run_backtest(strategy_cls(**params), _data_for(strategy_cls), start, end)
+        error = None
+    except Exception as e:
+        result, error = {}, str(e)
+    return {'strategy': strategy_name, **params, **result,
+            'seconds': time.perf_counter() - started, 'error': error}
+
+
+def grid(space):
+    """Producto cartesiano de los valores de cada parámetro"""
+    keys = list(space)
+    values = [v if isinstance(v, list) else list(v) for v in space.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def random_search(space, n, seed=0):
+    """n configuraciones al azar; las tuplas (min, max) se muestrean uniformes"""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                lo, hi = values
+                config[key] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                config[key] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+def sweep(strategy_name, configs, data_dir, workers=None, start=None, end=None, chunksize=4):
+    """Correr todas las configuraciones en paralelo y devolver una tabla ordenada por Sharpe"""
+    jobs = [(strategy_name, config, start, end) for config in configs]
+    align_vix(data_dir, STRATEGIES[strategy_name].symbol)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+        rows = list(pool.map(_run_one, jobs, chunksize=chunksize))
+    results = pd.DataFrame(rows)
+    if 'sharpe' in results:
+        results = results.sort_values('sharpe', ascending=False, na_position='last')
+    return results.reset_index(drop=True)
+
+
+def _parse_grid(items):
+    space = {}
+    for item in items:
+        key, values = item.split('=', 1)
+        parsed = []
+        for v in values.split(','):
+            try:
+                parsed.append(int(v))
+            except ValueError:
+                parsed.append(float(v))
+        space[key] = parsed
+    return space
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de parámetros en paralelo")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='put_protection')
+    parser.add_argument('--grid', nargs='*', help="Parámetros como CLAVE=v1,v2,... (por defecto el espacio completo)")
+    parser.add_argument('--random', type=int, help="Cantidad de configuraciones aleatorias en lugar de grilla")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--data-dir', help="Directorio con SPY.npy, MSFT.npy y VIX.npy (por defecto datos sintéticos)")
+    parser.add_argument('--start', default='2017-10-01')
+    parser.add_argument('--end', default='2020-10-01')
+    parser.add_argument('--out', help="Guardar la tabla de resultados en CSV")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    if data_dir is None:
+        data_dir = write_synthetic_dataset(os.path.join(tempfile.gettempdir(), 'qc_local_data'))
+        print(f"Usando datos sintéticos en {data_dir}")
+
+    space = _parse_grid(args.grid) if args.grid else DEFAULT_SPACES[args.strategy]
+    configs = random_search(space, args.random) if args.random else grid(space)
+
+    print(f"Corriendo {len(configs)} configuraciones de {args.strategy} con {args.workers} workers ...")
+    started = time.perf_counter()
+    results = sweep(args.strategy, configs, data_dir, args.workers, args.start, args.end)
+    elapsed = time.perf_counter() - started
+    print(f"Listo en {elapsed:.1f}s ({len(configs) / elapsed:.1f} backtests/s)")
+
+    columns = [c for c in results.columns if c not in ('strategy', 'error', 'seconds')]
+    print(results[columns].head(10).to_string(index=False))
+
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"Resultados guardados en {args.out}")
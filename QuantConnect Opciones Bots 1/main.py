@@ -1,5 +1,7 @@
 from datetime import timedelta
 from QuantConnect.Data.Custom.CBOE import *
+from vix_rank import RollingRank
+from chain_selection import DailyChainCache, select_min
 
 class OptionChainProviderPutProtection(QCAlgorithm):
 
@@ -21,10 +23,13 @@ class OptionChainProviderPutProtection(QCAlgorithm):
         
         # Inicializar el indicador de volatilidad implícita (IV)
         self.rank = 0
+        self.percentile = 0
+        self.lastVixTime = None
         
         # Inicializar la variable del contrato de opción como una cadena vacía
         self.contract = str()
         self.contractsAdded = set()
+        self.chainCache = DailyChainCache()
         
         # Parámetros del algoritmo ------------------------------------------------------------
         self.DaysBeforeExp = 2  # Número de días antes del vencimiento para salir de la posición
@@ -35,6 +40,13 @@ class OptionChainProviderPutProtection(QCAlgorithm):
         self.percentage = 0.9  # Porcentaje del portafolio asignado al activo subyacente
         self.options_alloc = 90  # Cantidad de acciones cubiertas por cada opción (100 sería el balanceado)
         # -----------------------------------------------------------------------------------
+        
+        # Ventana móvil del VIX: se carga una sola vez con la historia y luego
+        # se actualiza con cada vela diaria que llega en OnData
+        self.vixRank = RollingRank(self.lookbackIV)
+        history = self.History(CBOE, self.vix, self.lookbackIV, Resolution.Daily)
+        if not history.empty:
+            self.vixRank.warm_up(zip(history["high"], history["low"], history["close"]))
     
         # Programar la función de graficado 30 minutos después de la apertura del mercado
         self.Schedule.On(self.DateRules.EveryDay(self.symbol), \
@@ -50,10 +62,22 @@ class OptionChainProviderPutProtection(QCAlgorithm):
         self.SetWarmUp(timedelta(self.lookbackIV)) 
 
     def VIXRank(self):
-        # Obtener el historial del VIX y calcular su nivel relativo
-        history = self.History(CBOE, self.vix, self.lookbackIV, Resolution.Daily)
-        self.rank = ((self.Securities[self.vix].Price - min(history["low"])) / \
-                     (max(history["high"]) - min(history["low"])))
+        # Calcular el nivel relativo del VIX sobre la ventana ya cargada, sin pedir historia
+        if not self.vixRank.is_ready:
+            return
+        price = self.Securities[self.vix].Price
+        self.rank = self.vixRank.rank(price)
+        self.percentile = self.vixRank.percentile(price)
+
+    def UpdateVIX(self, data):
+        # Agregar la nueva vela diaria del VIX a la ventana móvil (una sola vez por vela)
+        if not data.ContainsKey(self.vix):
+            return
+        bar = data[self.vix]
+        if bar is None or bar.EndTime == self.lastVixTime:
+            return
+        self.lastVixTime = bar.EndTime
+        self.vixRank.update(bar.High, bar.Low, bar.Close)
  
     def OnData(self, data):
         ''' Evento OnData: punto de entrada principal del algoritmo.
@@ -62,6 +86,8 @@ class OptionChainProviderPutProtection(QCAlgorithm):
         if self.IsWarmingUp:
             return
         
+        self.UpdateVIX(data)
+        
         # Comprar el activo subyacente si aún no está en la cartera
         if not self.Portfolio[self.symbol].Invested:
             self.SetHoldings(self.symbol, self.percentage)
@@ -91,18 +117,23 @@ class OptionChainProviderPutProtection(QCAlgorithm):
         ''' Filtra la lista de contratos de opciones disponibles para el activo subyacente.
             Se selecciona la opción put más adecuada basada en la fecha de vencimiento y el precio de ejercicio. '''
         
-        contracts = self.OptionChainProvider.GetOptionContractList(self.symbol, data.Time)
         self.underlyingPrice = self.Securities[self.symbol].Price
         
-        # Filtrar opciones put fuera del dinero (OTM) que expiren cerca de los días objetivo (DTE)
-        otm_puts = [i for i in contracts if i.ID.OptionRight == OptionRight.Put and
-                                            self.underlyingPrice - i.ID.StrikePrice > self.OTM * self.underlyingPrice and
-                                            self.DTE - 8 < (i.ID.Date - data.Time).days < self.DTE + 8]
-        
-        if len(otm_puts) > 0:
-            # Ordenar opciones según la cercanía a los días objetivo y el precio de ejercicio
-            contract = sorted(sorted(otm_puts, key=lambda x: abs((x.ID.Date - self.Time).days - self.DTE)),
-                                                     key=lambda x: self.underlyingPrice - x.ID.StrikePrice)[0]
+        # Puts que expiran cerca de los días objetivo (DTE), junto con sus días al vencimiento.
+        # La lista de contratos cambia como mucho una vez por día: se pide y filtra una sola vez
+        puts = self.chainCache.get(data.Time.date(), 'puts', lambda: [
+            (i, (i.ID.Date - data.Time).days)
+            for i in self.OptionChainProvider.GetOptionContractList(self.symbol, data.Time)
+            if i.ID.OptionRight == OptionRight.Put and self.DTE - 8 < (i.ID.Date - data.Time).days < self.DTE + 8])
+        
+        # Put fuera del dinero (OTM) más cercano al umbral, desempatando por cercanía al DTE,
+        # en un único recorrido en lugar de dos ordenamientos completos
+        best = select_min(puts,
+                          key=lambda x: (self.underlyingPrice - x[0].ID.StrikePrice, abs(x[1] - self.DTE)),
+                          predicate=lambda x: self.underlyingPrice - x[0].ID.StrikePrice > self.OTM * self.underlyingPrice)
+        
+        if best is not None:
+            contract = best[0]
             
             if contract not in self.contractsAdded:
                 self.contractsAdded.add(contract)
@@ -116,6 +147,7 @@ class OptionChainProviderPutProtection(QCAlgorithm):
     def Plotting(self):
         # Graficar el indicador IV
         self.Plot("Vol Chart", "Rank", self.rank)
+        self.Plot("Vol Chart", "Percentile", self.percentile)
         self.Plot("Vol Chart", "lvl", self.IVlvl)
         
         # Graficar el precio del activo subyacente
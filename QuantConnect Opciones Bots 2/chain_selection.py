@@ -0,0 +1,34 @@
+class DailyChainCache:
+    ''' Cache de conjuntos de contratos filtrados que se invalida al cambiar el día.
+        La lista de contratos de una cadena cambia como mucho una vez por día, así que
+        el filtrado pesado se hace una vez y los OnData siguientes reutilizan el resultado. '''
+
+    def __init__(self):
+        self.day = None
+        self._values = {}
+
+    def get(self, day, key, build):
+        ''' Devolver el valor cacheado para (day, key) o construirlo con build() '''
+        if day != self.day:
+            self.day = day
+            self._values.clear()
+        if key not in self._values:
+            self._values[key] = build()
+        return self._values[key]
+
+
+def select_min(items, key, predicate=None):
+    ''' Elemento con la menor clave en un único recorrido O(n), sin ordenar.
+        La clave puede ser una tupla: se compara lexicográficamente, lo que equivale
+        a ordenar por el último criterio y luego por el primero (sort estable).
+        Ante empates devuelve el primero, igual que sorted(...)[0]. Devuelve None si no hay candidatos. '''
+    best = None
+    best_key = None
+    for item in items:
+        if predicate is not None and not predicate(item):
+            continue
+        k = key(item)
+        if best_key is None or k < best_key:
+            best = item
+            best_key = k
+    return best
@@ -1,3 +1,5 @@
+from chain_selection import DailyChainCache, select_min
+
 class BreakoutCallBuy(QCAlgorithm):
     
     def Initialize(self):
@@ -18,6 +20,9 @@ class BreakoutCallBuy(QCAlgorithm):
         
         # Indicador de máximo de 21 días para detectar breakout
         self.high = self.MAX(self.equity, 21, Resolution.Daily, Field.High)
+        
+        # Calls del vencimiento más lejano, recalculados una vez por día
+        self.chainCache = DailyChainCache()
     
     def OnData(self, data):
         # Esperar hasta que el indicador esté listo
@@ -40,19 +45,16 @@ class BreakoutCallBuy(QCAlgorithm):
                 self.BuyCall(chains)
 
     def BuyCall(self, chains):
-        # Seleccionar la opción Call con la expiración más lejana disponible
-        expiry = sorted(chains, key=lambda x: x.Expiry, reverse=True)[0].Expiry
+        # Calls del vencimiento más lejano disponible (cacheados por día): (strike, símbolo)
+        calls = self.chainCache.get(self.Time.date(), chains.Symbol, lambda: self.FarthestCalls(chains))
         
-        # Filtrar solo las opciones Call con esa expiración
-        calls = [i for i in chains if i.Expiry == expiry and i.Right == OptionRight.Call]
+        # Call más cercano al precio del subyacente en un único recorrido
+        best = select_min(calls, key=lambda x: abs(x[0] - chains.Underlying.Price))
         
-        # Ordenar las opciones Call por cercanía al precio del activo subyacente
-        call_contracts = sorted(calls, key=lambda x: abs(x.Strike - x.UnderlyingLastPrice))
-        
-        if len(call_contracts) == 0:  # Verificar que haya contratos disponibles
+        if best is None or best[1] not in chains.Contracts:  # Verificar que haya contratos disponibles
             return
         
-        self.call = call_contracts[0]  # Seleccionar la mejor opción Call
+        self.call = chains.Contracts[best[1]]  # Seleccionar la mejor opción Call
         
         # Calcular la cantidad de contratos a comprar (5% del portafolio)
         quantity = self.Portfolio.TotalPortfolioValue / self.call.AskPrice
@@ -61,6 +63,18 @@ class BreakoutCallBuy(QCAlgorithm):
         # Realizar la compra
         self.Buy(self.call.Symbol, quantity)
 
+    def FarthestCalls(self, chains):
+        # Un solo recorrido: vencimiento más lejano de la cadena y los Calls de ese vencimiento
+        expiry = None
+        calls = []
+        for i in chains:
+            if expiry is None or i.Expiry > expiry:
+                expiry = i.Expiry
+                calls = []
+            if i.Expiry == expiry and i.Right == OptionRight.Call:
+                calls.append((i.Strike, i.Symbol))
+        return calls
+
     def OnOrderEvent(self, orderEvent):
         # Manejo de eventos de órdenes
         order = self.Transactions.GetOrderById(orderEvent.OrderId)